@@ -0,0 +1,210 @@
+import os
+from datetime import date
+import numpy as np
+from sqlalchemy import select
+from app import Cliente, Apolice, Apartamento, Acidente, VersaoTabela
+from cache import CacheLRU
+
+# Análises atuariais sobre apólices, apartamentos e acidentes.
+# As colunas são lidas em blocos por um cursor no servidor e convertidas em arrays do NumPy;
+# junções e agrupamentos são feitos com searchsorted/unique/bincount, sem laços por linha.
+# Os resultados ficam guardados até a próxima escrita no banco, de qualquer processo (a versão dos
+# dados, VersaoTabela, é lida a cada chamada), e no máximo ANALISES_TTL segundos.
+
+TAMANHO_BLOCO_ANALISE = 50000
+FAIXAS_ETARIAS = [18, 26, 36, 46, 56, 66]  # início de cada faixa a partir da segunda
+ROTULOS_FAIXAS = ["0-17", "18-25", "26-35", "36-45", "46-55", "56-65", "66+"]
+SEM_DATA = "sem data"
+
+ANALISES_MAX_RESULTADOS = int(os.environ.get("ANALISES_MAX_RESULTADOS", 100))
+ANALISES_TTL = float(os.environ.get("ANALISES_TTL", 300))  # segundos; 0 desativa a expiração
+
+_resultados = CacheLRU(ANALISES_MAX_RESULTADOS, ANALISES_TTL)  # (nome, argumentos) -> versão dos dados e resultado
+
+
+def _converter(valores, tipo):
+    # Texto ausente vira "", números ausentes viram NaN e datas ausentes viram NaT
+    if tipo is str:
+        return np.array(["" if v is None else v for v in valores], dtype=str)
+    if tipo is date:
+        return np.array(valores, dtype="datetime64[D]")
+    return np.array(valores, dtype=float)
+
+
+def buscar_colunas(session, *colunas, tamanho_bloco=TAMANHO_BLOCO_ANALISE):
+    """Lê as colunas em blocos e retorna um array por coluna, na mesma ordem"""
+    tipos = [coluna.type.python_type for coluna in colunas]
+    blocos = [[] for _ in colunas]
+    resultado = session.connection().execution_options(stream_results=True).execute(select(*colunas))
+    for linhas in resultado.partitions(tamanho_bloco):
+        for i, valores in enumerate(zip(*linhas)):
+            blocos[i].append(_converter(valores, tipos[i]))
+    return [
+        np.concatenate(partes) if partes else _converter([], tipo)
+        for partes, tipo in zip(blocos, tipos)
+    ]
+
+
+def _posicoes(chaves, procuradas):
+    # Posição de cada valor procurado no array de chaves, ou -1 se não existir
+    if not len(chaves):
+        return np.full(len(procuradas), -1)
+    ordem = np.argsort(chaves)
+    posicoes = np.searchsorted(chaves, procuradas, sorter=ordem).clip(max=len(chaves) - 1)
+    encontradas = ordem[posicoes]
+    return np.where(chaves[encontradas] == procuradas, encontradas, -1)
+
+
+def _somar_por(posicoes, pesos, tamanho):
+    validas = posicoes >= 0
+    return np.bincount(posicoes[validas], weights=np.nan_to_num(pesos[validas]), minlength=tamanho)
+
+
+def _texto(valor):
+    return None if valor == "" else str(valor)
+
+
+def _com_cache(nome, funcao, session, *args):
+    chave = (nome, args)
+    # Lida na mesma transação que as colunas: o resultado corresponde a essa versão
+    versao = tuple((tabela, v) for tabela, v in session.execute(select(VersaoTabela.tabela, VersaoTabela.versao).order_by(VersaoTabela.tabela)))
+    guardado = _resultados.obter(chave)
+    if guardado is not None and guardado["versao"] == versao:
+        return guardado["resultado"]
+    resultado = funcao(session, *args)
+    _resultados.gravar(chave, {"versao": versao, "resultado": resultado})
+    return resultado
+
+
+def _sinistralidade_por_cidade(session):
+    logradouros, cidades, fk_seguros = buscar_colunas(session, Apartamento.logradouro, Apartamento.cidade, Apartamento.fk_seguro)
+    n_seguros, valores = buscar_colunas(session, Apolice.n_seguro, Apolice.valor_mensal)
+    fk_apartamentos, quantidades = buscar_colunas(session, Acidente.fk_apartamento, Acidente.qtd_acidentes)
+
+    apolice = _posicoes(n_seguros, fk_seguros)
+    # O prêmio de uma apólice com vários apartamentos é dividido entre eles, para contar uma vez só
+    com_apolice = apolice >= 0
+    apartamentos_da_apolice = np.bincount(apolice[com_apolice], minlength=len(n_seguros))
+    premio = np.zeros(len(apolice))
+    premio[com_apolice] = np.nan_to_num(valores[apolice[com_apolice]]) / apartamentos_da_apolice[apolice[com_apolice]]
+    apartamento = _posicoes(logradouros, fk_apartamentos)
+    acidentes = _somar_por(apartamento, quantidades, len(logradouros))
+    ocorrencias = _somar_por(apartamento, np.ones(len(apartamento)), len(logradouros))
+
+    com_cidade = cidades != ""
+    nomes, grupo = np.unique(cidades[com_cidade], return_inverse=True)
+    totais = {
+        "apartamentos": np.bincount(grupo, minlength=len(nomes)),
+        "premio_mensal": np.bincount(grupo, weights=premio[com_cidade], minlength=len(nomes)),
+        "ocorrencias": np.bincount(grupo, weights=ocorrencias[com_cidade], minlength=len(nomes)),
+        "acidentes": np.bincount(grupo, weights=acidentes[com_cidade], minlength=len(nomes)),
+    }
+    return [
+        {
+            "cidade": str(nome),
+            "apartamentos": int(totais["apartamentos"][i]),
+            "premio_mensal": float(totais["premio_mensal"][i]),
+            "ocorrencias": int(totais["ocorrencias"][i]),
+            "acidentes": float(totais["acidentes"][i]),
+            # Não há valor de indenização no banco: acidentes por 1.000 de prêmio mensal
+            "sinistralidade": float(totais["acidentes"][i] * 1000 / totais["premio_mensal"][i]) if totais["premio_mensal"][i] else None,
+        }
+        for i, nome in enumerate(nomes)
+    ]
+
+
+def sinistralidade_por_cidade(session):
+    """Prêmio mensal, acidentes e acidentes por 1.000 de prêmio, por cidade"""
+    return _com_cache("sinistralidade_por_cidade", _sinistralidade_por_cidade, session)
+
+
+def _frequencia_acidentes(session, maiores):
+    logradouros, = buscar_colunas(session, Apartamento.logradouro)
+    fk_apartamentos, quantidades = buscar_colunas(session, Acidente.fk_apartamento, Acidente.qtd_acidentes)
+    acidentes = _somar_por(_posicoes(logradouros, fk_apartamentos), quantidades, len(logradouros))
+    if not len(acidentes):
+        return {"apartamentos": 0, "sem_acidentes": 0, "media": None, "p50": None, "p90": None, "p99": None, "maximo": None, "maiores": []}
+    p50, p90, p99 = np.percentile(acidentes, [50, 90, 99])
+    ordem = np.argsort(-acidentes, kind="stable")[:maiores]
+    return {
+        "apartamentos": len(acidentes),
+        "sem_acidentes": int((acidentes == 0).sum()),
+        "media": float(acidentes.mean()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "maximo": float(acidentes.max()),
+        "maiores": [(str(logradouros[i]), float(acidentes[i])) for i in ordem],
+    }
+
+
+def frequencia_acidentes_por_apartamento(session, maiores=10):
+    """Distribuição da quantidade de acidentes por apartamento e os apartamentos com mais acidentes"""
+    return _com_cache("frequencia_acidentes_por_apartamento", _frequencia_acidentes, session, maiores)
+
+
+def _premios_por_cobertura(session):
+    coberturas, valores = buscar_colunas(session, Apolice.cobertura, Apolice.valor_mensal)
+    preenchidos = ~np.isnan(valores)
+    coberturas, valores = coberturas[preenchidos], valores[preenchidos]
+    ordem = np.lexsort((valores, coberturas))
+    coberturas, valores = coberturas[ordem], valores[ordem]
+    nomes, inicios = np.unique(coberturas, return_index=True)
+    resultado = []
+    for nome, grupo in zip(nomes, np.split(valores, inicios[1:])):
+        p25, p50, p75 = np.percentile(grupo, [25, 50, 75])
+        resultado.append({
+            "cobertura": _texto(nome),
+            "apolices": len(grupo),
+            "total": float(grupo.sum()),
+            "media": float(grupo.mean()),
+            "minimo": float(grupo[0]),
+            "p25": float(p25),
+            "mediana": float(p50),
+            "p75": float(p75),
+            "maximo": float(grupo[-1]),
+        })
+    return resultado
+
+
+def premios_por_cobertura(session):
+    """Distribuição do valor mensal das apólices (quantidade, média e quartis) por cobertura"""
+    return _com_cache("premios_por_cobertura", _premios_por_cobertura, session)
+
+
+def _idades(nascimentos, referencia):
+    anos = nascimentos.astype("datetime64[Y]")
+    meses = nascimentos.astype("datetime64[M]")
+    mes = (meses - anos.astype("datetime64[M]")).astype(int) + 1
+    dia = (nascimentos - meses.astype("datetime64[D]")).astype(int) + 1
+    fez_aniversario = (mes < referencia.month) | ((mes == referencia.month) & (dia <= referencia.day))
+    return referencia.year - (anos.astype(int) + 1970) - (~fez_aniversario)
+
+
+def _clientes_por_faixa_etaria(session, referencia):
+    cpfs, nascimentos = buscar_colunas(session, Cliente.cpf, Cliente.data_nascimento)
+    fk_cpfs, valores = buscar_colunas(session, Apolice.fk_cpf, Apolice.valor_mensal)
+
+    rotulos = ROTULOS_FAIXAS + [SEM_DATA]
+    sem_data = np.isnat(nascimentos)
+    faixa = np.where(sem_data, len(ROTULOS_FAIXAS), np.digitize(_idades(nascimentos, referencia), FAIXAS_ETARIAS))
+    cliente = _posicoes(cpfs, fk_cpfs)
+    faixa_apolice = np.where(cliente >= 0, faixa[np.maximum(cliente, 0)], -1) if len(faixa) else cliente
+    clientes = np.bincount(faixa, minlength=len(rotulos))
+    apolices = _somar_por(faixa_apolice, np.ones(len(faixa_apolice)), len(rotulos))
+    premio = _somar_por(faixa_apolice, valores, len(rotulos))
+    return [
+        {
+            "faixa": rotulo,
+            "clientes": int(clientes[i]),
+            "apolices": int(apolices[i]),
+            "premio_mensal": float(premio[i]),
+            "premio_medio": float(premio[i] / apolices[i]) if apolices[i] else None,
+        }
+        for i, rotulo in enumerate(rotulos)
+    ]
+
+
+def clientes_por_faixa_etaria(session, referencia=None):
+    """Clientes, apólices e prêmio mensal por faixa de idade na data de referência (hoje por padrão)"""
+    return _com_cache("clientes_por_faixa_etaria", _clientes_por_faixa_etaria, session, referencia or date.today())
@@ -1,7 +1,22 @@
-import pymysql
-from sqlalchemy import create_engine, Column, String, Date, Integer, ForeignKey, func
+import base64
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import date
+from itertools import chain
+from sqlalchemy import text, create_engine, Index, Column, String, Date, Integer, BigInteger, ForeignKey, LargeBinary, func, event, inspect, select, tuple_, bindparam
+from sqlalchemy.dialects import mysql
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, subqueryload, Session, make_transient_to_detached
+from conexao import opcoes_pool, registrar_metricas_pool
+from cache import versao_cache, obter_do_cache, gravar_no_cache, invalidar_cache
+from seguranca import (
+    gerar_hash, verificar_senha, precisa_novo_hash, simular_verificacao, criar_sessao, obter_sessao,
+    encerrar_sessoes_do_usuario
+)
 
 # Configuração do banco de dados
 DB_USER = 'root'
@@ -10,24 +25,76 @@ DB_HOST = 'localhost'
 DB_PORT = '3306'
 DB_NAME = 'tde3'
 
-# Criação do banco de dados
-connection = pymysql.connect(
-    host=DB_HOST,
-    port=int(DB_PORT),
-    user=DB_USER,
-    password=DB_PASSWORD,
+# DATABASE_URL permite apontar para outro banco (por exemplo um SQLite local nos testes)
+SQLALCHEMY_DATABASE_URL = os.environ.get(
+    "DATABASE_URL", f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
-try:
-    with connection.cursor() as cursor:
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
-    connection.commit()
-finally:
-    connection.close()
+# A engine só é criada no primeiro uso (nada se conecta ao banco ao importar o app); a criação do
+# banco fica na etapa de instalação: python app.py
+_engine = None
+_trava_engine = threading.Lock()
+
+def criar_banco():
+    """Cria o banco MySQL se ainda não existir"""
+    url = make_url(SQLALCHEMY_DATABASE_URL)
+    if url.get_backend_name() != 'mysql':
+        return
+    import pymysql
+    connection = pymysql.connect(
+        host=url.host,
+        port=url.port or 3306,
+        user=url.username,
+        password=url.password,
+    )
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{url.database}`")
+        connection.commit()
+    finally:
+        connection.close()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _trava_engine:
+            if _engine is None:
+                engine = create_engine(SQLALCHEMY_DATABASE_URL, **opcoes_pool(SQLALCHEMY_DATABASE_URL))
+                registrar_metricas_pool(engine)
+                event.listen(engine, "commit", _invalidar_leituras_no_commit)
+                event.listen(engine, "rollback", _invalidar_leituras_no_rollback)
+                _engine = engine
+    return _engine
+
+# `app.engine` e `from app import engine` continuam funcionando, criando a engine nesse momento
+def __getattr__(nome):
+    if nome == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+# As sessões pegam a engine na primeira consulta, não ao serem criadas
+class SessaoPreguicosa(Session):
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(*args, **kwargs)
+
+SessionLocal = sessionmaker(class_=SessaoPreguicosa, autocommit=False, autoflush=False)
+
+# Uma sessão por operação: a conexão volta para o pool assim que o bloco termina
+@contextmanager
+def session_scope():
+    session = SessionLocal(expire_on_commit=False)
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 # Definição das tabelas
@@ -38,7 +105,12 @@ class Cliente(Base):
     contato = Column(String(50))
     data_nascimento = Column(Date)
     sexo = Column(String(10))
-    apolices = relationship("Apolice", back_populates="CLIENTE")
+    __table_args__ = (
+        Index('ix_clientes_nome', 'nome'),
+        # Busca textual (ver busca.py); só existe no MySQL
+        Index('ft_clientes_nome_contato', 'nome', 'contato', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+    apolices = relationship("Apolice", back_populates="cliente")
 
 class Apolice(Base):
     __tablename__ = 'apolices'
@@ -47,6 +119,10 @@ class Apolice(Base):
     valor_mensal = Column(Integer)
     cobertura = Column(String(100))
     fk_cpf = Column(String(11), ForeignKey('clientes.cpf'))
+    __table_args__ = (
+        Index('ix_apolices_valor_mensal', 'valor_mensal'),
+        Index('ix_apolices_fk_cpf', 'fk_cpf'),
+    )
     cliente = relationship("Cliente", back_populates="apolices")
     apartamentos = relationship("Apartamento", back_populates="apolice")
 
@@ -58,6 +134,10 @@ class Apartamento(Base):
     fk_seguro = Column(String(20), ForeignKey('apolices.n_seguro'))
     valor_mercado = Column(Integer)
     n_moradores = Column(Integer)
+    __table_args__ = (
+        Index('ix_apartamentos_cidade', 'cidade'),
+        Index('ix_apartamentos_fk_seguro', 'fk_seguro'),
+    )
     apolice = relationship("Apolice", back_populates="apartamentos")
     acidentes = relationship("Acidente", back_populates="apartamento")
 
@@ -69,18 +149,435 @@ class Acidente(Base):
     fk_apartamento = Column(String(100), ForeignKey('apartamentos.logradouro'))
     descricao = Column(String(255))
     envolvidos = Column(Integer)
+    __table_args__ = (
+        Index('ix_acidentes_data', 'data'),
+        Index('ix_acidentes_fk_apartamento', 'fk_apartamento'),
+        Index('ft_acidentes_descricao', 'descricao', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     apartamento = relationship("Apartamento", back_populates="acidentes")
 
+# Arquivo histórico (ver arquivamento.py): acidentes antigos e apólices inativas saem das tabelas
+# principais para estas, com as mesmas colunas e sem chaves estrangeiras. read_acidente e
+# read_apolice procuram aqui quando a linha não está na tabela principal, e delete_acidente e
+# delete_apolice apagam das duas; os checkpoints, as listagens e as consultas avançadas usam só
+# as tabelas principais (as consultas têm a opção incluir_arquivo).
+class AcidenteArquivado(Base):
+    __tablename__ = 'acidentes_arquivo'
+    id_acidente = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(Date)
+    qtd_acidentes = Column(Integer)
+    fk_apartamento = Column(String(100))
+    descricao = Column(String(255))
+    envolvidos = Column(Integer)
+    arquivado_em = Column(Date, nullable=False)
+    __table_args__ = (
+        Index('ix_acidentes_arquivo_data', 'data'),
+        Index('ix_acidentes_arquivo_fk_apartamento', 'fk_apartamento'),
+    )
+
+class ApoliceArquivada(Base):
+    __tablename__ = 'apolices_arquivo'
+    n_seguro = Column(String(20), primary_key=True)
+    data_inicio = Column(Date)
+    valor_mensal = Column(Integer)
+    cobertura = Column(String(100))
+    fk_cpf = Column(String(11))
+    arquivado_em = Column(Date, nullable=False)
+    __table_args__ = (
+        Index('ix_apolices_arquivo_valor_mensal', 'valor_mensal'),
+        Index('ix_apolices_arquivo_fk_cpf', 'fk_cpf'),
+    )
+
+ARQUIVOS = {Acidente: AcidenteArquivado, Apolice: ApoliceArquivada}
+
 class Usuario(Base):
     __tablename__ = 'usuarios'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    username = Column(String(50), unique=True, nullable=False)
-    password = Column(String(50), nullable=False)
+    username = Column(String(50), unique=True, nullable=False)  # o índice único atende o login
+    password = Column(String(255), nullable=False)  # hash scrypt (ver seguranca.py)
     role = Column(String(20), nullable=False)  # admin ou user
 
+# Checkpoints incrementais: um checkpoint "base" guarda o banco inteiro e os
+# checkpoints "delta" guardam apenas as linhas alteradas desde o anterior
+class Checkpoint(Base):
+    __tablename__ = 'checkpoints_incrementais'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    savepoint_name = Column(String(100), nullable=False, index=True)
+    tipo = Column(String(10), nullable=False)  # base ou delta
+    fk_anterior = Column(Integer, ForeignKey('checkpoints_incrementais.id'))
+    profundidade = Column(Integer, nullable=False, default=0)  # deltas desde a última base
+
+# Conteúdo dos checkpoints, dividido em blocos de NDJSON comprimido
+class CheckpointBloco(Base):
+    __tablename__ = 'checkpoint_blocos'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fk_checkpoint = Column(Integer, ForeignKey('checkpoints_incrementais.id'), nullable=False, index=True)
+    tabela = Column(String(20), nullable=False)
+    tipo = Column(String(10), nullable=False)  # upserts ou deletes
+    dados = Column(LargeBinary().with_variant(mysql.LONGBLOB(), 'mysql'), nullable=False)
+
+# Linhas já gravadas de cada arquivo importado (ver importacao.py), atualizadas na mesma
+# transação de cada lote para a importação poder continuar de onde parou
+class ProgressoImportacao(Base):
+    __tablename__ = 'progresso_importacao'
+    arquivo = Column(String(64), primary_key=True)  # hash do caminho, tamanho e data do arquivo
+    tabela = Column(String(20), nullable=False)
+    linhas = Column(Integer, nullable=False, default=0)
+    rejeitadas = Column(Integer, nullable=False, default=0)
+
+# Registro das chaves alteradas desde o último checkpoint
+class Alteracao(Base):
+    __tablename__ = 'alteracoes'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tabela = Column(String(20), nullable=False)
+    chave = Column(String(100), nullable=False)
+
+# Resumo dos apartamentos por cidade, atualizado a cada escrita em apartamentos para que
+# as consultas por cidade não precisem agrupar a tabela inteira.
+# Apartamentos sem cidade ficam de fora do resumo (contar_apartamentos_por_cidade conta à parte).
+class ResumoCidade(Base):
+    __tablename__ = 'resumo_cidades'
+    cidade = Column(String(50), primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    soma_valor_mercado = Column(BigInteger, nullable=False, default=0)
+    qtd_valor_mercado = Column(Integer, nullable=False, default=0)  # linhas com valor preenchido, para a média
+    soma_metragem = Column(BigInteger, nullable=False, default=0)
+    qtd_metragem = Column(Integer, nullable=False, default=0)
+
+# Versão dos dados de cada tabela, incrementada no commit de toda transação que alterou a tabela.
+# É o que os processos comparam para saber se o que guardaram em memória (o índice de busca, por
+# exemplo) ainda vale, inclusive depois de escritas feitas por outros processos.
+class VersaoTabela(Base):
+    __tablename__ = 'versoes_tabelas'
+    tabela = Column(String(20), primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0)
+
+# Marcador gravado após um rollback: o próximo checkpoint precisa ser uma base
+MARCADOR_ROLLBACK = '*'
+
+MODELOS_RASTREADOS = (Cliente, Apolice, Apartamento, Acidente)
+
+def registrar_alteracoes(connection, tabela, chaves):
+    # Usado também por escritas feitas direto pelo Core, que não disparam eventos do ORM
+    registros = [{"tabela": tabela, "chave": str(chave)} for chave in chaves]
+    if registros:
+        connection.execute(Alteracao.__table__.insert(), registros)
+        _invalidar_leituras(connection, [(tabela, chave) for chave in chaves])
+        registrar_tabelas_alteradas(connection, [tabela])
+
+# Tabelas cuja versão (VersaoTabela) é incrementada no commit desta transação; usado também pela
+# restauração de checkpoints, que regrava as tabelas sem passar pelo registro de alterações
+def registrar_tabelas_alteradas(connection, tabelas):
+    connection.info.setdefault("tabelas_alteradas", set()).update(tabelas)
+
+def versao_dados(connection, tabela):
+    return connection.execute(select(VersaoTabela.versao).where(VersaoTabela.tabela == tabela)).scalar() or 0
+
+# Incrementada por último, logo antes do commit, para a linha da versão ficar bloqueada o mínimo
+# possível. O savepoint (begin_nested) não incrementa: a transação de fora incrementa no commit dela
+@event.listens_for(Session, "before_commit")
+def _incrementar_versoes(session):
+    if session.in_nested_transaction():
+        return
+    # O commit faria o flush depois deste evento; as tabelas alteradas por ele também contam
+    session.flush()
+    connection = session.connection()
+    versoes = connection.info.setdefault("versoes_dados", {})
+    for tabela in sorted(connection.info.pop("tabelas_alteradas", ())):
+        comando = VersaoTabela.__table__.update().where(VersaoTabela.tabela == tabela)
+        connection.execute(comando.values(versao=VersaoTabela.versao + 1))
+        versoes[tabela] = versao_dados(connection, tabela)
+
+# As chaves alteradas saem do cache de leituras na hora e de novo no commit, para
+# descartar o que outra sessão tenha lido (com o valor antigo) nesse meio tempo
+def _invalidar_leituras(connection, chaves):
+    for tabela, chave in chaves:
+        invalidar_cache(tabela, [chave])
+    connection.info.setdefault("cache_pendente", set()).update(chaves)
+
+# Funções chamadas após cada commit com as chaves (tabela, chave) alteradas e as versões
+# gravadas por esse commit ({tabela: versão}); usado pelo índice de busca em memória (ver busca.py)
+ao_confirmar_alteracoes = []
+
+def _invalidar_leituras_no_commit(connection):
+    chaves = connection.info.pop("cache_pendente", ())
+    versoes = connection.info.pop("versoes_dados", {})
+    for tabela, chave in chaves:
+        invalidar_cache(tabela, [chave])
+    if chaves or versoes:
+        for funcao in ao_confirmar_alteracoes:
+            funcao(chaves, versoes)
+
+# No rollback as chaves também saem do cache: a própria transação pode ter lido (e guardado no
+# cache) o valor que acabou de gravar e que foi desfeito. O índice de busca lê só o que foi
+# confirmado e não é avisado
+def _invalidar_leituras_no_rollback(connection):
+    connection.info.pop("tabelas_alteradas", None)
+    connection.info.pop("versoes_dados", None)
+    for tabela, chave in connection.info.pop("cache_pendente", ()):
+        invalidar_cache(tabela, [chave])
+
+@event.listens_for(Session, "after_flush")
+def _registrar_alteracoes_orm(session, flush_context):
+    chaves = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, MODELOS_RASTREADOS):
+            continue
+        estado = inspect(obj)
+        # Guarda a chave antiga (identity) e a atual, caso a chave primária tenha mudado
+        if estado.identity:
+            chaves.add((obj.__tablename__, estado.identity[0]))
+        chaves.add((obj.__tablename__, estado.mapper.primary_key_from_instance(obj)[0]))
+    if chaves:
+        session.connection().execute(
+            Alteracao.__table__.insert(),
+            [{"tabela": tabela, "chave": str(chave)} for tabela, chave in chaves]
+        )
+        _invalidar_leituras(session.connection(), chaves)
+        registrar_tabelas_alteradas(session.connection(), {tabela for tabela, _ in chaves})
+
+# Manutenção do resumo por cidade: as escritas leem (cidade, valor_mercado, metragem) das
+# linhas afetadas antes e depois de gravar e somam a diferença no resumo, na mesma transação
+def _linhas_resumo(connection, modelo, chaves):
+    if modelo is not Apartamento or not chaves:
+        return []
+    consulta = select(Apartamento.cidade, Apartamento.valor_mercado, Apartamento.metragem).where(
+        Apartamento.logradouro.in_(chaves)
+    )
+    return connection.execute(consulta).all()
+
+def _somar_no_resumo(connection, registros):
+    # Soma os valores na linha da cidade, criando-a se ainda não existir
+    tabela = ResumoCidade.__table__
+    colunas = [c for c in tabela.columns.keys() if c != "cidade"]
+    if connection.dialect.name == 'mysql':
+        comando = mysql.insert(tabela).values(registros)
+        connection.execute(comando.on_duplicate_key_update({c: tabela.c[c] + comando.inserted[c] for c in colunas}))
+        return
+    if connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects import sqlite
+        comando = sqlite.insert(tabela).values(registros)
+        connection.execute(comando.on_conflict_do_update(index_elements=["cidade"], set_={c: tabela.c[c] + comando.excluded[c] for c in colunas}))
+        return
+    # Demais bancos: as cidades que já existem são travadas e somadas, as outras são inseridas. Se
+    # outra transação criar a mesma cidade ao mesmo tempo, uma das duas falha com chave duplicada
+    existentes = set(connection.execute(
+        select(tabela.c.cidade).where(tabela.c.cidade.in_([r["cidade"] for r in registros])).with_for_update()
+    ).scalars())
+    somadas = [{f"_{c}": v for c, v in r.items()} for r in registros if r["cidade"] in existentes]
+    if somadas:
+        comando = tabela.update().where(tabela.c.cidade == bindparam("_cidade"))
+        connection.execute(comando.values({c: tabela.c[c] + bindparam(f"_{c}") for c in colunas}), somadas)
+    novas = [r for r in registros if r["cidade"] not in existentes]
+    if novas:
+        connection.execute(tabela.insert(), novas)
+
+def _ajustar_resumo_cidades(connection, antigas, novas):
+    deltas = {}
+    for linhas, sinal in ((antigas, -1), (novas, 1)):
+        for cidade, valor_mercado, metragem in linhas:
+            if cidade is None:
+                continue
+            delta = deltas.setdefault(cidade, [0, 0, 0, 0, 0])
+            delta[0] += sinal
+            if valor_mercado is not None:
+                delta[1] += sinal * (valor_mercado or 0)
+                delta[2] += sinal
+            if metragem is not None:
+                delta[3] += sinal * (metragem or 0)
+                delta[4] += sinal
+    # Ordenadas para que transações concorrentes travem as cidades sempre na mesma ordem
+    registros = [
+        {"cidade": cidade, "quantidade": d[0], "soma_valor_mercado": d[1], "qtd_valor_mercado": d[2],
+         "soma_metragem": d[3], "qtd_metragem": d[4]}
+        for cidade, d in sorted(deltas.items()) if any(d)
+    ]
+    if not registros:
+        return
+    _somar_no_resumo(connection, registros)
+    tabela = ResumoCidade.__table__
+    connection.execute(tabela.delete().where(
+        tabela.c.cidade.in_([r["cidade"] for r in registros]), tabela.c.quantidade <= 0
+    ))
+
+COLUNAS_RESUMO = ("cidade", "valor_mercado", "metragem")
+
+def _altera_resumo(session, obj):
+    if obj in session.new or obj in session.deleted:
+        return True
+    estado = inspect(obj)
+    return any(estado.attrs[c].history.has_changes() for c in COLUNAS_RESUMO)
+
+@event.listens_for(Session, "before_flush")
+def _ler_resumo_antigo(session, flush_context, instances):
+    # Os valores antigos são lidos do banco antes do flush: depois de um commit os atributos
+    # expiram e o histórico não guarda mais o valor anterior
+    chaves = [
+        inspect(obj).identity[0] for obj in chain(session.dirty, session.deleted)
+        if isinstance(obj, Apartamento) and inspect(obj).identity and _altera_resumo(session, obj)
+    ]
+    session.info["resumo_antigo"] = _linhas_resumo(session.connection(), Apartamento, chaves)
+
+@event.listens_for(Session, "after_flush")
+def _ajustar_resumo_orm(session, flush_context):
+    # Escritas pelo ORM (create_apartamento, objetos alterados na sessão): os valores antigos
+    # foram lidos no before_flush e os novos são lidos do banco já com o flush aplicado
+    antigas = session.info.pop("resumo_antigo", [])
+    chaves = [
+        obj.logradouro for obj in chain(session.new, session.dirty)
+        if isinstance(obj, Apartamento) and _altera_resumo(session, obj)
+    ]
+    if antigas or chaves:
+        connection = session.connection()
+        _ajustar_resumo_cidades(connection, antigas, _linhas_resumo(connection, Apartamento, chaves))
+
+def reconstruir_resumo_cidades(connection):
+    """Recalcula o resumo inteiro a partir de apartamentos"""
+    tabela = ResumoCidade.__table__
+    connection.execute(tabela.delete())
+    connection.execute(tabela.insert().from_select(
+        [c for c in tabela.columns.keys()],
+        select(
+            Apartamento.cidade,
+            func.count(),
+            func.coalesce(func.sum(Apartamento.valor_mercado), 0),
+            func.count(Apartamento.valor_mercado),
+            func.coalesce(func.sum(Apartamento.metragem), 0),
+            func.count(Apartamento.metragem),
+        ).where(Apartamento.cidade.isnot(None)).group_by(Apartamento.cidade)
+    ))
+
 # Criação das tabelas
 def create_tables():
+    engine = get_engine()
     Base.metadata.create_all(engine)
+    create_indexes()
+    migrar_usuarios()
+    # Resumo criado agora sobre uma tabela de apartamentos que já tinha dados
+    with engine.begin() as connection:
+        existentes = set(connection.execute(select(VersaoTabela.tabela)).scalars())
+        novas = [{"tabela": m.__tablename__, "versao": 0} for m in MODELOS_RASTREADOS if m.__tablename__ not in existentes]
+        if novas:
+            connection.execute(VersaoTabela.__table__.insert(), novas)
+        resumo_vazio = connection.execute(select(func.count()).select_from(ResumoCidade.__table__)).scalar() == 0
+        if resumo_vazio and connection.execute(select(Apartamento.logradouro).limit(1)).first():
+            reconstruir_resumo_cidades(connection)
+
+# Tabelas de usuários criadas antes do hash de senhas: a coluna de senha tinha 50 caracteres
+# e o login usava um índice (username, password). As senhas em texto puro são convertidas
+# para hash no próximo login de cada usuário.
+def migrar_usuarios():
+    engine = get_engine()
+    inspetor = inspect(engine)
+    with engine.begin() as connection:
+        if 'ix_usuarios_username_password' in {indice["name"] for indice in inspetor.get_indexes('usuarios')}:
+            connection.execute(text("DROP INDEX ix_usuarios_username_password ON usuarios")
+                               if engine.dialect.name == 'mysql' else text("DROP INDEX ix_usuarios_username_password"))
+        senha = next(coluna for coluna in inspetor.get_columns('usuarios') if coluna["name"] == 'password')
+        if engine.dialect.name == 'mysql' and (senha["type"].length or 0) < 255:
+            connection.execute(text("ALTER TABLE usuarios MODIFY password VARCHAR(255) NOT NULL"))
+
+# O create_all não cria índices novos em tabelas que já existem; aqui eles são adicionados
+def create_indexes():
+    engine = get_engine()
+    inspetor = inspect(engine)
+    criados = []
+    for tabela in Base.metadata.sorted_tables:
+        existentes = {indice["name"] for indice in inspetor.get_indexes(tabela.name)}
+        faltando = [indice for indice in tabela.indexes if indice.name not in existentes]
+        for indice in faltando:
+            indice.create(bind=engine)
+        if faltando:
+            # Índices restritos a um banco (ddl_if) não são criados nos demais
+            criados += sorted({indice["name"] for indice in inspect(engine).get_indexes(tabela.name)} - existentes)
+    return criados
+
+# Atualizações e deleções são feitas com um único UPDATE/DELETE pela chave primária,
+# sem carregar o objeto antes, e retornam a quantidade de linhas afetadas
+def _atualizar(session, modelo, chave, valores):
+    valores = {coluna: valor for coluna, valor in valores.items() if valor}
+    if not valores:
+        return 0
+    coluna = modelo.__mapper__.primary_key[0]
+    chaves = [chave, valores.get(coluna.key, chave)]
+    antigas = _linhas_resumo(session.connection(), modelo, chaves[:1])
+    linhas = session.query(modelo).filter(coluna == chave).update(valores, synchronize_session=False)
+    if linhas:
+        _ajustar_resumo_cidades(session.connection(), antigas, _linhas_resumo(session.connection(), modelo, chaves[1:]))
+        registrar_alteracoes(session.connection(), modelo.__tablename__, [chave])
+    elif modelo in ARQUIVOS:
+        linhas = _atualizar_arquivada(session, modelo, chave, valores)
+    session.commit()
+    return linhas
+
+# Alterar uma linha arquivada (que read_apolice e read_acidente exibem) a devolve à tabela
+# principal já com os valores novos; a chave estrangeira precisa existir na tabela principal
+def _atualizar_arquivada(session, modelo, chave, valores):
+    arquivo = ARQUIVOS[modelo].__table__
+    coluna = arquivo.c[modelo.__mapper__.primary_key[0].name]
+    linha = session.execute(
+        select(*[arquivo.c[c] for c in modelo.__table__.columns.keys()]).where(coluna == chave)
+    ).mappings().first()
+    if linha is None:
+        return 0
+    session.execute(arquivo.delete().where(coluna == chave))
+    session.execute(modelo.__table__.insert(), {**linha, **valores})
+    registrar_alteracoes(session.connection(), modelo.__tablename__, [chave])
+    return 1
+
+# Ao deletar um pai, o ORM deixava a chave estrangeira dos filhos como NULL; o mesmo é feito aqui
+FILHOS = {
+    Cliente: Apolice.fk_cpf,
+    Apolice: Apartamento.fk_seguro,
+    Apartamento: Acidente.fk_apartamento,
+}
+
+def _deletar(session, modelo, chave):
+    coluna = modelo.__mapper__.primary_key[0]
+    fk = FILHOS.get(modelo)
+    if fk is not None:
+        filho = fk.class_
+        chave_filho = filho.__mapper__.primary_key[0]
+        # As chaves dos filhos são lidas antes para registrá-las e tirá-las do cache de leituras
+        filhos = session.execute(select(chave_filho).where(fk == chave)).scalars().all()
+        if filhos:
+            session.query(filho).filter(fk == chave).update({fk: None}, synchronize_session=False)
+            registrar_alteracoes(session.connection(), filho.__tablename__, filhos)
+    antigas = _linhas_resumo(session.connection(), modelo, [chave])
+    linhas = session.query(modelo).filter(coluna == chave).delete(synchronize_session=False)
+    if linhas:
+        _ajustar_resumo_cidades(session.connection(), antigas, [])
+        registrar_alteracoes(session.connection(), modelo.__tablename__, [chave])
+    session.commit()
+    return linhas
+
+# Leitura por chave primária passando pelo cache (ver cache.py). Só linhas encontradas
+# são guardadas; num acerto o objeto é montado a partir das colunas sem ir ao banco.
+def _ler(session, modelo, chave):
+    tabela = modelo.__tablename__
+    valores = obter_do_cache(tabela, chave)
+    if valores is not None:
+        objeto = modelo(**valores)
+        make_transient_to_detached(objeto)
+        return session.merge(objeto, load=False)
+    versao = versao_cache()
+    coluna = modelo.__mapper__.primary_key[0]
+    objeto = session.query(modelo).filter(coluna == chave).first()
+    if objeto is not None:
+        valores = {c.key: getattr(objeto, c.key) for c in modelo.__mapper__.column_attrs}
+        # Não grava se alguma escrita invalidou o cache durante a consulta
+        gravar_no_cache(tabela, chave, valores, versao)
+    return objeto
+
+# Linhas arquivadas: só consultadas depois de uma falta na tabela principal, sempre no banco
+# (o arquivamento e a deleção apagam do arquivo sem passar pelos objetos da sessão)
+def _ler_arquivo(session, modelo, chave):
+    return session.get(ARQUIVOS[modelo], chave, populate_existing=True)
+
+# Sem commit: a deleção na tabela principal, feita em seguida, confirma as duas
+def _deletar_arquivo(session, modelo, chave):
+    arquivo = ARQUIVOS[modelo]
+    return session.query(arquivo).filter(arquivo.__mapper__.primary_key[0] == chave).delete(synchronize_session=False)
 
 # Funções CRUD - Cliente
 def create_cliente(session, cpf, nome, contato, data_nascimento, sexo):
@@ -89,22 +586,13 @@ def create_cliente(session, cpf, nome, contato, data_nascimento, sexo):
     session.commit()
 
 def read_cliente(session, cpf):
-    return session.query(Cliente).filter_by(cpf=cpf).first()
+    return _ler(session, Cliente, cpf)
 
 def update_cliente(session, cpf, nome=None, contato=None, data_nascimento=None, sexo=None):
-    cliente = session.query(Cliente).filter_by(cpf=cpf).first()
-    if cliente:
-        if nome: cliente.nome = nome
-        if contato: cliente.contato = contato
-        if data_nascimento: cliente.data_nascimento = data_nascimento
-        if sexo: cliente.sexo = sexo
-        session.commit()
+    return _atualizar(session, Cliente, cpf, {"nome": nome, "contato": contato, "data_nascimento": data_nascimento, "sexo": sexo})
 
 def delete_cliente(session, cpf):
-    cliente = session.query(Cliente).filter_by(cpf=cpf).first()
-    if cliente:
-        session.delete(cliente)
-        session.commit()
+    return _deletar(session, Cliente, cpf)
 
 # Funções CRUD - Apólice
 def create_apolice(session, n_seguro, data_inicio, valor_mensal, cobertura, fk_cpf):
@@ -113,22 +601,13 @@ def create_apolice(session, n_seguro, data_inicio, valor_mensal, cobertura, fk_c
     session.commit()
 
 def read_apolice(session, n_seguro):
-    return session.query(Apolice).filter_by(n_seguro=n_seguro).first()
+    return _ler(session, Apolice, n_seguro) or _ler_arquivo(session, Apolice, n_seguro)
 
 def update_apolice(session, n_seguro, data_inicio=None, valor_mensal=None, cobertura=None, fk_cpf=None):
-    apolice = session.query(Apolice).filter_by(n_seguro=n_seguro).first()
-    if apolice:
-        if data_inicio: apolice.data_inicio = data_inicio
-        if valor_mensal: apolice.valor_mensal = valor_mensal
-        if cobertura: apolice.cobertura = cobertura
-        if fk_cpf: apolice.fk_cpf = fk_cpf
-        session.commit()
+    return _atualizar(session, Apolice, n_seguro, {"data_inicio": data_inicio, "valor_mensal": valor_mensal, "cobertura": cobertura, "fk_cpf": fk_cpf})
 
 def delete_apolice(session, n_seguro):
-    apolice = session.query(Apolice).filter_by(n_seguro=n_seguro).first()
-    if apolice:
-        session.delete(apolice)
-        session.commit()
+    return _deletar_arquivo(session, Apolice, n_seguro) + _deletar(session, Apolice, n_seguro)
 
 # Funções CRUD - Apartamento
 def create_apartamento(session, logradouro, cidade, metragem, fk_seguro, valor_mercado, n_moradores):
@@ -137,23 +616,13 @@ def create_apartamento(session, logradouro, cidade, metragem, fk_seguro, valor_m
     session.commit()
 
 def read_apartamento(session, logradouro):
-    return session.query(Apartamento).filter_by(logradouro=logradouro).first()
+    return _ler(session, Apartamento, logradouro)
 
 def update_apartamento(session, logradouro, cidade=None, metragem=None, fk_seguro=None, valor_mercado=None, n_moradores=None):
-    apartamento = session.query(Apartamento).filter_by(logradouro=logradouro).first()
-    if apartamento:
-        if cidade: apartamento.cidade = cidade
-        if metragem: apartamento.metragem = metragem
-        if fk_seguro: apartamento.fk_seguro = fk_seguro
-        if valor_mercado: apartamento.valor_mercado = valor_mercado
-        if n_moradores: apartamento.n_moradores = n_moradores
-        session.commit()
+    return _atualizar(session, Apartamento, logradouro, {"cidade": cidade, "metragem": metragem, "fk_seguro": fk_seguro, "valor_mercado": valor_mercado, "n_moradores": n_moradores})
 
 def delete_apartamento(session, logradouro):
-    apartamento = session.query(Apartamento).filter_by(logradouro=logradouro).first()
-    if apartamento:
-        session.delete(apartamento)
-        session.commit()
+    return _deletar(session, Apartamento, logradouro)
 
 # Funções CRUD - Acidente
 def create_acidente(session, id_acidente, data, qtd_acidentes, fk_apartamento, descricao, envolvidos):
@@ -162,44 +631,455 @@ def create_acidente(session, id_acidente, data, qtd_acidentes, fk_apartamento, d
     session.commit()
 
 def read_acidente(session, id_acidente):
-    return session.query(Acidente).filter_by(id_acidente=id_acidente).first()
+    return _ler(session, Acidente, id_acidente) or _ler_arquivo(session, Acidente, id_acidente)
 
 def update_acidente(session, id_acidente, data=None, qtd_acidentes=None, fk_apartamento=None, descricao=None, envolvidos=None):
-    acidente = session.query(Acidente).filter_by(id_acidente=id_acidente).first()
-    if acidente:
-        if data: acidente.data = data
-        if qtd_acidentes: acidente.qtd_acidentes = qtd_acidentes
-        if fk_apartamento: acidente.fk_apartamento = fk_apartamento
-        if descricao: acidente.descricao = descricao
-        if envolvidos: acidente.envolvidos = envolvidos
-        session.commit()
+    return _atualizar(session, Acidente, id_acidente, {"data": data, "qtd_acidentes": qtd_acidentes, "fk_apartamento": fk_apartamento, "descricao": descricao, "envolvidos": envolvidos})
 
 def delete_acidente(session, id_acidente):
-    acidente = session.query(Acidente).filter_by(id_acidente=id_acidente).first()
-    if acidente:
-        session.delete(acidente)
-        session.commit()
+    return _deletar_arquivo(session, Acidente, id_acidente) + _deletar(session, Acidente, id_acidente)
+
+# Operações em lote
+# Cada lote é gravado com um único INSERT/DELETE de várias linhas e um único commit.
+# Se o lote falhar, ele é refeito linha a linha (com savepoints) para identificar as linhas com erro.
+TAMANHO_LOTE_BULK = 1000
+
+def _em_lotes(registros, tamanho_lote):
+    lote = []
+    for indice, registro in enumerate(registros):
+        lote.append((indice, registro))
+        if len(lote) >= tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def _gravar_lote(session, modelo, comando, parametros, chaves):
+    connection = session.connection()
+    antigas = _linhas_resumo(connection, modelo, chaves)
+    if callable(comando):
+        comando(connection)
+    else:
+        session.execute(comando, parametros)
+    _ajustar_resumo_cidades(connection, antigas, _linhas_resumo(connection, modelo, chaves))
+    registrar_alteracoes(connection, modelo.__tablename__, chaves)
+
+def _executar_bulk(session, modelo, registros, tamanho_lote, montar_comando, chave_do_registro):
+    relatorio = {"sucesso": 0, "erros": []}
+    for lote in _em_lotes(registros, tamanho_lote):
+        try:
+            comando, parametros = montar_comando([registro for _, registro in lote])
+            _gravar_lote(session, modelo, comando, parametros, [chave_do_registro(r) for _, r in lote])
+            session.commit()
+            relatorio["sucesso"] += len(lote)
+        except Exception:
+            session.rollback()
+            for indice, registro in lote:
+                try:
+                    with session.begin_nested():
+                        comando, parametros = montar_comando([registro])
+                        _gravar_lote(session, modelo, comando, parametros, [chave_do_registro(registro)])
+                    relatorio["sucesso"] += 1
+                except Exception as e:
+                    relatorio["erros"].append({"indice": indice, "registro": registro, "erro": str(e)})
+            session.commit()
+    return relatorio
+
+def _validar_registro(tabela, registro):
+    desconhecidas = set(registro) - set(tabela.columns.keys())
+    if desconhecidas:
+        raise ValueError(f"Colunas desconhecidas para {tabela.name}: {', '.join(sorted(desconhecidas))}")
+    return {coluna: registro.get(coluna) for coluna in tabela.columns.keys()}
+
+def _upsert_generico(tabela, chave, demais, registros):
+    # Demais bancos: as chaves que já existem são travadas e atualizadas, as outras são inseridas,
+    # tudo na transação do lote. Como em _somar_no_resumo, se outra transação inserir a mesma chave
+    # ao mesmo tempo o lote falha com chave duplicada e é refeito linha a linha
+    def gravar(connection):
+        existentes = set(connection.execute(
+            select(tabela.c[chave]).where(tabela.c[chave].in_([r[chave] for r in registros])).with_for_update()
+        ).scalars())
+        atualizadas = [{f"_{c}": v for c, v in r.items()} for r in registros if r[chave] in existentes]
+        if atualizadas:
+            comando = tabela.update().where(tabela.c[chave] == bindparam(f"_{chave}"))
+            connection.execute(comando.values({c: bindparam(f"_{c}") for c in demais}), atualizadas)
+        novas = [r for r in registros if r[chave] not in existentes]
+        if novas:
+            connection.execute(tabela.insert(), novas)
+    return gravar
+
+def _comando_upsert(session, tabela, registros):
+    # INSERT ... ON DUPLICATE KEY UPDATE no MySQL, ON CONFLICT no SQLite; nos demais bancos, uma
+    # função que _gravar_lote executa na conexão da transação
+    chave = list(tabela.primary_key.columns)[0].name
+    demais = [c for c in tabela.columns.keys() if c != chave]
+    dialeto = session.get_bind().dialect.name
+    if dialeto == 'mysql':
+        comando = mysql.insert(tabela).values(registros)
+        return comando.on_duplicate_key_update({c: comando.inserted[c] for c in demais})
+    if dialeto == 'sqlite':
+        from sqlalchemy.dialects import sqlite
+        comando = sqlite.insert(tabela).values(registros)
+        return comando.on_conflict_do_update(index_elements=[chave], set_={c: comando.excluded[c] for c in demais})
+    return _upsert_generico(tabela, chave, demais, registros)
+
+# Insere registros já validados sem fazer commit, para quem precisa gravar mais algo na mesma transação
+def inserir_lote(session, modelo, registros):
+    tabela = modelo.__table__
+    chave = list(tabela.primary_key.columns)[0].name
+    _gravar_lote(session, modelo, tabela.insert(), [_validar_registro(tabela, r) for r in registros], [r.get(chave) for r in registros])
+
+def create_bulk(session, modelo, registros, tamanho_lote=TAMANHO_LOTE_BULK):
+    tabela = modelo.__table__
+    chave = list(tabela.primary_key.columns)[0].name
+    def montar(lote):
+        return tabela.insert(), [_validar_registro(tabela, r) for r in lote]
+    return _executar_bulk(session, modelo, registros, tamanho_lote, montar, lambda r: r.get(chave))
+
+def upsert_bulk(session, modelo, registros, tamanho_lote=TAMANHO_LOTE_BULK):
+    tabela = modelo.__table__
+    chave = list(tabela.primary_key.columns)[0].name
+    def montar(lote):
+        return _comando_upsert(session, tabela, [_validar_registro(tabela, r) for r in lote]), None
+    return _executar_bulk(session, modelo, registros, tamanho_lote, montar, lambda r: r.get(chave))
+
+def delete_bulk(session, modelo, chaves, tamanho_lote=TAMANHO_LOTE_BULK):
+    tabela = modelo.__table__
+    coluna = list(tabela.primary_key.columns)[0]
+    def montar(lote):
+        return tabela.delete().where(coluna.in_(lote)), None
+    return _executar_bulk(session, modelo, chaves, tamanho_lote, montar, lambda c: c)
+
+def create_clientes_bulk(session, clientes, tamanho_lote=TAMANHO_LOTE_BULK):
+    return create_bulk(session, Cliente, clientes, tamanho_lote)
+
+def upsert_clientes_bulk(session, clientes, tamanho_lote=TAMANHO_LOTE_BULK):
+    return upsert_bulk(session, Cliente, clientes, tamanho_lote)
+
+def delete_clientes_bulk(session, cpfs, tamanho_lote=TAMANHO_LOTE_BULK):
+    return delete_bulk(session, Cliente, cpfs, tamanho_lote)
+
+def create_apolices_bulk(session, apolices, tamanho_lote=TAMANHO_LOTE_BULK):
+    return create_bulk(session, Apolice, apolices, tamanho_lote)
+
+def upsert_apolices_bulk(session, apolices, tamanho_lote=TAMANHO_LOTE_BULK):
+    return upsert_bulk(session, Apolice, apolices, tamanho_lote)
+
+def delete_apolices_bulk(session, n_seguros, tamanho_lote=TAMANHO_LOTE_BULK):
+    return delete_bulk(session, Apolice, n_seguros, tamanho_lote)
+
+def create_apartamentos_bulk(session, apartamentos, tamanho_lote=TAMANHO_LOTE_BULK):
+    return create_bulk(session, Apartamento, apartamentos, tamanho_lote)
+
+def upsert_apartamentos_bulk(session, apartamentos, tamanho_lote=TAMANHO_LOTE_BULK):
+    return upsert_bulk(session, Apartamento, apartamentos, tamanho_lote)
+
+def delete_apartamentos_bulk(session, logradouros, tamanho_lote=TAMANHO_LOTE_BULK):
+    return delete_bulk(session, Apartamento, logradouros, tamanho_lote)
+
+def create_acidentes_bulk(session, acidentes, tamanho_lote=TAMANHO_LOTE_BULK):
+    return create_bulk(session, Acidente, acidentes, tamanho_lote)
+
+def upsert_acidentes_bulk(session, acidentes, tamanho_lote=TAMANHO_LOTE_BULK):
+    return upsert_bulk(session, Acidente, acidentes, tamanho_lote)
+
+def delete_acidentes_bulk(session, ids_acidente, tamanho_lote=TAMANHO_LOTE_BULK):
+    return delete_bulk(session, Acidente, ids_acidente, tamanho_lote)
+
+# Listagens paginadas
+# Paginação por chave (keyset): cada página continua a partir da última linha da anterior
+# com WHERE (coluna, chave) > (último valor, última chave), então o custo não cresce com a profundidade.
+# Linhas com NULL na coluna de ordenação só aparecem quando a ordenação é pela chave primária.
+LIMITE_PAGINA = 50
+
+OPERADORES_FILTRO = {
+    "gt": lambda coluna, valor: coluna > valor,
+    "gte": lambda coluna, valor: coluna >= valor,
+    "lt": lambda coluna, valor: coluna < valor,
+    "lte": lambda coluna, valor: coluna <= valor,
+    "like": lambda coluna, valor: coluna.like(valor),
+}
+
+def _codificar_cursor(valores):
+    dados = json.dumps([v.isoformat() if isinstance(v, date) else v for v in valores])
+    return base64.urlsafe_b64encode(dados.encode("utf-8")).decode("ascii")
+
+def _decodificar_cursor(cursor, colunas):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor de paginação inválido")
+    if len(valores) != len(colunas):
+        raise ValueError("Cursor de paginação inválido")
+    return [
+        date.fromisoformat(v) if isinstance(v, str) and c.type.python_type is date else v
+        for v, c in zip(valores, colunas)
+    ]
+
+def _filtrar(consulta, modelos, filtros):
+    for nome, valor in filtros.items():
+        campo, _, operador = nome.partition("__")
+        coluna = next((getattr(m, campo) for m in modelos if campo in m.__table__.columns), None)
+        if coluna is None:
+            raise ValueError(f"Filtro desconhecido: {nome}")
+        if operador:
+            if operador not in OPERADORES_FILTRO:
+                raise ValueError(f"Operador de filtro desconhecido: {operador}")
+            consulta = consulta.filter(OPERADORES_FILTRO[operador](coluna, valor))
+        else:
+            consulta = consulta.filter(coluna == valor)
+    return consulta
+
+def _paginar(consulta, modelos, limite, cursor, ordenar_por, descendente):
+    # A chave primária do primeiro modelo desempata a coluna de ordenação
+    chave = modelos[0].__mapper__.primary_key[0]
+    if ordenar_por is None or ordenar_por == chave.key:
+        colunas = [chave]
+    else:
+        for modelo in modelos:
+            if ordenar_por in modelo.__table__.columns:
+                colunas = [getattr(modelo, ordenar_por), chave]
+                break
+        else:
+            raise ValueError(f"Coluna de ordenação desconhecida: {ordenar_por}")
+
+    if len(colunas) == 2:
+        consulta = consulta.filter(colunas[0].isnot(None))
+    if cursor:
+        valores = _decodificar_cursor(cursor, colunas)
+        if descendente:
+            consulta = consulta.filter(tuple_(*colunas) < tuple_(*valores))
+        else:
+            consulta = consulta.filter(tuple_(*colunas) > tuple_(*valores))
+    consulta = consulta.order_by(*[c.desc() if descendente else c.asc() for c in colunas])
+
+    # Uma linha a mais indica se existe próxima página
+    itens = consulta.limit(limite + 1).all()
+    proximo_cursor = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        proximo_cursor = _codificar_cursor([getattr(itens[-1], c.key) for c in colunas])
+    return {"itens": itens, "proximo_cursor": proximo_cursor}
+
+def listar(session, modelo, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    consulta = _filtrar(session.query(modelo), (modelo,), filtros)
+    return _paginar(consulta, (modelo,), limite, cursor, ordenar_por, descendente)
+
+def list_clientes(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return listar(session, Cliente, limite, cursor, ordenar_por, descendente, **filtros)
+
+def list_apolices(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return listar(session, Apolice, limite, cursor, ordenar_por, descendente, **filtros)
+
+def list_apartamentos(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return listar(session, Apartamento, limite, cursor, ordenar_por, descendente, **filtros)
+
+def list_acidentes(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return listar(session, Acidente, limite, cursor, ordenar_por, descendente, **filtros)
+
+def list_acidentes_arquivados(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return listar(session, AcidenteArquivado, limite, cursor, ordenar_por, descendente, **filtros)
+
+def list_apolices_arquivadas(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return listar(session, ApoliceArquivada, limite, cursor, ordenar_por, descendente, **filtros)
+
+# Versão paginada de get_apolices_com_clientes
+def list_apolices_com_clientes(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    consulta = session.query(Apolice.n_seguro, Apolice.valor_mensal, Apolice.cobertura, Cliente.cpf, Cliente.nome)
+    consulta = _filtrar(consulta.join(Cliente, Apolice.fk_cpf == Cliente.cpf), (Apolice, Cliente), filtros)
+    return _paginar(consulta, (Apolice, Cliente), limite, cursor, ordenar_por, descendente)
 
 # Controle de acesso
 def autenticar_usuario(session, username, password):
-    return session.query(Usuario).filter_by(username=username, password=password).first()
+    usuario = session.query(Usuario).filter_by(username=username).first()
+    if usuario is None:
+        simular_verificacao(password)
+        return None
+    if not verificar_senha(password, usuario.password):
+        return None
+    if precisa_novo_hash(usuario.password):
+        usuario.password = gerar_hash(password)
+        session.commit()
+    return usuario
+
+# Login que devolve um token de sessão; as ações seguintes usam usuario_da_sessao(token),
+# que não consulta o banco nem recalcula o hash enquanto a sessão não expira
+def iniciar_sessao(session, username, password):
+    usuario = autenticar_usuario(session, username, password)
+    return criar_sessao(usuario) if usuario else None
+
+def usuario_da_sessao(token):
+    return obter_sessao(token)
 
 def criar_usuario(session, username, password, role):
-    usuario = Usuario(username=username, password=password, role=role)
+    usuario = Usuario(username=username, password=gerar_hash(password), role=role)
     session.add(usuario)
     session.commit()
 
+def alterar_senha(session, username, password):
+    linhas = session.query(Usuario).filter_by(username=username).update(
+        {"password": gerar_hash(password)}, synchronize_session=False
+    )
+    session.commit()
+    encerrar_sessoes_do_usuario(username)
+    return linhas
+
 # Consultas avançadas
 def get_apolices_com_clientes(session):
     return session.query(Apolice, Cliente).join(Cliente, Apolice.fk_cpf == Cliente.cpf).all()
 
+# O grupo dos apartamentos sem cidade (cidade NULL, primeiro como no GROUP BY) não está no
+# resumo: é contado pelo índice de cidade, e fica vazio se todos tiverem cidade
+def _apartamentos_sem_cidade(session):
+    return session.query(Apartamento.cidade, func.count().label('total_apartamentos')).filter(
+        Apartamento.cidade.is_(None)
+    ).group_by(Apartamento.cidade).all()
+
 def contar_apartamentos_por_cidade(session):
-    return session.query(Apartamento.cidade, func.count(Apartamento.logradouro).label('total_apartamentos')).group_by(Apartamento.cidade).all()
+    resumo = session.query(ResumoCidade.cidade, ResumoCidade.quantidade.label('total_apartamentos')).order_by(ResumoCidade.cidade)
+    return _apartamentos_sem_cidade(session) + resumo.all()
 
-def apolices_acima_de_valor(session, valor_minimo):
-    return session.query(Apolice).filter(Apolice.valor_mensal > valor_minimo).all()
+# Quantidade, soma e média de valor_mercado e metragem por cidade, lidas do resumo
+def resumo_por_cidade(session):
+    return [
+        {
+            "cidade": r.cidade,
+            "quantidade": r.quantidade,
+            "soma_valor_mercado": r.soma_valor_mercado,
+            "media_valor_mercado": r.soma_valor_mercado / r.qtd_valor_mercado if r.qtd_valor_mercado else None,
+            "soma_metragem": r.soma_metragem,
+            "media_metragem": r.soma_metragem / r.qtd_metragem if r.qtd_metragem else None,
+        }
+        for r in session.query(ResumoCidade).order_by(ResumoCidade.cidade)
+    ]
+
+def verificar_resumo_cidades(session):
+    """Compara o resumo com o agrupamento feito na hora e retorna as cidades divergentes"""
+    colunas = ("quantidade", "soma_valor_mercado", "qtd_valor_mercado", "soma_metragem", "qtd_metragem")
+    reais = {
+        linha[0]: tuple(linha[1:])
+        for linha in session.query(
+            Apartamento.cidade, func.count(), func.coalesce(func.sum(Apartamento.valor_mercado), 0),
+            func.count(Apartamento.valor_mercado), func.coalesce(func.sum(Apartamento.metragem), 0),
+            func.count(Apartamento.metragem),
+        ).filter(Apartamento.cidade.isnot(None)).group_by(Apartamento.cidade)
+    }
+    resumo = {r.cidade: tuple(getattr(r, c) for c in colunas) for r in session.query(ResumoCidade)}
+    divergencias = []
+    for cidade in sorted(set(reais) | set(resumo)):
+        if reais.get(cidade) != resumo.get(cidade):
+            divergencias.append({
+                "cidade": cidade,
+                "resumo": dict(zip(colunas, resumo[cidade])) if cidade in resumo else None,
+                "real": dict(zip(colunas, reais[cidade])) if cidade in reais else None,
+            })
+    return divergencias
+
+def apolices_acima_de_valor(session, valor_minimo, incluir_arquivo=False):
+    apolices = session.query(Apolice).filter(Apolice.valor_mensal > valor_minimo).all()
+    if incluir_arquivo:
+        apolices += session.query(ApoliceArquivada).filter(ApoliceArquivada.valor_mensal > valor_minimo).all()
+    return apolices
+
+# Dossiê do cliente: as apólices, os apartamentos de cada apólice e os acidentes de cada apartamento.
+# Cada lote de clientes custa CONSULTAS_DOSSIE consultas qualquer que seja o tamanho das carteiras
+# (pelos relacionamentos preguiçosos era uma consulta por apólice e outra por apartamento): uma
+# por nível, com subqueryload. Cada consulta de um nível filtra pela consulta do nível anterior
+# (JOIN com a dos clientes do lote), então cada apólice, apartamento e acidente vem numa linha só,
+# sem as linhas repetidas de um JOIN entre os níveis. O selectinload dividiria o IN de cada nível
+# em blocos de 500 linhas do nível anterior, e o número de consultas voltaria a depender das carteiras.
+CONSULTAS_DOSSIE = 4
+TAMANHO_LOTE_DOSSIE = 500
+
+def _colunas(objeto, ignorar=()):
+    return {c.key: getattr(objeto, c.key) for c in objeto.__mapper__.column_attrs if c.key not in ignorar}
+
+# Resultado compacto: dicionários aninhados, sem repetir nos filhos a chave estrangeira do pai
+def _montar_dossie(cliente):
+    return {
+        **_colunas(cliente),
+        "apolices": [
+            {
+                **_colunas(apolice, ("fk_cpf",)),
+                "apartamentos": [
+                    {
+                        **_colunas(apartamento, ("fk_seguro",)),
+                        "acidentes": [
+                            _colunas(acidente, ("fk_apartamento",))
+                            for acidente in sorted(apartamento.acidentes, key=lambda a: a.id_acidente)
+                        ],
+                    }
+                    for apartamento in sorted(apolice.apartamentos, key=lambda a: a.logradouro)
+                ],
+            }
+            for apolice in sorted(cliente.apolices, key=lambda a: a.n_seguro)
+        ],
+    }
+
+def dossies(session, cpfs, tamanho_lote=TAMANHO_LOTE_DOSSIE):
+    """Dossiês dos CPFs informados, na mesma ordem ({cpf: dossiê}); CPFs inexistentes ficam de fora"""
+    cpfs = list(dict.fromkeys(cpfs))
+    encontrados = {}
+    for inicio in range(0, len(cpfs), tamanho_lote):
+        consulta = session.query(Cliente).filter(Cliente.cpf.in_(cpfs[inicio:inicio + tamanho_lote])).options(
+            subqueryload(Cliente.apolices).subqueryload(Apolice.apartamentos).subqueryload(Apartamento.acidentes)
+        )
+        for cliente in consulta:
+            encontrados[cliente.cpf] = _montar_dossie(cliente)
+    return {cpf: encontrados[cpf] for cpf in cpfs if cpf in encontrados}
+
+def dossie_cliente(session, cpf):
+    return dossies(session, [cpf]).get(cpf)
+
+# Versões em streaming das consultas avançadas: as linhas chegam em lotes por um cursor
+# no servidor (yield_per) em vez de um .all(). Com `colunas` apenas essas colunas são
+# buscadas, sem montar objetos Apolice/Cliente completos.
+TAMANHO_LOTE_STREAMING = 1000
+
+def _resolver_colunas(modelos, colunas):
+    resolvidas = []
+    for nome in colunas:
+        for modelo in modelos:
+            if nome in modelo.__table__.columns:
+                resolvidas.append(getattr(modelo, nome))
+                break
+        else:
+            raise ValueError(f"Coluna desconhecida: {nome}")
+    return resolvidas
+
+def iter_apolices_com_clientes(session, colunas=None, limite=None, tamanho_lote=TAMANHO_LOTE_STREAMING):
+    entidades = _resolver_colunas((Apolice, Cliente), colunas) if colunas else (Apolice, Cliente)
+    consulta = session.query(*entidades).select_from(Apolice).join(Cliente, Apolice.fk_cpf == Cliente.cpf)
+    if limite is not None:
+        consulta = consulta.limit(limite)
+    return iter(consulta.yield_per(tamanho_lote))
+
+def iter_contar_apartamentos_por_cidade(session, limite=None, tamanho_lote=TAMANHO_LOTE_STREAMING):
+    sem_cidade = _apartamentos_sem_cidade(session)[:limite]
+    consulta = session.query(ResumoCidade.cidade, ResumoCidade.quantidade.label('total_apartamentos')).order_by(ResumoCidade.cidade)
+    if limite is not None:
+        consulta = consulta.limit(limite - len(sem_cidade))
+    return chain(sem_cidade, consulta.yield_per(tamanho_lote))
+
+def iter_apolices_acima_de_valor(session, valor_minimo, colunas=None, limite=None, tamanho_lote=TAMANHO_LOTE_STREAMING):
+    entidades = _resolver_colunas((Apolice,), colunas) if colunas else (Apolice,)
+    consulta = session.query(*entidades).filter(Apolice.valor_mensal > valor_minimo)
+    if limite is not None:
+        consulta = consulta.limit(limite)
+    return iter(consulta.yield_per(tamanho_lote))
+
+# Instalação: cria o banco (MySQL) e as tabelas; a interface não faz isso ao iniciar
+def preparar_banco():
+    criar_banco()
+    create_tables()
 
 # Main
 if __name__ == "__main__":
-    create_tables()
+    preparar_banco()
     print("Tabelas criadas com sucesso!")
+    if "--verificar-resumo" in sys.argv:
+        with session_scope() as session:
+            divergencias = verificar_resumo_cidades(session)
+        for divergencia in divergencias:
+            print(f"Resumo divergente em {divergencia['cidade']}: {divergencia['resumo']} != {divergencia['real']}")
+        print("Resumo por cidade consistente." if not divergencias else f"{len(divergencias)} cidades divergentes.")
@@ -0,0 +1,178 @@
+import argparse
+import os
+import time
+from datetime import date
+from sqlalchemy import select, exists, or_, literal
+from app import (
+    SessionLocal, create_tables, registrar_alteracoes, Acidente, Apolice, Apartamento, ARQUIVOS
+)
+from checkpoint import _verificar
+
+# Arquivamento: move para as tabelas de arquivo (acidentes_arquivo e apolices_arquivo) os
+# acidentes anteriores a uma data e as apólices inativas, para as consultas, os checkpoints e as
+# restaurações não pagarem pelo histórico. Cada lote é copiado e apagado da tabela principal na
+# mesma transação; as chaves apagadas entram no registro de alterações (o próximo checkpoint
+# delta registra a saída delas) e saem do cache de leituras e do índice de busca.
+# Uma apólice é inativa se começou antes da data de corte ou ficou sem cliente, e se nenhum
+# apartamento aponta para ela (a chave estrangeira dos apartamentos exige a apólice na tabela
+# principal).
+# Os checkpoints não incluem o arquivo: restaurar um checkpoint anterior ao arquivamento traz as
+# linhas de volta às tabelas principais e apaga a cópia arquivada delas.
+# Atualizar uma apólice ou um acidente arquivado (update_apolice, update_acidente) também o devolve
+# à tabela principal; delete_apolice e delete_acidente apagam a cópia arquivada.
+# Uso: python arquivamento.py --acidentes-antes 2019-01-01 --apolices-antes 2015-01-01 --lote 1000 --pausa 0.1
+#      python arquivamento.py --desarquivar-acidentes 10 11 12
+
+# Cortes padrão, em anos antes de hoje
+ARQUIVO_ACIDENTES_ANOS = int(os.environ.get("ARQUIVO_ACIDENTES_ANOS", 5))
+ARQUIVO_APOLICES_ANOS = int(os.environ.get("ARQUIVO_APOLICES_ANOS", 10))
+TAMANHO_LOTE_ARQUIVO = 1000
+
+
+def data_de_corte(anos, hoje=None):
+    hoje = hoje or date.today()
+    # 29 de fevereiro vira 28 em anos não bissextos
+    return hoje.replace(year=hoje.year - anos, day=min(hoje.day, 28) if hoje.month == 2 else hoje.day)
+
+
+def _mover(session, modelo, chaves, hoje):
+    origem = modelo.__table__
+    destino = ARQUIVOS[modelo].__table__
+    chave = origem.primary_key.columns[list(origem.primary_key.columns.keys())[0]]
+    chave_destino = destino.c[chave.name]
+    # Uma cópia que tenha sobrado no arquivo é substituída
+    session.execute(destino.delete().where(chave_destino.in_(chaves)))
+    colunas = list(origem.columns.keys())
+    session.execute(destino.insert().from_select(
+        colunas + ["arquivado_em"],
+        select(*[origem.c[c] for c in colunas], literal(hoje, destino.c.arquivado_em.type)).where(chave.in_(chaves))
+    ))
+    session.execute(origem.delete().where(chave.in_(chaves)))
+    registrar_alteracoes(session.connection(), origem.name, chaves)
+
+
+def _arquivar(session, modelo, consulta_lote, tamanho_lote, pausa, controle):
+    hoje = date.today()
+    total = 0
+    ultima = None
+    while True:
+        chaves = session.execute(consulta_lote(ultima).limit(tamanho_lote).with_for_update()).scalars().all()
+        if not chaves:
+            break
+        _mover(session, modelo, chaves, hoje)
+        session.commit()
+        total += len(chaves)
+        ultima = chaves[-1]
+        _verificar(controle, f"{total} {modelo.__tablename__} arquivados")
+        # Pausa entre lotes para não disputar o banco com os usuários
+        if pausa:
+            time.sleep(pausa)
+    session.commit()
+    return total
+
+
+def arquivar_acidentes(session, anteriores_a, tamanho_lote=TAMANHO_LOTE_ARQUIVO, pausa=0.0, controle=None):
+    # Pelo índice de data: as linhas de cada lote saem da tabela, então o próximo começa do início
+    def consulta_lote(ultima):
+        return select(Acidente.id_acidente).where(Acidente.data < anteriores_a).order_by(Acidente.data, Acidente.id_acidente)
+    return _arquivar(session, Acidente, consulta_lote, tamanho_lote, pausa, controle)
+
+
+def arquivar_apolices(session, anteriores_a, tamanho_lote=TAMANHO_LOTE_ARQUIVO, pausa=0.0, controle=None):
+    sem_apartamentos = ~exists().where(Apartamento.fk_seguro == Apolice.n_seguro)
+
+    # Pela chave primária, continuando do último lote: as apólices com apartamentos ficam para trás
+    def consulta_lote(ultima):
+        consulta = select(Apolice.n_seguro).where(
+            or_(Apolice.data_inicio < anteriores_a, Apolice.fk_cpf.is_(None)), sem_apartamentos
+        ).order_by(Apolice.n_seguro)
+        return consulta.where(Apolice.n_seguro > ultima) if ultima is not None else consulta
+    return _arquivar(session, Apolice, consulta_lote, tamanho_lote, pausa, controle)
+
+
+def arquivar(session, acidentes_antes=None, apolices_antes=None, tamanho_lote=TAMANHO_LOTE_ARQUIVO, pausa=0.0, controle=None):
+    """Arquiva acidentes e apólices; sem datas usa os cortes padrão (ARQUIVO_*_ANOS)"""
+    inicio = time.perf_counter()
+    acidentes_antes = acidentes_antes or data_de_corte(ARQUIVO_ACIDENTES_ANOS)
+    apolices_antes = apolices_antes or data_de_corte(ARQUIVO_APOLICES_ANOS)
+    acidentes = arquivar_acidentes(session, acidentes_antes, tamanho_lote, pausa, controle)
+    apolices = arquivar_apolices(session, apolices_antes, tamanho_lote, pausa, controle)
+    segundos = time.perf_counter() - inicio
+    return {
+        "acidentes": acidentes,
+        "apolices": apolices,
+        "acidentes_antes": acidentes_antes,
+        "apolices_antes": apolices_antes,
+        "segundos": segundos,
+        "linhas_por_segundo": (acidentes + apolices) / segundos if segundos > 0 else 0.0,
+    }
+
+
+def _desarquivar(session, modelo, chaves):
+    origem = ARQUIVOS[modelo].__table__
+    destino = modelo.__table__
+    colunas = list(destino.columns.keys())
+    chave = origem.c[list(destino.primary_key.columns.keys())[0]]
+    chave_destino = destino.c[chave.name]
+    arquivadas = session.execute(select(chave).where(chave.in_(chaves))).scalars().all()
+    # Chave criada de novo na tabela principal depois do arquivamento: a cópia arquivada fica no
+    # arquivo e é informada, em vez de o INSERT falhar com chave duplicada no meio do lote
+    conflitos = set(session.execute(select(chave_destino).where(chave_destino.in_(arquivadas))).scalars()) if arquivadas else set()
+    movidas = [c for c in arquivadas if c not in conflitos]
+    if movidas:
+        session.execute(destino.insert().from_select(colunas, select(*[origem.c[c] for c in colunas]).where(chave.in_(movidas))))
+        session.execute(origem.delete().where(chave.in_(movidas)))
+        registrar_alteracoes(session.connection(), destino.name, movidas)
+    session.commit()
+    return {"desarquivadas": len(movidas), "conflitos": sorted(conflitos)}
+
+
+def desarquivar_acidentes(session, ids_acidente):
+    """Devolve acidentes arquivados à tabela principal (o apartamento ainda precisa existir)
+    -> {"desarquivadas", "conflitos"}; conflitos são ids que já existem de novo na tabela principal"""
+    return _desarquivar(session, Acidente, ids_acidente)
+
+
+def desarquivar_apolices(session, n_seguros):
+    """Devolve apólices arquivadas à tabela principal, por exemplo antes de ligar um apartamento a elas
+    -> {"desarquivadas", "conflitos"}; conflitos são apólices que já existem de novo na tabela principal"""
+    return _desarquivar(session, Apolice, n_seguros)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquiva acidentes antigos e apólices inativas")
+    parser.add_argument("--acidentes-antes", type=date.fromisoformat, metavar="AAAA-MM-DD",
+                        help=f"padrão: {ARQUIVO_ACIDENTES_ANOS} anos atrás")
+    parser.add_argument("--apolices-antes", type=date.fromisoformat, metavar="AAAA-MM-DD",
+                        help=f"padrão: {ARQUIVO_APOLICES_ANOS} anos atrás")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE_ARQUIVO)
+    parser.add_argument("--pausa", type=float, default=0.0, help="segundos de espera entre lotes")
+    parser.add_argument("--desarquivar-acidentes", type=int, nargs="+", metavar="ID")
+    parser.add_argument("--desarquivar-apolices", nargs="+", metavar="N_SEGURO")
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        if args.desarquivar_acidentes or args.desarquivar_apolices:
+            if args.desarquivar_acidentes:
+                r = desarquivar_acidentes(session, args.desarquivar_acidentes)
+                print(f"{r['desarquivadas']} acidentes desarquivados")
+                if r["conflitos"]:
+                    print(f"Já existem na tabela principal, mantidos no arquivo: {', '.join(map(str, r['conflitos']))}")
+            if args.desarquivar_apolices:
+                r = desarquivar_apolices(session, args.desarquivar_apolices)
+                print(f"{r['desarquivadas']} apólices desarquivadas")
+                if r["conflitos"]:
+                    print(f"Já existem na tabela principal, mantidas no arquivo: {', '.join(r['conflitos'])}")
+            return
+        r = arquivar(session, args.acidentes_antes, args.apolices_antes, args.lote, args.pausa)
+        print(f"{r['acidentes']} acidentes anteriores a {r['acidentes_antes']} e {r['apolices']} apólices "
+              f"anteriores a {r['apolices_antes']} (ou sem cliente) arquivados em {r['segundos']:.2f} s "
+              f"({r['linhas_por_segundo']:.0f} linhas/s)")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
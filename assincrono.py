@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import os
+import threading
+from contextlib import asynccontextmanager
+from sqlalchemy import event, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import app
+from app import Usuario, Apolice, Cliente, ResumoCidade, TAMANHO_LOTE_STREAMING
+from conexao import opcoes_pool, registrar_metricas_pool
+from seguranca import gerar_hash, verificar_senha, precisa_novo_hash, simular_verificacao, criar_sessao, encerrar_sessoes_do_usuario
+
+# Versão assíncrona das funções de acesso a dados do app, sobre a extensão asyncio do SQLAlchemy
+# (aiomysql no MySQL, aiosqlite no SQLite). Cada função recebe uma AsyncSession e roda a função
+# síncrona correspondente do app com session.run_sync: as consultas esperam o driver assíncrono sem
+# bloquear o event loop, e a semântica (cache, resumo por cidade, registro de alterações) é a mesma.
+# O hash de senhas, que usa a CPU, roda numa thread separada.
+# Com o cache compartilhado (CACHE_SERVIDOR) as leituras daqui vão direto ao banco e as
+# invalidações seguem numa thread (ver CacheRemoto), para o socket do cache não bloquear o loop.
+# Uso:
+#     async with session_scope() as session:
+#         await create_cliente(session, "123", "Ana", "contato", date(1990, 1, 1), "F")
+#         cliente = await read_cliente(session, "123")
+
+# ASYNC_DATABASE_URL permite apontar para outro banco; sem ela é usado o do app, com o driver assíncrono
+DRIVERS_ASSINCRONOS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+_engine = None
+_trava_engine = threading.Lock()
+
+
+def url_assincrona(url):
+    url = make_url(url)
+    if url.get_backend_name() not in DRIVERS_ASSINCRONOS:
+        raise ValueError(f"Sem driver assíncrono configurado para o banco '{url.get_backend_name()}'")
+    return url.set(drivername=DRIVERS_ASSINCRONOS[url.get_backend_name()])
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _trava_engine:
+            if _engine is None:
+                url = os.environ.get("ASYNC_DATABASE_URL") or url_assincrona(app.SQLALCHEMY_DATABASE_URL)
+                # O pool de uma engine assíncrona precisa ser o AsyncAdaptedQueuePool padrão
+                opcoes = {chave: valor for chave, valor in opcoes_pool(str(url)).items() if chave != "poolclass"}
+                engine = create_async_engine(url, **opcoes)
+                registrar_metricas_pool(engine.sync_engine)
+                event.listen(engine.sync_engine, "commit", app._invalidar_leituras_no_commit)
+                event.listen(engine.sync_engine, "rollback", app._invalidar_leituras_no_rollback)
+                _engine = engine
+    return _engine
+
+
+def nova_sessao():
+    # expire_on_commit=False: os objetos retornados continuam legíveis depois do commit, sem uma
+    # nova consulta (que fora do run_sync precisaria de await)
+    return AsyncSession(get_engine(), autoflush=False, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def session_scope():
+    session = nova_sessao()
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+async def fechar():
+    global _engine
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
+def _assincrona(funcao):
+    @functools.wraps(funcao)
+    async def assincrona(session, *args, **kwargs):
+        return await session.run_sync(funcao, *args, **kwargs)
+    return assincrona
+
+
+# Funções CRUD
+create_cliente = _assincrona(app.create_cliente)
+read_cliente = _assincrona(app.read_cliente)
+update_cliente = _assincrona(app.update_cliente)
+delete_cliente = _assincrona(app.delete_cliente)
+
+create_apolice = _assincrona(app.create_apolice)
+read_apolice = _assincrona(app.read_apolice)
+update_apolice = _assincrona(app.update_apolice)
+delete_apolice = _assincrona(app.delete_apolice)
+
+create_apartamento = _assincrona(app.create_apartamento)
+read_apartamento = _assincrona(app.read_apartamento)
+update_apartamento = _assincrona(app.update_apartamento)
+delete_apartamento = _assincrona(app.delete_apartamento)
+
+create_acidente = _assincrona(app.create_acidente)
+read_acidente = _assincrona(app.read_acidente)
+update_acidente = _assincrona(app.update_acidente)
+delete_acidente = _assincrona(app.delete_acidente)
+
+# Operações em lote
+create_bulk = _assincrona(app.create_bulk)
+upsert_bulk = _assincrona(app.upsert_bulk)
+delete_bulk = _assincrona(app.delete_bulk)
+create_clientes_bulk = _assincrona(app.create_clientes_bulk)
+upsert_clientes_bulk = _assincrona(app.upsert_clientes_bulk)
+delete_clientes_bulk = _assincrona(app.delete_clientes_bulk)
+create_apolices_bulk = _assincrona(app.create_apolices_bulk)
+upsert_apolices_bulk = _assincrona(app.upsert_apolices_bulk)
+delete_apolices_bulk = _assincrona(app.delete_apolices_bulk)
+create_apartamentos_bulk = _assincrona(app.create_apartamentos_bulk)
+upsert_apartamentos_bulk = _assincrona(app.upsert_apartamentos_bulk)
+delete_apartamentos_bulk = _assincrona(app.delete_apartamentos_bulk)
+create_acidentes_bulk = _assincrona(app.create_acidentes_bulk)
+upsert_acidentes_bulk = _assincrona(app.upsert_acidentes_bulk)
+delete_acidentes_bulk = _assincrona(app.delete_acidentes_bulk)
+
+# Listagens paginadas
+listar = _assincrona(app.listar)
+list_clientes = _assincrona(app.list_clientes)
+list_apolices = _assincrona(app.list_apolices)
+list_apartamentos = _assincrona(app.list_apartamentos)
+list_acidentes = _assincrona(app.list_acidentes)
+list_apolices_com_clientes = _assincrona(app.list_apolices_com_clientes)
+
+
+# Controle de acesso: a consulta vai pelo driver assíncrono e o scrypt roda numa thread
+async def autenticar_usuario(session, username, password):
+    usuario = (await session.execute(select(Usuario).filter_by(username=username))).scalars().first()
+    if usuario is None:
+        await asyncio.to_thread(simular_verificacao, password)
+        return None
+    if not await asyncio.to_thread(verificar_senha, password, usuario.password):
+        return None
+    if precisa_novo_hash(usuario.password):
+        usuario.password = await asyncio.to_thread(gerar_hash, password)
+        await session.commit()
+    return usuario
+
+
+async def iniciar_sessao(session, username, password):
+    usuario = await autenticar_usuario(session, username, password)
+    return criar_sessao(usuario) if usuario else None
+
+
+# Não consulta o banco
+usuario_da_sessao = app.usuario_da_sessao
+
+
+async def criar_usuario(session, username, password, role):
+    session.add(Usuario(username=username, password=await asyncio.to_thread(gerar_hash, password), role=role))
+    await session.commit()
+
+
+async def alterar_senha(session, username, password):
+    senha = await asyncio.to_thread(gerar_hash, password)
+    linhas = (await session.execute(
+        Usuario.__table__.update().where(Usuario.username == username).values(password=senha)
+    )).rowcount
+    await session.commit()
+    encerrar_sessoes_do_usuario(username)
+    return linhas
+
+
+# Consultas avançadas
+get_apolices_com_clientes = _assincrona(app.get_apolices_com_clientes)
+contar_apartamentos_por_cidade = _assincrona(app.contar_apartamentos_por_cidade)
+resumo_por_cidade = _assincrona(app.resumo_por_cidade)
+verificar_resumo_cidades = _assincrona(app.verificar_resumo_cidades)
+apolices_acima_de_valor = _assincrona(app.apolices_acima_de_valor)
+dossies = _assincrona(app.dossies)
+dossie_cliente = _assincrona(app.dossie_cliente)
+
+
+# Versões em streaming: geradores assíncronos (async for) que recebem as linhas em lotes
+async def _stream(session, consulta, objetos, tamanho_lote):
+    consulta = consulta.execution_options(yield_per=tamanho_lote)
+    resultado = await (session.stream_scalars(consulta) if objetos else session.stream(consulta))
+    async for linha in resultado:
+        yield linha
+
+
+def iter_apolices_com_clientes(session, colunas=None, limite=None, tamanho_lote=TAMANHO_LOTE_STREAMING):
+    entidades = app._resolver_colunas((Apolice, Cliente), colunas) if colunas else (Apolice, Cliente)
+    consulta = select(*entidades).select_from(Apolice).join(Cliente, Apolice.fk_cpf == Cliente.cpf).limit(limite)
+    return _stream(session, consulta, False, tamanho_lote)
+
+
+def iter_contar_apartamentos_por_cidade(session, limite=None, tamanho_lote=TAMANHO_LOTE_STREAMING):
+    consulta = select(ResumoCidade.cidade, ResumoCidade.quantidade.label('total_apartamentos')).order_by(ResumoCidade.cidade).limit(limite)
+    return _stream(session, consulta, False, tamanho_lote)
+
+
+def iter_apolices_acima_de_valor(session, valor_minimo, colunas=None, limite=None, tamanho_lote=TAMANHO_LOTE_STREAMING):
+    entidades = app._resolver_colunas((Apolice,), colunas) if colunas else (Apolice,)
+    consulta = select(*entidades).where(Apolice.valor_mensal > valor_minimo).limit(limite)
+    return _stream(session, consulta, not colunas, tamanho_lote)
@@ -0,0 +1,184 @@
+import argparse
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from app import (
+    SessionLocal, create_tables, upsert_clientes_bulk, upsert_apolices_bulk, upsert_apartamentos_bulk,
+    upsert_acidentes_bulk, Cliente, Apolice, Apartamento, Acidente
+)
+import analises
+
+# Compara as análises vetorizadas com laços linha a linha sobre objetos do ORM
+# Uso: python -m benchmarks.analises --clientes 20000 --semente 42
+
+CIDADES = ["São Paulo", "Rio de Janeiro", "Curitiba", "Belo Horizonte", "Porto Alegre", "Recife", "Salvador", "Fortaleza"]
+COBERTURAS = ["Básica", "Intermediária", "Completa", "Premium"]
+REFERENCIA = date(2024, 1, 1)
+
+
+def popular(session, clientes, semente):
+    aleatorio = random.Random(semente)
+    upsert_clientes_bulk(session, (
+        {"cpf": f"N{i:010d}", "nome": f"Cliente {i}",
+         "data_nascimento": date(1940, 1, 1) + timedelta(days=aleatorio.randint(0, 30000)) if i % 50 else None}
+        for i in range(clientes)
+    ))
+    upsert_apolices_bulk(session, (
+        {"n_seguro": f"N{i}", "valor_mensal": aleatorio.randint(50, 5000), "cobertura": aleatorio.choice(COBERTURAS),
+         "fk_cpf": f"N{aleatorio.randrange(clientes):010d}"}
+        for i in range(clientes)
+    ))
+    upsert_apartamentos_bulk(session, (
+        # Apólices com nenhum, um ou vários apartamentos, às vezes em cidades diferentes
+        {"logradouro": f"Rua N{i}", "cidade": aleatorio.choice(CIDADES), "fk_seguro": f"N{aleatorio.randrange(clientes)}",
+         "metragem": aleatorio.randint(30, 200), "valor_mercado": aleatorio.randint(100_000, 2_000_000)}
+        for i in range(clientes)
+    ))
+    upsert_acidentes_bulk(session, (
+        {"id_acidente": 20_000_000 + i, "qtd_acidentes": aleatorio.randint(1, 3),
+         "fk_apartamento": f"Rua N{int(aleatorio.paretovariate(1.2)) % clientes}"}
+        for i in range(clientes)
+    ))
+
+
+# Versões de referência: um objeto do ORM por linha e dicionários do Python
+def sinistralidade_orm(session):
+    apolices = {a.n_seguro: a for a in session.query(Apolice)}
+    acidentes = defaultdict(float)
+    ocorrencias = defaultdict(int)
+    for acidente in session.query(Acidente):
+        acidentes[acidente.fk_apartamento] += acidente.qtd_acidentes or 0
+        ocorrencias[acidente.fk_apartamento] += 1
+    apartamentos = session.query(Apartamento).all()
+    apartamentos_por_apolice = defaultdict(int)
+    for apartamento in apartamentos:
+        apartamentos_por_apolice[apartamento.fk_seguro] += 1
+    cidades = defaultdict(lambda: {"apartamentos": 0, "premio_mensal": 0.0, "ocorrencias": 0, "acidentes": 0.0})
+    for apartamento in apartamentos:
+        if apartamento.cidade is None:
+            continue
+        cidade = cidades[apartamento.cidade]
+        cidade["apartamentos"] += 1
+        apolice = apolices.get(apartamento.fk_seguro)
+        # O prêmio da apólice é dividido entre os seus apartamentos
+        cidade["premio_mensal"] += (apolice.valor_mensal or 0) / apartamentos_por_apolice[apartamento.fk_seguro] if apolice else 0
+        cidade["ocorrencias"] += ocorrencias[apartamento.logradouro]
+        cidade["acidentes"] += acidentes[apartamento.logradouro]
+    return [
+        dict(c, cidade=nome, sinistralidade=c["acidentes"] * 1000 / c["premio_mensal"] if c["premio_mensal"] else None)
+        for nome, c in sorted(cidades.items())
+    ]
+
+
+def frequencia_orm(session, maiores=10):
+    acidentes = {apartamento.logradouro: 0.0 for apartamento in session.query(Apartamento)}
+    for acidente in session.query(Acidente):
+        if acidente.fk_apartamento in acidentes:
+            acidentes[acidente.fk_apartamento] += acidente.qtd_acidentes or 0
+    valores = sorted(acidentes.values())
+    percentis = statistics.quantiles(valores, n=100, method="inclusive")
+    return {
+        "apartamentos": len(valores),
+        "sem_acidentes": sum(1 for v in valores if v == 0),
+        "media": statistics.fmean(valores),
+        "p50": statistics.median(valores),
+        "p90": percentis[89],
+        "p99": percentis[98],
+        "maximo": valores[-1],
+        "maiores": sorted(acidentes.items(), key=lambda item: -item[1])[:maiores],
+    }
+
+
+def premios_orm(session):
+    grupos = defaultdict(list)
+    for apolice in session.query(Apolice):
+        if apolice.valor_mensal is not None:
+            grupos[apolice.cobertura].append(apolice.valor_mensal)
+    resultado = []
+    for cobertura in sorted(grupos, key=lambda c: c or ""):
+        valores = sorted(grupos[cobertura])
+        quartis = statistics.quantiles(valores, n=4, method="inclusive") if len(valores) > 1 else valores * 3
+        resultado.append({
+            "cobertura": cobertura, "apolices": len(valores), "total": sum(valores), "media": statistics.fmean(valores),
+            "minimo": valores[0], "p25": quartis[0], "mediana": quartis[1], "p75": quartis[2], "maximo": valores[-1],
+        })
+    return resultado
+
+
+def faixas_orm(session, referencia):
+    def faixa(nascimento):
+        if nascimento is None:
+            return analises.SEM_DATA
+        idade = referencia.year - nascimento.year - ((referencia.month, referencia.day) < (nascimento.month, nascimento.day))
+        return analises.ROTULOS_FAIXAS[sum(1 for inicio in analises.FAIXAS_ETARIAS if idade >= inicio)]
+
+    faixas = {cliente.cpf: faixa(cliente.data_nascimento) for cliente in session.query(Cliente)}
+    rotulos = analises.ROTULOS_FAIXAS + [analises.SEM_DATA]
+    totais = {r: {"faixa": r, "clientes": 0, "apolices": 0, "premio_mensal": 0.0} for r in rotulos}
+    for f in faixas.values():
+        totais[f]["clientes"] += 1
+    for apolice in session.query(Apolice):
+        if apolice.fk_cpf in faixas:
+            total = totais[faixas[apolice.fk_cpf]]
+            total["apolices"] += 1
+            total["premio_mensal"] += apolice.valor_mensal or 0
+    for total in totais.values():
+        total["premio_medio"] = total["premio_mensal"] / total["apolices"] if total["apolices"] else None
+    return [totais[r] for r in rotulos]
+
+
+def _iguais(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_iguais(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_iguais(x, y) for x, y in zip(a, b))
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+    return a == b
+
+
+def _medir(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) / repeticoes, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das análises vetorizadas")
+    parser.add_argument("--clientes", type=int, default=20000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        popular(session, args.clientes, args.semente)
+        comparacoes = [
+            ("sinistralidade_por_cidade", analises._sinistralidade_por_cidade, analises.sinistralidade_por_cidade, sinistralidade_orm, ()),
+            ("frequencia_acidentes", analises._frequencia_acidentes, analises.frequencia_acidentes_por_apartamento, frequencia_orm, (10,)),
+            ("premios_por_cobertura", analises._premios_por_cobertura, analises.premios_por_cobertura, premios_orm, ()),
+            ("clientes_por_faixa_etaria", analises._clientes_por_faixa_etaria, analises.clientes_por_faixa_etaria, faixas_orm, (REFERENCIA,)),
+        ]
+        print(f"{'análise':<28} {'ORM':>10} {'NumPy':>10} {'em cache':>10}  resultados")
+        for nome, vetorizada, com_cache, orm, argumentos in comparacoes:
+            def por_linha():
+                # Sem reaproveitar objetos carregados na repetição anterior
+                session.expunge_all()
+                return orm(session, *argumentos)
+            tempo_orm, esperado = _medir(por_linha, args.repeticoes)
+            tempo_numpy, obtido = _medir(lambda: vetorizada(session, *argumentos), args.repeticoes)
+            com_cache(session, *argumentos)
+            tempo_cache, _ = _medir(lambda: com_cache(session, *argumentos), args.repeticoes)
+            print(f"{nome:<28} {tempo_orm * 1000:8.1f}ms {tempo_numpy * 1000:8.1f}ms {tempo_cache * 1000:8.3f}ms  "
+                  f"{'iguais' if _iguais(obtido, esperado) else 'DIFERENTES'}")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import time
+from datetime import date
+
+# Efeito do arquivamento (arquivamento.py) nas tabelas principais: tempo de um checkpoint completo,
+# da consulta apolices_acima_de_valor e da listagem de acidentes antes e depois de mover o
+# histórico para as tabelas de arquivo, e a vazão do próprio arquivamento.
+# Uso: python -m benchmarks.arquivamento --banco sqlite:///benchmark_arquivo.db --linhas 100000 --acidentes-antes 2020-01-01
+
+
+def _medir(funcao, repeticoes=5):
+    # Melhor de N execuções, em milissegundos
+    melhor = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        segundos = time.perf_counter() - inicio
+        melhor = segundos if melhor is None else min(melhor, segundos)
+    return melhor * 1000
+
+
+def medir_tabelas_principais(app, checkpoint, nome):
+    with app.session_scope() as session:
+        linhas = session.query(app.Acidente).count() + session.query(app.Apolice).count()
+        inicio = time.perf_counter()
+        # Checkpoint completo (base): os deltas dependem do que mudou desde o anterior
+        checkpoint.INTERVALO_BASE = 1
+        checkpoint.salvar_checkpoint(session, nome)
+        salvar = (time.perf_counter() - inicio) * 1000
+        return {
+            "linhas": linhas,
+            "checkpoint_ms": salvar,
+            "acima_de_valor_ms": _medir(lambda: app.apolices_acima_de_valor(session, 0)),
+            "listagem_ms": _medir(lambda: app.list_acidentes(session, limite=50, ordenar_por="data")),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabelas principais antes e depois do arquivamento")
+    parser.add_argument("--banco", help="URL do banco (DATABASE_URL); use um banco só para este benchmark")
+    parser.add_argument("--linhas", type=int, default=10000, help="tamanho da base sintética, se ainda não existir")
+    parser.add_argument("--acidentes-antes", type=date.fromisoformat, default=None, metavar="AAAA-MM-DD")
+    parser.add_argument("--apolices-antes", type=date.fromisoformat, default=None, metavar="AAAA-MM-DD")
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.banco:
+        os.environ["DATABASE_URL"] = args.banco
+    import app
+    import arquivamento
+    import checkpoint
+    from benchmarks import dados
+
+    app.create_tables()
+    with app.session_scope() as session:
+        if not session.get(app.Cliente, dados.chave_cliente("G", 0)):
+            dados.popular(session, args.linhas, args.semente)
+
+    antes = medir_tabelas_principais(app, checkpoint, "benchmark_arquivo_antes")
+    with app.session_scope() as session:
+        r = arquivamento.arquivar(session, args.acidentes_antes, args.apolices_antes, args.lote)
+    depois = medir_tabelas_principais(app, checkpoint, "benchmark_arquivo_depois")
+
+    print(f"Arquivados: {r['acidentes']} acidentes anteriores a {r['acidentes_antes']}, {r['apolices']} apólices "
+          f"em {r['segundos']:.2f} s ({r['linhas_por_segundo']:.0f} linhas/s)")
+    print(f"{'':<10} {'linhas':>10} {'checkpoint':>12} {'acima_de_valor':>15} {'listagem':>10}")
+    for rotulo, m in (("antes", antes), ("depois", depois)):
+        print(f"{rotulo:<10} {m['linhas']:>10} {m['checkpoint_ms']:10.1f}ms {m['acima_de_valor_ms']:13.1f}ms {m['listagem_ms']:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
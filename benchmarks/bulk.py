@@ -0,0 +1,53 @@
+import argparse
+import time
+from datetime import date
+from app import SessionLocal, create_tables, create_cliente, delete_cliente, create_clientes_bulk, delete_clientes_bulk
+
+# Compara as funções CRUD linha a linha com as versões em lote
+# Uso: python -m benchmarks.bulk --linhas 5000 --lote 1000
+
+
+def _clientes(quantidade, prefixo):
+    for i in range(quantidade):
+        yield {
+            "cpf": f"{prefixo}{i:010d}",
+            "nome": f"Cliente {i}",
+            "contato": f"cliente{i}@exemplo.com",
+            "data_nascimento": date(1960 + i % 40, 1 + i % 12, 1 + i % 28),
+            "sexo": "F" if i % 2 else "M",
+        }
+
+
+def _medir(descricao, linhas, funcao):
+    inicio = time.perf_counter()
+    funcao()
+    segundos = time.perf_counter() - inicio
+    print(f"{descricao:<35} {segundos:8.3f} s  {linhas / segundos:10.0f} linhas/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das operações em lote")
+    parser.add_argument("--linhas", type=int, default=5000)
+    parser.add_argument("--lote", type=int, default=1000)
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        clientes = list(_clientes(args.linhas, "L"))
+        cpfs = [c["cpf"] for c in clientes]
+
+        def por_linha():
+            for c in clientes:
+                create_cliente(session, c["cpf"], c["nome"], c["contato"], c["data_nascimento"], c["sexo"])
+        _medir("create_cliente (linha a linha)", args.linhas, por_linha)
+        _medir("delete_cliente (linha a linha)", args.linhas, lambda: [delete_cliente(session, cpf) for cpf in cpfs])
+
+        _medir("create_clientes_bulk", args.linhas, lambda: create_clientes_bulk(session, clientes, args.lote))
+        _medir("delete_clientes_bulk", args.linhas, lambda: delete_clientes_bulk(session, cpfs, args.lote))
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
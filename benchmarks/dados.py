@@ -0,0 +1,173 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from app import SessionLocal, create_tables, create_clientes_bulk, create_apolices_bulk, create_apartamentos_bulk, create_acidentes_bulk
+
+# Gerador de dados sintéticos com semente fixa: a mesma semente e escala geram sempre as mesmas linhas.
+# Cada tabela é gerada em streaming a partir da quantidade de linhas da tabela pai, então a memória
+# não cresce com a escala (de 10 mil a 10 milhões de linhas) e toda chave estrangeira aponta para
+# uma linha gerada antes.
+# Uso: python -m benchmarks.dados --linhas 100000 --semente 42
+
+NOMES = ["Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+         "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago", "Vitória", "Yuri"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues", "Almeida",
+              "Nascimento", "Carvalho", "Gomes", "Martins", "Araújo", "Ribeiro"]
+# Cidade, peso e preço médio do metro quadrado
+CIDADES = [("São Paulo", 30, 11000), ("Rio de Janeiro", 20, 10000), ("Belo Horizonte", 10, 7500),
+           ("Curitiba", 8, 8500), ("Porto Alegre", 8, 7000), ("Salvador", 8, 6000), ("Recife", 8, 6500),
+           ("Fortaleza", 8, 6000)]
+# Cobertura, peso e faixa do valor mensal
+COBERTURAS = [("Básica", 50, (50, 300)), ("Intermediária", 30, (200, 800)), ("Completa", 15, (600, 2000)),
+              ("Premium", 5, (1500, 5000))]
+DESCRICOES = ["Incêndio", "Vazamento", "Curto-circuito", "Infiltração", "Queda de objeto", "Arrombamento",
+              "Danos elétricos", "Desabamento parcial"]
+
+# Quantidade média de filhos por linha pai
+APOLICES_POR_CLIENTE = (1, 3)      # de 1 a 3 apólices
+APARTAMENTOS_POR_APOLICE = (0, 2)  # de 0 a 2 apartamentos
+CHANCE_ACIDENTE = 0.3              # chance de cada acidente a mais em um apartamento (geométrica)
+LINHAS_POR_CLIENTE = 1 + 2 + 2 + 2 * 0.3 / 0.7  # cerca de 5,9 linhas no total por cliente
+
+INICIO = date(2010, 1, 1)
+DIAS = (date(2024, 12, 31) - INICIO).days
+
+
+def _aleatorio(semente, tabela):
+    # Um gerador por tabela, para a quantidade de linhas de uma não depender das outras
+    return random.Random(f"{semente}:{tabela}")
+
+
+def chave_cliente(prefixo, i):
+    return f"{prefixo}{i:010d}"
+
+
+def chave_apolice(prefixo, i):
+    return f"{prefixo}S{i:010d}"
+
+
+def chave_apartamento(prefixo, i):
+    return f"Rua {prefixo}{i:010d}"
+
+
+def gerar_clientes(quantidade, semente=42, prefixo="G"):
+    aleatorio = _aleatorio(semente, "clientes")
+    for i in range(quantidade):
+        sexo = aleatorio.choice(["F", "M"])
+        yield {
+            "cpf": chave_cliente(prefixo, i),
+            "nome": f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}",
+            "contato": f"({aleatorio.randint(11, 99)}) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}",
+            "data_nascimento": date(1940, 1, 1) + timedelta(days=aleatorio.randint(0, 65 * 365)),
+            "sexo": sexo,
+        }
+
+
+def gerar_apolices(clientes, semente=42, prefixo="G"):
+    aleatorio = _aleatorio(semente, "apolices")
+    nomes, pesos, faixas = zip(*COBERTURAS)
+    j = 0
+    for i in range(clientes):
+        for _ in range(aleatorio.randint(*APOLICES_POR_CLIENTE)):
+            indice = aleatorio.choices(range(len(nomes)), pesos)[0]
+            yield {
+                "n_seguro": chave_apolice(prefixo, j),
+                "data_inicio": INICIO + timedelta(days=aleatorio.randint(0, DIAS)),
+                "valor_mensal": aleatorio.randint(*faixas[indice]),
+                "cobertura": nomes[indice],
+                "fk_cpf": chave_cliente(prefixo, i),
+            }
+            j += 1
+
+
+def gerar_apartamentos(apolices, semente=42, prefixo="G"):
+    aleatorio = _aleatorio(semente, "apartamentos")
+    cidades, pesos, precos = zip(*CIDADES)
+    k = 0
+    for j in range(apolices):
+        for _ in range(aleatorio.randint(*APARTAMENTOS_POR_APOLICE)):
+            indice = aleatorio.choices(range(len(cidades)), pesos)[0]
+            metragem = max(20, int(aleatorio.lognormvariate(4.2, 0.4)))
+            yield {
+                "logradouro": chave_apartamento(prefixo, k),
+                "cidade": cidades[indice],
+                "metragem": metragem,
+                "fk_seguro": chave_apolice(prefixo, j),
+                "valor_mercado": int(metragem * precos[indice] * aleatorio.uniform(0.7, 1.3)),
+                "n_moradores": aleatorio.randint(1, 5),
+            }
+            k += 1
+
+
+def gerar_acidentes(apartamentos, semente=42, prefixo="G", primeiro_id=1):
+    aleatorio = _aleatorio(semente, "acidentes")
+    id_acidente = primeiro_id
+    for k in range(apartamentos):
+        while aleatorio.random() < CHANCE_ACIDENTE:
+            yield {
+                "id_acidente": id_acidente,
+                "data": INICIO + timedelta(days=aleatorio.randint(0, DIAS)),
+                "qtd_acidentes": aleatorio.randint(1, 3),
+                "fk_apartamento": chave_apartamento(prefixo, k),
+                "descricao": aleatorio.choice(DESCRICOES),
+                "envolvidos": aleatorio.randint(0, 4),
+            }
+            id_acidente += 1
+
+
+class _Contador:
+    # Conta os registros que passam pelo gerador sem guardá-los
+    def __init__(self, registros):
+        self.registros = registros
+        self.total = 0
+
+    def __iter__(self):
+        for registro in self.registros:
+            self.total += 1
+            yield registro
+
+
+def popular(session, linhas, semente=42, prefixo="G", primeiro_id=1, tamanho_lote=5000):
+    """Grava cerca de `linhas` linhas nas quatro tabelas e retorna a quantidade e o tempo de cada uma"""
+    clientes = max(1, int(linhas / LINHAS_POR_CLIENTE))
+    resultado = {}
+    quantidade = clientes
+    etapas = [
+        ("clientes", lambda n: gerar_clientes(n, semente, prefixo), create_clientes_bulk),
+        ("apolices", lambda n: gerar_apolices(n, semente, prefixo), create_apolices_bulk),
+        ("apartamentos", lambda n: gerar_apartamentos(n, semente, prefixo), create_apartamentos_bulk),
+        ("acidentes", lambda n: gerar_acidentes(n, semente, prefixo, primeiro_id), create_acidentes_bulk),
+    ]
+    for tabela, gerar, gravar in etapas:
+        registros = _Contador(gerar(quantidade))
+        inicio = time.perf_counter()
+        relatorio = gravar(session, registros, tamanho_lote)
+        segundos = time.perf_counter() - inicio
+        resultado[tabela] = {"linhas": registros.total, "erros": len(relatorio["erros"]), "segundos": segundos}
+        # A tabela seguinte é gerada a partir de quantas linhas esta teve
+        quantidade = registros.total
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos para as quatro tabelas")
+    parser.add_argument("--linhas", type=int, default=10000, help="total aproximado de linhas")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--prefixo", default="G", help="letra usada nas chaves, para gerar várias bases no mesmo banco")
+    parser.add_argument("--primeiro-id", type=int, default=1, help="primeiro id_acidente")
+    parser.add_argument("--lote", type=int, default=5000)
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        for tabela, r in popular(session, args.linhas, args.semente, args.prefixo, args.primeiro_id, args.lote).items():
+            print(f"{tabela:<13} {r['linhas']:10} linhas {r['erros']:6} erros {r['segundos']:8.2f} s "
+                  f"{r['linhas'] / r['segundos'] if r['segundos'] > 0 else 0:10.0f} linhas/s")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
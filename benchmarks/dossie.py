@@ -0,0 +1,86 @@
+import argparse
+import math
+import os
+import sys
+import time
+from sqlalchemy import event
+
+# Dossiê de clientes (app.dossies, carregamento antecipado) comparado com o mesmo resultado montado pelos
+# relacionamentos preguiçosos (N+1): tempo e número de consultas SQL. O comando sai com código 1
+# se o dossiê passar de CONSULTAS_DOSSIE consultas por lote ou divergir da versão preguiçosa.
+# Uso: python -m benchmarks.dossie --banco sqlite:///benchmark.db --clientes 1 50 500
+
+
+class ContadorConsultas:
+    """Conta os comandos SQL executados pela engine dentro do bloco with"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.total = 0
+
+    def _contar(self, *args):
+        self.total += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._contar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._contar)
+
+
+def dossies_preguicosos(app, session, cpfs):
+    clientes = session.query(app.Cliente).filter(app.Cliente.cpf.in_(cpfs))
+    encontrados = {cliente.cpf: app._montar_dossie(cliente) for cliente in clientes}
+    return {cpf: encontrados[cpf] for cpf in cpfs if cpf in encontrados}
+
+
+def medir(app, funcao, cpfs):
+    with app.session_scope() as session:
+        with ContadorConsultas(app.get_engine()) as contador:
+            inicio = time.perf_counter()
+            resultado = funcao(session, cpfs)
+            segundos = time.perf_counter() - inicio
+    return resultado, contador.total, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas e tempo do dossiê de clientes, com e sem carregamento antecipado")
+    parser.add_argument("--banco", help="URL do banco (DATABASE_URL)")
+    parser.add_argument("--linhas", type=int, default=10000, help="tamanho da base sintética, se ainda não existir")
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.banco:
+        os.environ["DATABASE_URL"] = args.banco
+    import app
+    from benchmarks import dados
+
+    app.create_tables()
+    with app.session_scope() as session:
+        if not session.get(app.Cliente, dados.chave_cliente("G", 0)):
+            dados.popular(session, args.linhas, args.semente)
+        todos = [cpf for cpf, in session.query(app.Cliente.cpf).filter(app.Cliente.cpf.like("G%")).limit(max(args.clientes))]
+
+    falhas = []
+    print(f"{'clientes':>8} {'versão':<12} {'consultas':>10} {'tempo':>12}")
+    for quantidade in args.clientes:
+        cpfs = todos[:quantidade]
+        limite = app.CONSULTAS_DOSSIE * math.ceil(len(cpfs) / app.TAMANHO_LOTE_DOSSIE)
+        eager, consultas, segundos = medir(app, app.dossies, cpfs)
+        preguicoso, consultas_preguicoso, segundos_preguicoso = medir(app, lambda session, cpfs: dossies_preguicosos(app, session, cpfs), cpfs)
+        print(f"{len(cpfs):>8} {'antecipado':<12} {consultas:>10} {segundos * 1000:10.2f}ms")
+        print(f"{len(cpfs):>8} {'preguiçoso':<12} {consultas_preguicoso:>10} {segundos_preguicoso * 1000:10.2f}ms")
+        if consultas > limite:
+            falhas.append(f"{len(cpfs)} clientes: {consultas} consultas (limite {limite})")
+        if eager != preguicoso:
+            falhas.append(f"{len(cpfs)} clientes: resultado diferente da versão preguiçosa")
+
+    for falha in falhas:
+        print(f"Falhou: {falha}", file=sys.stderr)
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
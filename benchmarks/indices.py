@@ -0,0 +1,75 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from app import (
+    get_engine, Base, SessionLocal, create_tables, create_clientes_bulk, create_apolices_bulk,
+    create_apartamentos_bulk, create_acidentes_bulk, Usuario, criar_usuario
+)
+from indices import consultas_monitoradas
+
+# Tempo das consultas monitoradas sem e com os índices secundários, sobre uma base gerada com semente fixa
+# Uso: python -m benchmarks.indices --clientes 20000 --repeticoes 5
+
+CIDADES = ["São Paulo", "Rio de Janeiro", "Curitiba", "Belo Horizonte", "Porto Alegre", "Recife", "Salvador", "Fortaleza"]
+
+
+def popular(session, clientes, semente):
+    aleatorio = random.Random(semente)
+    create_clientes_bulk(session, ({"cpf": f"I{i:010d}", "nome": f"Cliente {i}"} for i in range(clientes)))
+    create_apolices_bulk(session, (
+        {"n_seguro": f"I{i}", "valor_mensal": aleatorio.randint(50, 5000), "fk_cpf": f"I{i:010d}"}
+        for i in range(clientes)
+    ))
+    create_apartamentos_bulk(session, (
+        {"logradouro": f"Rua I{i}", "cidade": aleatorio.choice(CIDADES), "fk_seguro": f"I{i}"}
+        for i in range(clientes)
+    ))
+    create_acidentes_bulk(session, (
+        {"id_acidente": 10_000_000 + i, "data": date(2010, 1, 1) + timedelta(days=aleatorio.randint(0, 5000)),
+         "fk_apartamento": f"Rua I{aleatorio.randrange(clientes)}"}
+        for i in range(clientes)
+    ))
+    if not session.query(Usuario).filter_by(username="admin").first():
+        criar_usuario(session, "admin", "admin", "admin")
+
+
+def medir(session, repeticoes):
+    tempos = {}
+    for nome, consulta in consultas_monitoradas(session).items():
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            consulta.all()
+        tempos[nome] = (time.perf_counter() - inicio) / repeticoes
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos índices secundários")
+    parser.add_argument("--clientes", type=int, default=20000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    create_tables()
+    session = SessionLocal()
+    try:
+        popular(session, args.clientes, args.semente)
+        indices = [indice for tabela in Base.metadata.sorted_tables for indice in tabela.indexes if indice.name.startswith("ix_")]
+
+        for indice in indices:
+            indice.drop(bind=get_engine())
+        sem = medir(session, args.repeticoes)
+        for indice in indices:
+            indice.create(bind=get_engine())
+        com = medir(session, args.repeticoes)
+
+        print(f"{'consulta':<32} {'sem índices':>12} {'com índices':>12}")
+        for nome in sem:
+            print(f"{nome:<32} {sem[nome] * 1000:10.2f}ms {com[nome] * 1000:10.2f}ms")
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Tempo de inicialização: do início do processo até a janela de login aparecer, comparado com um
+# orçamento (o comando sai com código 1 se a mediana passar do limite). Mede também a importação do
+# app, que não deve abrir conexão com o banco nem criar a engine.
+# Uso: python -m benchmarks.inicializacao --repeticoes 10 --limite-ms 800
+#      QT_QPA_PLATFORM=offscreen python -m benchmarks.inicializacao   (sem servidor gráfico)
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIMITE_INICIALIZACAO_MS = 800
+
+VERIFICAR_APP = (
+    "import sys, app\n"
+    "print('engine criada' if app._engine is not None else 'engine não criada')\n"
+    "print('pymysql importado' if 'pymysql' in sys.modules else 'pymysql não importado')\n"
+)
+
+
+def _medir(comando, repeticoes):
+    tempos = []
+    saida = ""
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        processo = subprocess.run(comando, cwd=RAIZ, capture_output=True, text=True)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if processo.returncode != 0:
+            raise RuntimeError(f"{' '.join(comando)} falhou:\n{processo.stderr}")
+        saida = processo.stdout
+    return tempos, saida
+
+
+def _imprimir(nome, tempos):
+    print(f"{nome:<28} mediana {statistics.median(tempos):8.1f} ms  mínimo {min(tempos):8.1f} ms  máximo {max(tempos):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de inicialização da interface")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite-ms", type=float, default=LIMITE_INICIALIZACAO_MS,
+                        help="orçamento para a mediana até a janela de login")
+    args = parser.parse_args()
+
+    # Referência: só o interpretador
+    base, _ = _medir([sys.executable, "-c", "pass"], args.repeticoes)
+    interface, _ = _medir([sys.executable, "interface.py", "--medir-inicializacao"], args.repeticoes)
+    importacao, verificacao = _medir([sys.executable, "-c", VERIFICAR_APP], args.repeticoes)
+
+    _imprimir("python (sem nada)", base)
+    _imprimir("interface até o login", interface)
+    _imprimir("import app", importacao)
+    for linha in verificacao.splitlines():
+        print(f"  import app: {linha}")
+
+    mediana = statistics.median(interface)
+    if mediana > args.limite_ms:
+        print(f"Acima do orçamento: {mediana:.1f} ms > {args.limite_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+    print(f"Dentro do orçamento de {args.limite_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
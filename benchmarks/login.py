@@ -0,0 +1,72 @@
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import seguranca
+from app import SessionLocal, create_tables, criar_usuario, iniciar_sessao, usuario_da_sessao, Usuario
+
+# Vazão de logins com um custo de hash configurável, para dimensionar os parâmetros do scrypt
+# diante dos picos de logins simultâneos
+# Uso: python -m benchmarks.login --log-n 14 --r 8 --p 1 --threads 8 --logins 200
+
+
+def _login(username, senha):
+    session = SessionLocal()
+    try:
+        inicio = time.perf_counter()
+        token = iniciar_sessao(session, username, senha)
+        return time.perf_counter() - inicio, token
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de logins com hash scrypt")
+    parser.add_argument("--log-n", type=int, default=14, help="N = 2 ** log-n")
+    parser.add_argument("--r", type=int, default=8)
+    parser.add_argument("--p", type=int, default=1)
+    parser.add_argument("--usuarios", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    seguranca.SCRYPT_N, seguranca.SCRYPT_R, seguranca.SCRYPT_P = 2 ** args.log_n, args.r, args.p
+    create_tables()
+    session = SessionLocal()
+    try:
+        usuarios = [f"bench{i}" for i in range(args.usuarios)]
+        existentes = {u for u, in session.query(Usuario.username).filter(Usuario.username.in_(usuarios))}
+        for username in usuarios:
+            if username not in existentes:
+                criar_usuario(session, username, "senha-" + username, "user")
+    finally:
+        session.close()
+
+    # Primeira rodada refaz os hashes gravados com outro custo, se houver
+    for username in usuarios:
+        _login(username, "senha-" + username)
+
+    pedidos = [usuarios[i % len(usuarios)] for i in range(args.logins)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as executor:
+        resultados = list(executor.map(lambda u: _login(u, "senha-" + u), pedidos))
+    total = time.perf_counter() - inicio
+    latencias = sorted(tempo for tempo, _ in resultados)
+    falhas = sum(1 for _, token in resultados if token is None)
+
+    tokens = [token for _, token in resultados if token]
+    inicio = time.perf_counter()
+    for token in tokens * 10:
+        usuario_da_sessao(token)
+    por_token = (time.perf_counter() - inicio) / max(len(tokens) * 10, 1)
+
+    memoria = 128 * args.r * 2 ** args.log_n / 2 ** 20
+    print(f"scrypt N=2^{args.log_n} r={args.r} p={args.p} ({memoria:.0f} MiB por hash), {args.threads} threads")
+    print(f"logins:      {args.logins / total:8.1f} por segundo ({falhas} falhas)")
+    print(f"latência:    média {statistics.fmean(latencias) * 1000:.1f} ms, "
+          f"p95 {latencias[int(len(latencias) * 0.95) - 1] * 1000:.1f} ms, máxima {latencias[-1] * 1000:.1f} ms")
+    print(f"token:       {por_token * 1e6:8.2f} µs por verificação de sessão")
+
+
+if __name__ == "__main__":
+    main()
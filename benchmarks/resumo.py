@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+# Consistência do resumo por cidade (resumo_cidades): aplica cada tipo de escrita em apartamentos
+# (ORM, funções CRUD e operações em lote) e compara o resumo com o agrupamento feito na hora
+# (verificar_resumo_cidades) depois de cada uma. Inclui objetos alterados depois de um commit,
+# quando os atributos já expiraram. O comando sai com código 1 se alguma escrita deixar o resumo
+# divergente; as linhas criadas aqui são apagadas no final.
+# Uso: python -m benchmarks.resumo --banco sqlite:///benchmark.db
+
+PREFIXO = "RESUMO-"
+
+
+def cenarios(app):
+    cpf, n_seguro = f"{PREFIXO}C", f"{PREFIXO}P"
+    r1, r2, r3 = f"{PREFIXO}1", f"{PREFIXO}2", f"{PREFIXO}3"
+
+    def preparar(session):
+        app.create_cliente(session, cpf, "Resumo", "-", date(1990, 1, 1), "F")
+        app.create_apolice(session, n_seguro, date(2020, 1, 1), 100, "Resumo", cpf)
+
+    def criar_orm(session):
+        app.create_apartamento(session, r1, "Curitiba", 50, n_seguro, 1000, 2)
+        app.create_apartamento(session, r2, "Curitiba", 70, n_seguro, None, 3)
+
+    def alterar_depois_do_commit(session):
+        apartamento = app.read_apartamento(session, r1)
+        session.commit()  # os atributos expiram
+        apartamento.cidade = "Maringá"
+        session.commit()
+
+    def alterar_valores_expirados(session):
+        apartamento = app.read_apartamento(session, r1)
+        session.commit()
+        apartamento.valor_mercado = 2000
+        apartamento.metragem = None
+        session.commit()
+
+    def alterar_chave_e_cidade(session):
+        apartamento = app.read_apartamento(session, r2)
+        session.commit()
+        apartamento.logradouro = r3
+        apartamento.cidade = "Londrina"
+        session.commit()
+
+    def atualizar(session):
+        app.update_apartamento(session, r3, cidade="Curitiba", valor_mercado=500)
+
+    def upsert_em_lote(session):
+        app.upsert_apartamentos_bulk(session, [
+            {"logradouro": r1, "cidade": "Londrina", "metragem": 40, "fk_seguro": n_seguro, "valor_mercado": 900, "n_moradores": 1},
+            {"logradouro": r2, "cidade": "Maringá", "metragem": 60, "fk_seguro": n_seguro, "valor_mercado": 800, "n_moradores": 2},
+        ])
+
+    def deletar_orm(session):
+        apartamento = app.read_apartamento(session, r2)
+        session.commit()
+        session.delete(apartamento)
+        session.commit()
+
+    def deletar(session):
+        app.delete_apartamento(session, r3)
+
+    def deletar_em_lote(session):
+        app.delete_apartamentos_bulk(session, [r1, r2, r3])
+
+    def limpar(session):
+        app.delete_apolice(session, n_seguro)
+        app.delete_cliente(session, cpf)
+
+    return [
+        ("preparação", preparar),
+        ("criação pelo ORM", criar_orm),
+        ("cidade alterada depois do commit", alterar_depois_do_commit),
+        ("valores alterados depois do commit", alterar_valores_expirados),
+        ("chave e cidade alteradas", alterar_chave_e_cidade),
+        ("update_apartamento", atualizar),
+        ("upsert em lote", upsert_em_lote),
+        ("deleção pelo ORM", deletar_orm),
+        ("delete_apartamento", deletar),
+        ("deleção em lote", deletar_em_lote),
+        ("limpeza", limpar),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consistência do resumo por cidade após cada tipo de escrita")
+    parser.add_argument("--banco", help="URL do banco (DATABASE_URL)")
+    args = parser.parse_args()
+
+    if args.banco:
+        os.environ["DATABASE_URL"] = args.banco
+    import app
+
+    app.create_tables()
+    falhas = []
+    # SessionLocal, como a interface: os atributos expiram a cada commit (o session_scope não expira)
+    session = app.SessionLocal()
+    try:
+        # Divergências anteriores não são atribuídas às escritas daqui
+        anteriores = {d["cidade"] for d in app.verificar_resumo_cidades(session)}
+        for nome, escrita in cenarios(app):
+            inicio = time.perf_counter()
+            escrita(session)
+            segundos = time.perf_counter() - inicio
+            divergencias = [d for d in app.verificar_resumo_cidades(session) if d["cidade"] not in anteriores]
+            print(f"{nome:<36} {segundos * 1000:8.2f}ms {'ok' if not divergencias else 'DIVERGENTE'}")
+            falhas += [f"{nome}: {d['cidade']} {d['resumo']} != {d['real']}" for d in divergencias]
+    finally:
+        session.close()
+
+    for falha in falhas:
+        print(f"Falhou: {falha}", file=sys.stderr)
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+# Carga no servidor HTTP (servidor.py): N clientes simultâneos, cada um com a sua conexão
+# mantida aberta, alternando leituras de cliente por CPF e listagens de apólices filtradas por
+# valor. Mostra requisições por segundo e latências (p50/p95/p99) para cada número de clientes;
+# o número de conexões ao banco fica limitado a processos * (pool + overflow) em todos os casos.
+# O servidor é iniciado aqui com --processos/--pool, ou use --servidor para um que já esteja no ar.
+# Antes da carga, uma escrita é seguida de leituras por conexões novas (atendidas por processos
+# diferentes); o comando sai com código 1 se alguma delas devolver o valor antigo.
+# Uso: python -m benchmarks.servidor --banco sqlite:///benchmark.db --processos 4 --clientes 10 100 500
+#      python -m benchmarks.servidor --servidor http://127.0.0.1:8000 --clientes 10 100
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USUARIO = "benchmark"
+SENHA = "benchmark"
+
+
+def _percentil(ordenados, fracao):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * fracao))] * 1000
+
+
+def _aguardar(url, tempo_limite=30):
+    limite = time.monotonic() + tempo_limite
+    while True:
+        try:
+            with urllib.request.urlopen(f"{url}/saude", timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > limite:
+                raise RuntimeError(f"O servidor em {url} não respondeu")
+            time.sleep(0.2)
+
+
+def medir(cliente_http, url, token, clientes, requisicoes, cpfs, semente):
+    tempos = []
+    erros = []
+    trava = threading.Lock()
+    restantes = iter(range(requisicoes))
+
+    def executar(indice):
+        aleatorio = random.Random(semente + indice)
+        conexao = cliente_http.ConexaoServidor(url, token)
+        locais = []
+        try:
+            # next() num iterador compartilhado divide as requisições entre os clientes
+            for _ in restantes:
+                inicio = time.perf_counter()
+                try:
+                    if aleatorio.random() < 0.5:
+                        cliente_http.read_cliente(conexao, aleatorio.choice(cpfs))
+                    else:
+                        cliente_http.list_apolices(conexao, limite=20, valor_mensal__gt=aleatorio.randint(0, 5000))
+                except (OSError, cliente_http.ErroServidor) as e:
+                    with trava:
+                        erros.append(e)
+                    conexao.fechar()
+                    continue
+                locais.append(time.perf_counter() - inicio)
+        finally:
+            conexao.fechar()
+            with trava:
+                tempos.extend(locais)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=executar, args=(i,)) for i in range(clientes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - inicio
+
+    ordenados = sorted(tempos) or [0.0]
+    return {
+        "requisicoes": len(tempos),
+        "erros": len(erros),
+        "req_por_segundo": len(tempos) / total if total > 0 else 0.0,
+        "p50_ms": _percentil(ordenados, 0.50),
+        "p95_ms": _percentil(ordenados, 0.95),
+        "p99_ms": _percentil(ordenados, 0.99),
+    }
+
+
+def verificar_leitura_apos_escrita(cliente_http, url, token, cpfs, conexoes=16):
+    """Altera o nome de um cliente e o lê por conexões novas; retorna os nomes antigos encontrados"""
+    cpf = cpfs[0]
+    conexao = cliente_http.ConexaoServidor(url, token)
+    original = cliente_http.read_cliente(conexao, cpf).nome
+    # Deixa o valor antigo no cache dos processos antes da escrita
+    for _ in range(conexoes):
+        leitura = cliente_http.ConexaoServidor(url, token)
+        cliente_http.read_cliente(leitura, cpf)
+        leitura.fechar()
+    novo = f"{original} (verificação)"
+    antigos = []
+    try:
+        cliente_http.update_cliente(conexao, cpf, nome=novo)
+        for _ in range(conexoes):
+            leitura = cliente_http.ConexaoServidor(url, token)
+            nome = cliente_http.read_cliente(leitura, cpf).nome
+            leitura.fechar()
+            if nome != novo:
+                antigos.append(nome)
+    finally:
+        cliente_http.update_cliente(conexao, cpf, nome=original)
+        conexao.fechar()
+    return antigos
+
+
+def _preparar_banco(linhas, semente):
+    # Base sintética e usuário administrador do benchmark, direto no banco
+    import app
+    from benchmarks import dados
+
+    app.create_tables()
+    with app.session_scope() as session:
+        if not session.get(app.Cliente, dados.chave_cliente("G", 0)):
+            dados.popular(session, linhas, semente)
+        if not session.query(app.Usuario).filter_by(username=USUARIO).first():
+            app.criar_usuario(session, USUARIO, SENHA, "admin")
+        cpfs = [cpf for cpf, in session.query(app.Cliente.cpf).filter(app.Cliente.cpf.like("G%")).limit(1000)]
+    app.get_engine().dispose()  # o servidor abre as suas próprias conexões
+    return cpfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão e latência do servidor HTTP por número de clientes")
+    parser.add_argument("--servidor", help="URL de um servidor já iniciado (sem ela, o servidor é iniciado aqui)")
+    parser.add_argument("--banco", help="URL do banco (DATABASE_URL) do servidor iniciado aqui")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pool", type=int, default=2, help="conexões fixas por processo")
+    parser.add_argument("--overflow", type=int, default=2, help="conexões extras por processo")
+    parser.add_argument("--linhas", type=int, default=10000, help="tamanho da base sintética, se ainda não existir")
+    parser.add_argument("--clientes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--requisicoes", type=int, default=5000, help="requisições por medição")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.banco:
+        os.environ["DATABASE_URL"] = args.banco
+    cpfs = _preparar_banco(args.linhas, args.semente)
+    import cliente_http
+
+    processo = None
+    url = args.servidor
+    if url is None:
+        url = f"http://127.0.0.1:{args.porta}"
+        processo = subprocess.Popen(
+            [sys.executable, "servidor.py", "--porta", str(args.porta), "--processos", str(args.processos),
+             "--pool", str(args.pool), "--overflow", str(args.overflow)],
+            cwd=RAIZ,
+        )
+    try:
+        _aguardar(url)
+        conexao = cliente_http.ConexaoServidor(url)
+        if cliente_http.iniciar_sessao(conexao, USUARIO, SENHA) is None:
+            raise RuntimeError(f"Não foi possível entrar como '{USUARIO}' no servidor")
+        token = cliente_http._token
+        conexao.fechar()
+
+        antigos = verificar_leitura_apos_escrita(cliente_http, url, token, cpfs)
+        if antigos:
+            print(f"Falhou: {len(antigos)} leituras depois da escrita devolveram o valor antigo", file=sys.stderr)
+
+        print(f"{'clientes':>8} {'req/s':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'erros':>6}")
+        for clientes in args.clientes:
+            r = medir(cliente_http, url, token, clientes, args.requisicoes, cpfs, args.semente + clientes)
+            print(f"{clientes:>8} {r['req_por_segundo']:10.1f} {r['p50_ms']:8.2f}ms {r['p95_ms']:8.2f}ms "
+                  f"{r['p99_ms']:8.2f}ms {r['erros']:>6}")
+        if processo is not None:
+            print(f"Conexões ao banco: no máximo {args.processos * (args.pool + args.overflow)} "
+                  f"({args.processos} processos x {args.pool + args.overflow})", file=sys.stderr)
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+    sys.exit(1 if antigos else 0)
+
+
+if __name__ == "__main__":
+    main()
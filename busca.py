@@ -0,0 +1,304 @@
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+from sqlalchemy import Float, and_, column, inspect, or_, select, text, type_coerce
+from sqlalchemy.dialects.mysql import match
+import app
+from app import Cliente, Acidente, LIMITE_PAGINA, get_engine, versao_dados, _codificar_cursor, _decodificar_cursor
+
+# Busca textual por prefixo e palavra-chave em Cliente.nome, Cliente.contato e Acidente.descricao,
+# com resultados ordenados por relevância e paginados por cursor, como as listagens do app.
+# Todas as palavras da busca precisam aparecer no registro, cada uma como início de alguma palavra
+# dele ("mar sil" encontra "Maria da Silva"); maiúsculas e acentos são ignorados.
+# No MySQL a busca usa os índices FULLTEXT (MATCH ... AGAINST em modo booleano, criados pelo
+# create_indexes). Nos demais bancos, ou sem os índices, usa um índice invertido em memória,
+# montado na primeira busca e mantido pelas escritas do próprio processo (as funções CRUD, as
+# operações em lote e a importação avisam as chaves alteradas no commit). Cada busca compara a
+# versão dos dados da tabela (app.versao_dados) com a do índice: se outro processo gravou na
+# tabela, o índice é remontado; com vários processos gravando muito, prefira o MySQL com FULLTEXT.
+# Uso:
+#     pagina = buscar_clientes(session, "maria sil")
+#     for cliente in pagina["itens"]:
+#         print(cliente.cpf, cliente.nome, cliente.relevancia)
+#     seguinte = buscar_clientes(session, "maria sil", cursor=pagina["proximo_cursor"])
+
+BUSCA_BACKEND = os.environ.get("BUSCA_BACKEND", "auto")  # auto, fulltext ou memoria
+BUSCA_RECONSTRUIR_S = float(os.environ.get("BUSCA_RECONSTRUIR_S", 300))  # 0 nunca remonta
+# Palavras menores da busca são ignoradas. O padrão é o do innodb_ft_min_token_size do MySQL, que
+# não indexa palavras menores; com FULLTEXT vale o valor configurado no servidor (tamanho_minimo_termo)
+TAMANHO_MINIMO_TERMO = 3
+TAMANHO_LOTE_INDICE = 5000
+# Acima desta fração de registros alterados o índice é remontado em vez de atualizado
+FRACAO_MAXIMA_PENDENTES = 0.2
+
+# tabela -> (modelo, colunas pesquisadas, índice FULLTEXT no MySQL)
+CAMPOS_BUSCA = {
+    "clientes": (Cliente, ("nome", "contato"), "ft_clientes_nome_contato"),
+    "acidentes": (Acidente, ("descricao",), "ft_acidentes_descricao"),
+}
+
+# Itens dos resultados: as colunas do registro e a relevância
+RESULTADOS = {
+    tabela: namedtuple(f"Resultado{modelo.__name__}", [c.key for c in modelo.__mapper__.column_attrs] + ["relevancia"])
+    for tabela, (modelo, _, _) in CAMPOS_BUSCA.items()
+}
+RELEVANCIA = column("relevancia", Float)
+
+
+def normalizar(texto):
+    """Palavras do texto em minúsculas e sem acentos"""
+    sem_acentos = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return re.findall(r"[a-z0-9]+", sem_acentos.lower())
+
+
+def termos_da_busca(texto):
+    minimo = tamanho_minimo_termo()
+    return list(dict.fromkeys(termo for termo in normalizar(texto) if len(termo) >= minimo))
+
+
+class IndiceInvertido:
+    """Índice em memória: palavra -> chaves dos registros, com as palavras ordenadas para a busca por prefixo"""
+
+    def __init__(self):
+        self._palavras_por_chave = {}
+        self._chaves_por_palavra = {}
+        self._ordenadas = []
+        self._trava = threading.Lock()
+
+    def __len__(self):
+        return len(self._palavras_por_chave)
+
+    def carregar(self, registros):
+        # Montagem inicial: as palavras são ordenadas uma vez só, no fim
+        for chave, texto in registros:
+            palavras = set(normalizar(texto))
+            self._palavras_por_chave[chave] = palavras
+            for palavra in palavras:
+                self._chaves_por_palavra.setdefault(palavra, set()).add(chave)
+        self._ordenadas = sorted(self._chaves_por_palavra)
+
+    def _remover(self, chave):
+        for palavra in self._palavras_por_chave.pop(chave, ()):
+            chaves = self._chaves_por_palavra[palavra]
+            chaves.discard(chave)
+            if not chaves:
+                del self._chaves_por_palavra[palavra]
+                del self._ordenadas[bisect_left(self._ordenadas, palavra)]
+
+    def atualizar(self, gravados, removidos):
+        with self._trava:
+            for chave in removidos:
+                self._remover(chave)
+            for chave, texto in gravados:
+                self._remover(chave)
+                palavras = set(normalizar(texto))
+                self._palavras_por_chave[chave] = palavras
+                for palavra in palavras:
+                    if palavra not in self._chaves_por_palavra:
+                        self._chaves_por_palavra[palavra] = set()
+                        insort(self._ordenadas, palavra)
+                    self._chaves_por_palavra[palavra].add(chave)
+
+    def buscar(self, termos):
+        """{chave: relevância} dos registros que têm todos os termos como prefixo de alguma palavra"""
+        with self._trava:
+            total = len(self._palavras_por_chave)
+            pontuacoes = None
+            for termo in termos:
+                parciais = {}
+                posicao = bisect_left(self._ordenadas, termo)
+                while posicao < len(self._ordenadas) and self._ordenadas[posicao].startswith(termo):
+                    palavra = self._ordenadas[posicao]
+                    posicao += 1
+                    chaves = self._chaves_por_palavra[palavra]
+                    # Palavras raras valem mais (IDF); um prefixo vale a fração da palavra que cobre
+                    peso = math.log(1 + total / len(chaves)) * len(termo) / len(palavra)
+                    for chave in chaves if pontuacoes is None else chaves & pontuacoes.keys():
+                        if peso > parciais.get(chave, 0.0):
+                            parciais[chave] = peso
+                pontuacoes = parciais if pontuacoes is None else {chave: pontuacoes[chave] + parcial for chave, parcial in parciais.items()}
+                if not pontuacoes:
+                    break
+            return pontuacoes or {}
+
+
+# Índices em memória por tabela, com as chaves alteradas desde a última busca. A trava dos
+# pendentes é separada para o commit de quem grava não esperar a montagem de um índice.
+_indices = {}
+_montados_em = {}
+_versoes = {}  # versão dos dados refletida por cada índice
+_pendentes = {}
+_proprias = {}  # versões gravadas pelos commits deste processo, cobertas pelos pendentes
+_trava_indices = threading.Lock()
+_trava_pendentes = threading.Lock()
+_backend = None
+_tamanho_minimo = None
+
+
+def _marcar_pendentes(chaves, versoes):
+    with _trava_pendentes:
+        for tabela, chave in chaves:
+            if tabela in _pendentes:
+                _pendentes[tabela].add(chave)
+        for tabela, versao in versoes.items():
+            if tabela in _proprias:
+                _proprias[tabela].add(versao)
+
+
+app.ao_confirmar_alteracoes.append(_marcar_pendentes)
+
+
+def descartar_indices():
+    """Descarta os índices em memória, remontados na próxima busca (usado após restaurar um checkpoint)"""
+    with _trava_indices, _trava_pendentes:
+        _indices.clear()
+        _montados_em.clear()
+        _versoes.clear()
+        _pendentes.clear()
+        _proprias.clear()
+
+
+def _linhas_texto(conexao, modelo, campos, chaves=None):
+    chave = modelo.__mapper__.primary_key[0]
+    consulta = select(chave, *[getattr(modelo, campo) for campo in campos])
+    if chaves is not None:
+        consulta = consulta.where(chave.in_(chaves))
+    for linha in conexao.execution_options(yield_per=TAMANHO_LOTE_INDICE).execute(consulta):
+        yield linha[0], " ".join(valor for valor in linha[1:] if valor)
+
+
+def _retirar_pendentes(tabela):
+    with _trava_pendentes:
+        pendentes = _pendentes.get(tabela, set())
+        proprias = _proprias.get(tabela, set())
+        _pendentes[tabela] = set()
+        _proprias[tabela] = set()
+    return pendentes, proprias
+
+
+def _so_escritas_proprias(anterior, versao, proprias):
+    # Todas as versões entre a do índice e a atual vieram de commits deste processo
+    return anterior is not None and anterior <= versao and all(v in proprias for v in range(anterior + 1, versao + 1))
+
+
+def _indice(tabela):
+    modelo, campos, _ = CAMPOS_BUSCA[tabela]
+    chave = modelo.__mapper__.primary_key[0]
+    # Conexão própria: lê o que já foi confirmado, mesmo que a sessão de quem busca tenha
+    # começado antes da última escrita
+    with _trava_indices, get_engine().connect() as conexao:
+        indice = _indices.get(tabela)
+        # As alterações confirmadas durante a leitura abaixo ficam pendentes para a próxima busca
+        pendentes, proprias = _retirar_pendentes(tabela)
+        # Lida antes da leitura: uma escrita confirmada durante a montagem força outra
+        versao = versao_dados(conexao, tabela)
+        expirado = BUSCA_RECONSTRUIR_S and time.monotonic() - _montados_em.get(tabela, 0) > BUSCA_RECONSTRUIR_S
+        if (indice is None or expirado or not _so_escritas_proprias(_versoes.get(tabela), versao, proprias)
+                or len(pendentes) > FRACAO_MAXIMA_PENDENTES * max(len(indice), 1000)):
+            indice = IndiceInvertido()
+            indice.carregar(_linhas_texto(conexao, modelo, campos))
+            _indices[tabela] = indice
+            _montados_em[tabela] = time.monotonic()
+            _versoes[tabela] = versao
+        elif pendentes:
+            chaves = {chave.type.python_type(c) for c in pendentes}
+            gravados = []
+            lista = list(chaves)
+            for inicio in range(0, len(lista), TAMANHO_LOTE_INDICE):
+                gravados += _linhas_texto(conexao, modelo, campos, lista[inicio:inicio + TAMANHO_LOTE_INDICE])
+            indice.atualizar(gravados, chaves - {c for c, _ in gravados})
+            _versoes[tabela] = versao
+    return indice
+
+
+def backend():
+    """'fulltext' ou 'memoria': a escolha de BUSCA_BACKEND ou, em 'auto', FULLTEXT se os índices existirem"""
+    global _backend
+    if _backend is None:
+        escolhido = BUSCA_BACKEND
+        if escolhido == "auto":
+            engine = get_engine()
+            escolhido = "memoria"
+            if engine.dialect.name == "mysql":
+                inspetor = inspect(engine)
+                existentes = {i["name"] for tabela in CAMPOS_BUSCA for i in inspetor.get_indexes(tabela)}
+                if all(indice in existentes for _, _, indice in CAMPOS_BUSCA.values()):
+                    escolhido = "fulltext"
+        _backend = escolhido
+    return _backend
+
+
+def tamanho_minimo_termo():
+    """Com FULLTEXT, o innodb_ft_min_token_size do servidor; nos demais casos TAMANHO_MINIMO_TERMO"""
+    global _tamanho_minimo
+    if _tamanho_minimo is None:
+        tamanho = TAMANHO_MINIMO_TERMO
+        if backend() == "fulltext":
+            with get_engine().connect() as conexao:
+                tamanho = int(conexao.execute(text("SELECT @@innodb_ft_min_token_size")).scalar())
+        _tamanho_minimo = tamanho
+    return _tamanho_minimo
+
+
+def _buscar_fulltext(session, tabela, termos, limite, cursor):
+    modelo, campos, _ = CAMPOS_BUSCA[tabela]
+    chave = modelo.__mapper__.primary_key[0]
+    # Modo booleano: +termo* exige a palavra e aceita qualquer continuação
+    encontrado = match(*[getattr(modelo, campo) for campo in campos], against=" ".join(f"+{termo}*" for termo in termos)).in_boolean_mode()
+    relevancia = type_coerce(encontrado, Float)
+    consulta = select(*modelo.__table__.columns, relevancia.label("relevancia")).where(encontrado)
+    if cursor:
+        ultima, ultima_chave = _decodificar_cursor(cursor, [RELEVANCIA, chave])
+        consulta = consulta.where(or_(relevancia < ultima, and_(relevancia == ultima, chave > ultima_chave)))
+    consulta = consulta.order_by(relevancia.desc(), chave).limit(limite + 1)
+    return [RESULTADOS[tabela](*linha) for linha in session.execute(consulta)]
+
+
+def _buscar_memoria(session, tabela, termos, limite, cursor):
+    modelo, _, _ = CAMPOS_BUSCA[tabela]
+    chave = modelo.__mapper__.primary_key[0]
+    pontuacoes = _indice(tabela).buscar(termos).items()
+    if cursor:
+        ultima, ultima_chave = _decodificar_cursor(cursor, [RELEVANCIA, chave])
+        pontuacoes = [(c, p) for c, p in pontuacoes if p < ultima or (p == ultima and c > ultima_chave)]
+    # Só os primeiros da página são ordenados
+    pagina = heapq.nsmallest(limite + 1, pontuacoes, key=lambda item: (-item[1], item[0]))
+    if not pagina:
+        return []
+    linhas = {
+        linha[0]: linha
+        for linha in session.execute(select(chave, *modelo.__table__.columns).where(chave.in_([c for c, _ in pagina])))
+    }
+    return [RESULTADOS[tabela](*linhas[c][1:], p) for c, p in pagina if c in linhas]
+
+
+def buscar(session, tabela, texto, limite=LIMITE_PAGINA, cursor=None):
+    """Registros de `tabela` (clientes ou acidentes) que correspondem ao texto -> {"itens", "proximo_cursor"}"""
+    if tabela not in CAMPOS_BUSCA:
+        raise ValueError(f"Busca não disponível para a tabela: {tabela}")
+    termos = termos_da_busca(texto)
+    if not termos:
+        return {"itens": [], "proximo_cursor": None}
+    buscar_em = _buscar_fulltext if backend() == "fulltext" else _buscar_memoria
+    # Uma linha a mais indica se existe próxima página
+    itens = buscar_em(session, tabela, termos, limite, cursor)
+    proximo_cursor = None
+    if len(itens) > limite:
+        itens = itens[:limite]
+        chave = CAMPOS_BUSCA[tabela][0].__mapper__.primary_key[0].key
+        proximo_cursor = _codificar_cursor([itens[-1].relevancia, getattr(itens[-1], chave)])
+    return {"itens": itens, "proximo_cursor": proximo_cursor}
+
+
+def buscar_clientes(session, texto, limite=LIMITE_PAGINA, cursor=None):
+    return buscar(session, "clientes", texto, limite, cursor)
+
+
+def buscar_acidentes(session, texto, limite=LIMITE_PAGINA, cursor=None):
+    return buscar(session, "acidentes", texto, limite, cursor)
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+
+# Cache das leituras por chave primária (read_cliente, read_apolice, ...).
+# Guarda só os valores das colunas de cada linha, nunca objetos do ORM.
+# As escritas invalidam as chaves alteradas e o rollback de checkpoint limpa tudo.
+# O cache local (CacheLRU) só vê as escritas do próprio processo: com várias instâncias da
+# aplicação, uma linha alterada por outra instância continua sendo lida do cache até o CACHE_TTL
+# expirar. Para várias instâncias use o servidor compartilhado (CACHE_SERVIDOR) ou um TTL curto.
+
+CACHE_MAX_ITENS = int(os.environ.get("CACHE_MAX_ITENS", 10000))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 300))  # segundos; 0 desativa a expiração
+# host:porta de um servidor de cache compartilhado (ver servir_cache); vazio usa o cache local
+CACHE_SERVIDOR = os.environ.get("CACHE_SERVIDOR", "")
+# Segredo compartilhado entre o servidor de cache e os clientes: o protocolo do multiprocessing
+# troca objetos com pickle, então quem conhece a chave consegue executar código no servidor
+CACHE_CHAVE_AUTENTICACAO = os.environ.get("CACHE_CHAVE_AUTENTICACAO", "").encode()
+
+
+class CacheLRU:
+    """Cache em memória com limite de itens (LRU) e tempo de vida por item"""
+
+    def __init__(self, max_itens=CACHE_MAX_ITENS, ttl=CACHE_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (expira_em, valor), do menos para o mais recente
+        self._trava = threading.Lock()
+        # Incrementada a cada invalidação: uma leitura feita antes dela não pode mais ser gravada
+        self._versao = 0
+        self._contadores = {"acertos": 0, "faltas": 0, "expulsoes": 0, "expirados": 0, "invalidacoes": 0}
+
+    def versao(self):
+        with self._trava:
+            return self._versao
+
+    def obter(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and item[0] and item[0] < time.monotonic():
+                del self._itens[chave]
+                self._contadores["expirados"] += 1
+                item = None
+            if item is None:
+                self._contadores["faltas"] += 1
+                return None
+            self._itens.move_to_end(chave)
+            self._contadores["acertos"] += 1
+            return dict(item[1])
+
+    def gravar(self, chave, valor, versao=None):
+        with self._trava:
+            if versao is not None and versao != self._versao:
+                return False
+            expira_em = time.monotonic() + self.ttl if self.ttl else 0
+            self._itens[chave] = (expira_em, dict(valor))
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self._contadores["expulsoes"] += 1
+            return True
+
+    def remover(self, chaves):
+        with self._trava:
+            self._versao += 1
+            for chave in chaves:
+                if self._itens.pop(chave, None) is not None:
+                    self._contadores["invalidacoes"] += 1
+
+    def limpar(self):
+        with self._trava:
+            self._versao += 1
+            self._contadores["invalidacoes"] += len(self._itens)
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._trava:
+            estatisticas = dict(self._contadores, itens=len(self._itens), max_itens=self.max_itens, ttl=self.ttl)
+        consultas = estatisticas["acertos"] + estatisticas["faltas"]
+        estatisticas["taxa_acerto"] = estatisticas["acertos"] / consultas if consultas else 0.0
+        return estatisticas
+
+
+# Servidor de cache compartilhado entre instâncias da aplicação (substituto local de um
+# memcached/redis): um processo serve um CacheLRU e os demais usam CacheRemoto como backend.
+class _GerenciadorCache(BaseManager):
+    pass
+
+
+def _chave_autenticacao():
+    if not CACHE_CHAVE_AUTENTICACAO:
+        raise ValueError("Defina CACHE_CHAVE_AUTENTICACAO para usar o servidor de cache")
+    return CACHE_CHAVE_AUTENTICACAO
+
+
+def servir_cache(host="127.0.0.1", porta=50000, max_itens=CACHE_MAX_ITENS, ttl=CACHE_TTL):
+    cache = CacheLRU(max_itens, ttl)
+    _GerenciadorCache.register("cache", callable=lambda: cache)
+    gerenciador = _GerenciadorCache(address=(host, porta), authkey=_chave_autenticacao())
+    gerenciador.get_server().serve_forever()
+
+
+def _no_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class CacheRemoto:
+    """Backend que repassa as operações para um servidor iniciado com servir_cache"""
+
+    def __init__(self, endereco):
+        host, porta = endereco.rsplit(":", 1)
+        _GerenciadorCache.register("cache")
+        self._endereco = (host, int(porta))
+        self._chave = _chave_autenticacao()
+        self._local = threading.local()  # os proxies não podem ser compartilhados entre threads
+        # Cada operação é uma ida e volta pelo socket. Dentro de um event loop (assincrono.py roda
+        # as funções do app com run_sync) ela bloquearia o loop: as leituras passam direto para o
+        # banco e as invalidações vão, em ordem, para esta thread
+        self._fila = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-remoto")
+
+    def _cache(self):
+        if not hasattr(self._local, "cache"):
+            gerenciador = _GerenciadorCache(address=self._endereco, authkey=self._chave)
+            gerenciador.connect()
+            self._local.cache = gerenciador.cache()
+        return self._local.cache
+
+    def versao(self):
+        return 0 if _no_event_loop() else self._cache().versao()
+
+    def obter(self, chave):
+        return None if _no_event_loop() else self._cache().obter(chave)
+
+    def gravar(self, chave, valor, versao=None):
+        return False if _no_event_loop() else self._cache().gravar(chave, valor, versao)
+
+    def remover(self, chaves):
+        if _no_event_loop():
+            self._fila.submit(self._remover, list(chaves))
+        else:
+            self._remover(list(chaves))
+
+    def _remover(self, chaves):
+        self._cache().remover(chaves)
+
+    def limpar(self):
+        if _no_event_loop():
+            self._fila.submit(self._limpar)
+        else:
+            self._limpar()
+
+    def _limpar(self):
+        self._cache().limpar()
+
+    def estatisticas(self):
+        return self._cache().estatisticas()
+
+
+class CacheDesligado:
+    """Backend que não guarda nada, para processos que não compartilham a memória com quem grava"""
+
+    def versao(self):
+        return 0
+
+    def obter(self, chave):
+        return None
+
+    def gravar(self, chave, valor, versao=None):
+        return False
+
+    def remover(self, chaves):
+        pass
+
+    def limpar(self):
+        pass
+
+    def estatisticas(self):
+        return {"acertos": 0, "faltas": 0, "expulsoes": 0, "expirados": 0, "invalidacoes": 0,
+                "itens": 0, "max_itens": 0, "ttl": 0, "taxa_acerto": 0.0}
+
+
+_backend = CacheRemoto(CACHE_SERVIDOR) if CACHE_SERVIDOR else CacheLRU()
+
+
+def configurar_cache(backend):
+    """Troca o backend usado pelas leituras (qualquer objeto com a interface de CacheLRU)"""
+    global _backend
+    _backend = backend
+
+
+def chave_cache(tabela, chave):
+    return f"{tabela}:{chave}"
+
+
+def versao_cache():
+    return _backend.versao()
+
+
+def obter_do_cache(tabela, chave):
+    return _backend.obter(chave_cache(tabela, chave))
+
+
+def gravar_no_cache(tabela, chave, valores, versao=None):
+    return _backend.gravar(chave_cache(tabela, chave), valores, versao)
+
+
+def invalidar_cache(tabela, chaves):
+    _backend.remover([chave_cache(tabela, chave) for chave in chaves])
+
+
+def limpar_cache():
+    _backend.limpar()
+
+
+def metricas_cache():
+    return _backend.estatisticas()
+
+
+if __name__ == "__main__":
+    import sys
+    endereco = sys.argv[1] if len(sys.argv) > 1 else "127.0.0.1:50000"
+    host, porta = endereco.rsplit(":", 1)
+    print(f"Servidor de cache em {host}:{porta}")
+    servir_cache(host, int(porta))
@@ -0,0 +1,396 @@
+import json
+import time
+import zlib
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import select, func, inspect, bindparam
+from sqlalchemy.sql import text
+from app import (
+    get_engine, Cliente, Apolice, Apartamento, Acidente, Checkpoint, CheckpointBloco, Alteracao, MARCADOR_ROLLBACK,
+    ARQUIVOS, reconstruir_resumo_cidades, registrar_tabelas_alteradas
+)
+from cache import limpar_cache
+from busca import descartar_indices
+
+# Tabelas na ordem de dependência (pais antes dos filhos). As tabelas de arquivo
+# (acidentes_arquivo e apolices_arquivo, ver arquivamento.py) ficam de fora: os checkpoints
+# guardam e restauram apenas as tabelas principais, e a restauração só apaga do arquivo as
+# linhas que voltaram às principais (ver _descartar_copias_arquivadas)
+TABELAS = [Cliente.__table__, Apolice.__table__, Apartamento.__table__, Acidente.__table__]
+TABELAS_POR_NOME = {tabela.name: tabela for tabela in TABELAS}
+
+# A cada INTERVALO_BASE deltas um novo checkpoint completo é gravado,
+# limitando o tamanho da cadeia que precisa ser aplicada no rollback
+INTERVALO_BASE = 10
+
+# Quantidade máxima de chaves por cláusula IN
+TAMANHO_LOTE_CHAVES = 1000
+
+# Linhas por bloco gravado: limita a memória usada ao salvar e ao restaurar
+TAMANHO_BLOCO = 5000
+
+# Linhas por executemany na restauração
+TAMANHO_LOTE_RESTAURACAO = 1000
+
+# Abaixo desta fração de linhas alteradas o rollback aplica apenas a diferença
+FRACAO_MAXIMA_DIFF = 0.2
+
+
+def _chave_primaria(tabela):
+    return list(tabela.primary_key.columns)[0]
+
+
+def _linha_para_dict(linha):
+    # Converte data/datetime para string
+    return {
+        coluna: valor.strftime("%Y-%m-%d") if isinstance(valor, (date, datetime)) else valor
+        for coluna, valor in linha.items()
+    }
+
+
+def _dict_para_linha(tabela, linha):
+    # Converte as strings de data de volta para date
+    convertida = dict(linha)
+    for coluna in tabela.columns:
+        valor = convertida.get(coluna.name)
+        if isinstance(valor, str) and coluna.type.python_type is date:
+            convertida[coluna.name] = date.fromisoformat(valor)
+    return convertida
+
+
+def _em_lotes(linhas, tamanho_lote):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _ler_linhas(session, tabela, chaves):
+    coluna = _chave_primaria(tabela)
+    tipo = coluna.type.python_type
+    valores = [tipo(chave) for chave in chaves]
+    for lote in _em_lotes(valores, TAMANHO_LOTE_CHAVES):
+        for linha in session.execute(select(tabela).where(coluna.in_(lote))).mappings():
+            yield linha
+
+
+def _verificar(controle, mensagem):
+    # Ponto de cancelamento e de progresso entre blocos (controle vem de workers.Tarefa)
+    if controle is not None:
+        controle.verificar()
+        controle.progresso(-1, mensagem)
+
+
+def _gravar_blocos(session, checkpoint_id, tabela, tipo, linhas, controle=None):
+    # Cada bloco guarda até TAMANHO_BLOCO linhas em NDJSON comprimido
+    for lote in _em_lotes(linhas, TAMANHO_BLOCO):
+        _verificar(controle, f"Gravando {tabela.name}...")
+        dados = "\n".join(json.dumps(linha) for linha in lote)
+        session.execute(CheckpointBloco.__table__.insert(), {
+            "fk_checkpoint": checkpoint_id,
+            "tabela": tabela.name,
+            "tipo": tipo,
+            "dados": zlib.compress(dados.encode("utf-8")),
+        })
+
+
+def _ler_blocos(session, checkpoint_id):
+    """Gera (tabela, tipo, linhas) de cada bloco do checkpoint, um bloco por vez"""
+    ids = session.execute(
+        select(CheckpointBloco.id).where(CheckpointBloco.fk_checkpoint == checkpoint_id).order_by(CheckpointBloco.id)
+    ).scalars().all()
+    for bloco_id in ids:
+        tabela, tipo, dados = session.execute(
+            select(CheckpointBloco.tabela, CheckpointBloco.tipo, CheckpointBloco.dados).where(CheckpointBloco.id == bloco_id)
+        ).one()
+        linhas = zlib.decompress(dados).decode("utf-8").split("\n")
+        yield TABELAS_POR_NOME[tabela], tipo, [json.loads(linha) for linha in linhas]
+
+
+def salvar_checkpoint(session, savepoint_name, controle=None):
+    anterior = session.query(Checkpoint).order_by(Checkpoint.id.desc()).first()
+    # As alterações já consumidas são apagadas a cada checkpoint, então todas as
+    # que existem são posteriores ao anterior. O limite evita consumir as gravadas durante a leitura.
+    ultima = session.query(func.max(Alteracao.id)).scalar() or 0
+
+    alteracoes = session.query(Alteracao.tabela, Alteracao.chave).filter(
+        Alteracao.id <= ultima
+    ).distinct().all()
+    chaves_por_tabela = defaultdict(set)
+    for tabela, chave in alteracoes:
+        chaves_por_tabela[tabela].add(chave)
+
+    # Sem checkpoint anterior, após um rollback ou com a cadeia longa demais grava-se uma base
+    precisa_base = (
+        anterior is None
+        or MARCADOR_ROLLBACK in chaves_por_tabela
+        or anterior.profundidade + 1 >= INTERVALO_BASE
+    )
+
+    checkpoint = Checkpoint(
+        savepoint_name=savepoint_name,
+        tipo="base" if precisa_base else "delta",
+        fk_anterior=None if precisa_base else anterior.id,
+        profundidade=0 if precisa_base else anterior.profundidade + 1,
+    )
+    session.add(checkpoint)
+    session.flush()
+
+    if precisa_base:
+        # Leitura com cursor no servidor, em conexão separada, para não carregar as tabelas inteiras
+        with get_engine().connect() as connection:
+            for tabela in TABELAS:
+                result = connection.execution_options(stream_results=True).execute(select(tabela))
+                for particao in result.mappings().partitions(TAMANHO_BLOCO):
+                    _gravar_blocos(session, checkpoint.id, tabela, "upserts", (_linha_para_dict(l) for l in particao), controle)
+    else:
+        # Apenas as linhas alteradas: as que ainda existem são regravadas, as demais foram deletadas.
+        # Os upserts vão dos pais para os filhos e as deleções dos filhos para os pais,
+        # que é a ordem em que os blocos são aplicados na restauração.
+        deletes = {}
+        for tabela in TABELAS:
+            chaves = chaves_por_tabela.get(tabela.name)
+            if not chaves:
+                continue
+            coluna = _chave_primaria(tabela)
+            presentes = set()
+            upserts = []
+            for linha in _ler_linhas(session, tabela, chaves):
+                presentes.add(str(linha[coluna.name]))
+                upserts.append(_linha_para_dict(linha))
+            _gravar_blocos(session, checkpoint.id, tabela, "upserts", upserts, controle)
+            deletes[tabela.name] = sorted(chaves - presentes)
+        for tabela in reversed(TABELAS):
+            _gravar_blocos(session, checkpoint.id, tabela, "deletes", deletes.get(tabela.name, []), controle)
+
+    session.query(Alteracao).filter(Alteracao.id <= ultima).delete(synchronize_session=False)
+    session.commit()
+    return checkpoint
+
+
+def _blocos_legados(session, savepoint_name):
+    # Checkpoints gravados antes dos checkpoints incrementais (snapshot completo em JSON)
+    if not inspect(get_engine()).has_table("checkpoints"):
+        return None
+    result = session.execute(
+        text("SELECT data_backup FROM checkpoints WHERE savepoint_name = :name"),
+        {"name": savepoint_name}
+    ).fetchone()
+    if not result:
+        return None
+    dados = json.loads(result[0])
+    return (
+        (True, tabela, "upserts", lote)
+        for tabela in TABELAS
+        for lote in _em_lotes(dados.get(tabela.name, []), TAMANHO_BLOCO)
+    )
+
+
+def _cadeia(session, checkpoint):
+    # Checkpoints da base até o pedido
+    cadeia = [checkpoint]
+    while cadeia[-1].tipo != "base":
+        cadeia.append(session.get(Checkpoint, cadeia[-1].fk_anterior))
+    return list(reversed(cadeia))
+
+
+def _buscar_checkpoint(session, savepoint_name):
+    return session.query(Checkpoint).filter_by(savepoint_name=savepoint_name).order_by(Checkpoint.id.desc()).first()
+
+
+def ler_checkpoint(session, savepoint_name):
+    """Gera (base, tabela, tipo, linhas) da cadeia de blocos do checkpoint, ou retorna None se não existir"""
+    checkpoint = _buscar_checkpoint(session, savepoint_name)
+    if not checkpoint:
+        return _blocos_legados(session, savepoint_name)
+    cadeia = _cadeia(session, checkpoint)
+    return (
+        (atual.tipo == "base", tabela, tipo, linhas)
+        for atual in cadeia
+        for tabela, tipo, linhas in _ler_blocos(session, atual.id)
+    )
+
+
+def _chaves_alteradas_desde(session, checkpoint):
+    """Chaves que podem diferir do checkpoint, ou None se não for possível saber sem comparar tudo"""
+    alteracoes = session.query(Alteracao.tabela, Alteracao.chave).distinct().all()
+    chaves = defaultdict(set)
+    for tabela, chave in alteracoes:
+        if tabela == MARCADOR_ROLLBACK:
+            return None
+        chaves[tabela].add(chave)
+
+    # Os checkpoints posteriores precisam ser deltas descendentes do checkpoint restaurado
+    atual = session.query(Checkpoint).order_by(Checkpoint.id.desc()).first()
+    while atual.id != checkpoint.id:
+        if atual.tipo == "base":
+            return None
+        for tabela, tipo, linhas in _ler_blocos(session, atual.id):
+            if tipo == "deletes":
+                chaves[tabela.name].update(linhas)
+            else:
+                coluna = _chave_primaria(tabela).name
+                chaves[tabela.name].update(str(l[coluna]) for l in linhas)
+        atual = session.get(Checkpoint, atual.fk_anterior)
+    return chaves
+
+
+def _inserir_em_lotes(session, tabela, linhas, tamanho_lote):
+    # Cada lote vira um único executemany em vez de um INSERT por linha
+    total = 0
+    for lote in _em_lotes(linhas, tamanho_lote):
+        session.execute(tabela.insert(), [_dict_para_linha(tabela, l) for l in lote])
+        total += len(lote)
+    return total
+
+
+def _atualizar_em_lotes(session, tabela, linhas, tamanho_lote):
+    coluna = _chave_primaria(tabela)
+    demais = [c for c in tabela.columns if c is not coluna]
+    atualizacao = tabela.update().where(coluna == bindparam("_chave")).values(
+        {c.name: bindparam("v_" + c.name) for c in demais}
+    )
+    total = 0
+    for lote in _em_lotes(linhas, tamanho_lote):
+        parametros = []
+        for linha in lote:
+            linha = _dict_para_linha(tabela, linha)
+            parametro = {"v_" + c.name: linha[c.name] for c in demais}
+            parametro["_chave"] = linha[coluna.name]
+            parametros.append(parametro)
+        session.execute(atualizacao, parametros)
+        total += len(lote)
+    return total
+
+
+def _deletar_chaves(session, tabela, chaves):
+    coluna = _chave_primaria(tabela)
+    valores = [coluna.type.python_type(c) for c in chaves]
+    for lote in _em_lotes(valores, TAMANHO_LOTE_CHAVES):
+        session.execute(tabela.delete().where(coluna.in_(lote)))
+    return len(valores)
+
+
+def _restaurar_completo(session, blocos, tamanho_lote, controle=None):
+    # Restaurar os dados seguindo a ordem correta de deleção
+    for tabela in reversed(TABELAS):
+        session.execute(tabela.delete())
+
+    # A base é inserida direto; os blocos dos deltas são aplicados por cima, um de cada vez
+    total = 0
+    for base, tabela, tipo, linhas in blocos:
+        _verificar(controle, f"{total} linhas restauradas")
+        if base:
+            total += _inserir_em_lotes(session, tabela, linhas, tamanho_lote)
+        elif tipo == "deletes":
+            total += _deletar_chaves(session, tabela, linhas)
+        else:
+            coluna = _chave_primaria(tabela).name
+            existentes = {str(l[coluna]) for l in _ler_linhas(session, tabela, [l[coluna] for l in linhas])}
+            total += _inserir_em_lotes(session, tabela, [l for l in linhas if str(l[coluna]) not in existentes], tamanho_lote)
+            total += _atualizar_em_lotes(session, tabela, [l for l in linhas if str(l[coluna]) in existentes], tamanho_lote)
+    return total
+
+
+def _estado_parcial(blocos, chaves_alteradas):
+    # Reconstrói apenas as linhas das chaves alteradas; a memória fica limitada ao tamanho da diferença
+    estado = {tabela.name: {} for tabela in TABELAS}
+    for base, tabela, tipo, linhas in blocos:
+        chaves = chaves_alteradas.get(tabela.name)
+        if not chaves:
+            continue
+        parcial = estado[tabela.name]
+        if tipo == "deletes":
+            for chave in linhas:
+                parcial.pop(chave, None)
+        else:
+            coluna = _chave_primaria(tabela).name
+            for linha in linhas:
+                chave = str(linha[coluna])
+                if chave in chaves:
+                    parcial[chave] = linha
+    return estado
+
+
+def _restaurar_diferenca(session, estado, chaves_alteradas, tamanho_lote):
+    # Descobre quais das chaves alteradas existem hoje no banco
+    existentes = {}
+    for tabela in TABELAS:
+        chaves = chaves_alteradas.get(tabela.name, set())
+        coluna = _chave_primaria(tabela)
+        existentes[tabela.name] = {str(l[coluna.name]) for l in _ler_linhas(session, tabela, chaves)}
+
+    # Inserções dos pais para os filhos, depois atualizações e por fim deleções dos filhos para os pais,
+    # para que nenhuma chave estrangeira aponte para uma linha inexistente no meio do processo
+    total = 0
+    for tabela in TABELAS:
+        linhas = estado[tabela.name]
+        faltando = [linhas[c] for c in chaves_alteradas.get(tabela.name, ()) if c in linhas and c not in existentes[tabela.name]]
+        total += _inserir_em_lotes(session, tabela, faltando, tamanho_lote)
+
+    for tabela in TABELAS:
+        linhas = estado[tabela.name]
+        alteradas = [linhas[c] for c in existentes[tabela.name] if c in linhas]
+        total += _atualizar_em_lotes(session, tabela, alteradas, tamanho_lote)
+
+    for tabela in reversed(TABELAS):
+        sobrando = [c for c in existentes[tabela.name] if c not in estado[tabela.name]]
+        total += _deletar_chaves(session, tabela, sobrando)
+    return total
+
+
+def _descartar_copias_arquivadas(session):
+    # Um checkpoint anterior ao arquivamento devolve linhas às tabelas principais; a cópia que
+    # ficou no arquivo sairia duplicada nas consultas com incluir_arquivo
+    for modelo, arquivado in ARQUIVOS.items():
+        chave = _chave_primaria(modelo.__table__)
+        copia = arquivado.__table__
+        session.execute(copia.delete().where(copia.c[chave.name].in_(select(chave))))
+
+
+def restaurar_checkpoint(session, savepoint_name, tamanho_lote=TAMANHO_LOTE_RESTAURACAO, controle=None):
+    """Restaura o checkpoint e retorna estatísticas (modo, linhas, segundos, linhas por segundo)"""
+    inicio = time.perf_counter()
+    blocos = ler_checkpoint(session, savepoint_name)
+    if blocos is None:
+        return None
+
+    # Se poucas linhas mudaram desde o checkpoint, aplica apenas a diferença
+    checkpoint = _buscar_checkpoint(session, savepoint_name)
+    chaves_alteradas = _chaves_alteradas_desde(session, checkpoint) if checkpoint else None
+    total_alteradas = sum(len(c) for c in chaves_alteradas.values()) if chaves_alteradas is not None else None
+    total_atual = sum(session.execute(select(func.count()).select_from(tabela)).scalar() for tabela in TABELAS)
+
+    if total_alteradas is not None and total_alteradas <= FRACAO_MAXIMA_DIFF * total_atual:
+        modo = "diferenca"
+        estado = _estado_parcial(blocos, chaves_alteradas)
+        linhas = _restaurar_diferenca(session, estado, chaves_alteradas, tamanho_lote)
+    else:
+        modo = "completo"
+        linhas = _restaurar_completo(session, blocos, tamanho_lote, controle)
+
+    # O próximo checkpoint não pode ser um delta sobre o estado anterior ao rollback
+    _verificar(controle, f"{linhas} linhas restauradas")
+    # Restauração feita pelo Core, fora da manutenção incremental do resumo por cidade
+    reconstruir_resumo_cidades(session.connection())
+    _descartar_copias_arquivadas(session)
+    session.query(Alteracao).delete(synchronize_session=False)
+    session.add(Alteracao(tabela=MARCADOR_ROLLBACK, chave=savepoint_name[:100]))
+    # Os outros processos descartam o que guardaram das tabelas restauradas
+    registrar_tabelas_alteradas(session.connection(), [tabela.name for tabela in TABELAS])
+    session.commit()
+    # Qualquer linha pode ter mudado: o cache de leituras e os índices de busca em memória são descartados
+    limpar_cache()
+    descartar_indices()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "modo": modo,
+        "linhas": linhas,
+        "segundos": segundos,
+        "linhas_por_segundo": linhas / segundos if segundos > 0 else 0.0,
+    }
@@ -0,0 +1,288 @@
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from urllib.parse import urlsplit, urlencode, quote
+
+# Cliente do servidor HTTP (servidor.py) com as mesmas funções e assinaturas usadas pela interface
+# no app e no checkpoint. Com SERVIDOR_URL definida a interface usa este módulo no lugar do app e
+# não abre conexão com o banco; o `session` recebido pelas funções é a conexão com o servidor.
+# Os registros voltam como objetos simples com os mesmos atributos (datas em texto AAAA-MM-DD).
+# Uso: SERVIDOR_URL=http://127.0.0.1:8000 python interface.py
+
+SERVIDOR_URL = os.environ.get("SERVIDOR_URL")
+TIMEOUT = float(os.environ.get("SERVIDOR_TIMEOUT", 30))
+TIMEOUT_CHECKPOINT = 3600  # salvar e restaurar checkpoints e arquivar podem levar minutos
+LIMITE_PAGINA = 50  # o mesmo do app
+
+
+def modulo_dados():
+    """Módulo com as funções de acesso a dados: este cliente (com SERVIDOR_URL) ou o app"""
+    if SERVIDOR_URL:
+        return sys.modules[__name__]
+    import app
+    return app
+
+
+def modulo_checkpoints():
+    if SERVIDOR_URL:
+        return sys.modules[__name__]
+    import checkpoint
+    return checkpoint
+
+
+def modulo_busca():
+    if SERVIDOR_URL:
+        return sys.modules[__name__]
+    import busca
+    return busca
+
+
+def modulo_arquivamento():
+    if SERVIDOR_URL:
+        return sys.modules[__name__]
+    import arquivamento
+    return arquivamento
+
+
+class ErroServidor(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+_token = None  # token do login, enviado em todas as requisições seguintes
+_usuarios = {}  # token -> (expira_em, dados do usuário)
+
+
+class ConexaoServidor:
+    def __init__(self, url=None, token=None):
+        partes = urlsplit(url or SERVIDOR_URL)
+        self.host, self.porta = partes.hostname, partes.port or 80
+        self.token = token
+        self._conexao = None
+
+    def requisitar(self, metodo, caminho, corpo=None, parametros=None, timeout=TIMEOUT):
+        if parametros:
+            caminho += "?" + urlencode({chave: valor for chave, valor in parametros.items() if valor is not None})
+        cabecalhos = {"Content-Type": "application/json"}
+        token = self.token or _token
+        if token:
+            cabecalhos["Authorization"] = f"Bearer {token}"
+        dados = json.dumps(corpo).encode("utf-8") if corpo is not None else None
+        # Uma nova tentativa se o servidor fechou a conexão ociosa reaproveitada
+        for tentativa in range(2):
+            if self._conexao is None:
+                self._conexao = http.client.HTTPConnection(self.host, self.porta, timeout=timeout)
+            self._conexao.timeout = timeout
+            try:
+                self._conexao.request(metodo, caminho, body=dados, headers=cabecalhos)
+                resposta = self._conexao.getresponse()
+                conteudo = resposta.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.fechar()
+                if tentativa:
+                    raise
+        # Erros fora do servidor.py (um proxy, por exemplo) podem não vir em JSON
+        json_ = resposta.getheader("Content-Type", "").startswith("application/json")
+        resultado = json.loads(conteudo) if conteudo and json_ else None
+        if resposta.status >= 400:
+            raise ErroServidor(resposta.status, (resultado or {}).get("erro", resposta.reason))
+        return resultado
+
+    def fechar(self):
+        if self._conexao is not None:
+            self._conexao.close()
+            self._conexao = None
+
+
+# Uma conexão por thread, reaproveitada entre as tarefas (como o pool de conexões do app)
+_local = threading.local()
+
+
+@contextmanager
+def session_scope():
+    if getattr(_local, "conexao", None) is None:
+        _local.conexao = ConexaoServidor()
+    yield _local.conexao
+
+
+def _objeto(dados):
+    return SimpleNamespace(**dados) if dados is not None else None
+
+
+def _caminho(recurso, chave):
+    return f"/{recurso}/{quote(str(chave), safe='')}"
+
+
+def _ler(session, recurso, chave):
+    try:
+        return _objeto(session.requisitar("GET", _caminho(recurso, chave)))
+    except ErroServidor as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def _atualizar(session, recurso, chave, valores):
+    valores = {coluna: valor for coluna, valor in valores.items() if valor}
+    if not valores:
+        return 0
+    return session.requisitar("PATCH", _caminho(recurso, chave), valores)["linhas"]
+
+
+def _deletar(session, recurso, chave):
+    return session.requisitar("DELETE", _caminho(recurso, chave))["linhas"]
+
+
+# Funções CRUD - Cliente
+def create_cliente(session, cpf, nome, contato, data_nascimento, sexo):
+    session.requisitar("POST", "/clientes", {"cpf": cpf, "nome": nome, "contato": contato, "data_nascimento": data_nascimento, "sexo": sexo})
+
+def read_cliente(session, cpf):
+    return _ler(session, "clientes", cpf)
+
+def update_cliente(session, cpf, nome=None, contato=None, data_nascimento=None, sexo=None):
+    return _atualizar(session, "clientes", cpf, {"nome": nome, "contato": contato, "data_nascimento": data_nascimento, "sexo": sexo})
+
+def delete_cliente(session, cpf):
+    return _deletar(session, "clientes", cpf)
+
+# Funções CRUD - Apólice
+def create_apolice(session, n_seguro, data_inicio, valor_mensal, cobertura, fk_cpf):
+    session.requisitar("POST", "/apolices", {"n_seguro": n_seguro, "data_inicio": data_inicio, "valor_mensal": valor_mensal, "cobertura": cobertura, "fk_cpf": fk_cpf})
+
+def read_apolice(session, n_seguro):
+    return _ler(session, "apolices", n_seguro)
+
+def update_apolice(session, n_seguro, data_inicio=None, valor_mensal=None, cobertura=None, fk_cpf=None):
+    return _atualizar(session, "apolices", n_seguro, {"data_inicio": data_inicio, "valor_mensal": valor_mensal, "cobertura": cobertura, "fk_cpf": fk_cpf})
+
+def delete_apolice(session, n_seguro):
+    return _deletar(session, "apolices", n_seguro)
+
+# Funções CRUD - Apartamento
+def create_apartamento(session, logradouro, cidade, metragem, fk_seguro, valor_mercado, n_moradores):
+    session.requisitar("POST", "/apartamentos", {"logradouro": logradouro, "cidade": cidade, "metragem": metragem, "fk_seguro": fk_seguro, "valor_mercado": valor_mercado, "n_moradores": n_moradores})
+
+def read_apartamento(session, logradouro):
+    return _ler(session, "apartamentos", logradouro)
+
+def update_apartamento(session, logradouro, cidade=None, metragem=None, fk_seguro=None, valor_mercado=None, n_moradores=None):
+    return _atualizar(session, "apartamentos", logradouro, {"cidade": cidade, "metragem": metragem, "fk_seguro": fk_seguro, "valor_mercado": valor_mercado, "n_moradores": n_moradores})
+
+def delete_apartamento(session, logradouro):
+    return _deletar(session, "apartamentos", logradouro)
+
+# Funções CRUD - Acidente
+def create_acidente(session, id_acidente, data, qtd_acidentes, fk_apartamento, descricao, envolvidos):
+    session.requisitar("POST", "/acidentes", {"id_acidente": id_acidente, "data": data, "qtd_acidentes": qtd_acidentes, "fk_apartamento": fk_apartamento, "descricao": descricao, "envolvidos": envolvidos})
+
+def read_acidente(session, id_acidente):
+    return _ler(session, "acidentes", id_acidente)
+
+def update_acidente(session, id_acidente, data=None, qtd_acidentes=None, fk_apartamento=None, descricao=None, envolvidos=None):
+    return _atualizar(session, "acidentes", id_acidente, {"data": data, "qtd_acidentes": qtd_acidentes, "fk_apartamento": fk_apartamento, "descricao": descricao, "envolvidos": envolvidos})
+
+def delete_acidente(session, id_acidente):
+    return _deletar(session, "acidentes", id_acidente)
+
+
+# Listagens paginadas
+def _listar(session, caminho, limite, cursor, ordenar_por, descendente, filtros):
+    parametros = dict(filtros, limite=limite, cursor=cursor, ordenar_por=ordenar_por, descendente="1" if descendente else None)
+    resultado = session.requisitar("GET", caminho, parametros=parametros)
+    return {"itens": [_objeto(item) for item in resultado["itens"]], "proximo_cursor": resultado["proximo_cursor"]}
+
+def list_clientes(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return _listar(session, "/clientes", limite, cursor, ordenar_por, descendente, filtros)
+
+def list_apolices(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return _listar(session, "/apolices", limite, cursor, ordenar_por, descendente, filtros)
+
+def list_apartamentos(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return _listar(session, "/apartamentos", limite, cursor, ordenar_por, descendente, filtros)
+
+def list_acidentes(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return _listar(session, "/acidentes", limite, cursor, ordenar_por, descendente, filtros)
+
+def list_apolices_com_clientes(session, limite=LIMITE_PAGINA, cursor=None, ordenar_por=None, descendente=False, **filtros):
+    return _listar(session, "/consultas/apolices_com_clientes", limite, cursor, ordenar_por, descendente, filtros)
+
+
+# Controle de acesso
+def iniciar_sessao(session, username, password):
+    global _token
+    try:
+        resposta = session.requisitar("POST", "/login", {"username": username, "password": password})
+    except ErroServidor as e:
+        if e.status == 401:
+            return None
+        raise
+    _token = resposta["token"]
+    _usuarios[_token] = (resposta["expira_em"], {chave: resposta[chave] for chave in ("id", "username", "role")})
+    return _token
+
+def usuario_da_sessao(token):
+    sessao = _usuarios.get(token)
+    if sessao is None or sessao[0] < time.time():
+        return None
+    return dict(sessao[1])
+
+
+# Consultas avançadas
+def iter_contar_apartamentos_por_cidade(session, limite=None, tamanho_lote=None):
+    return iter([tuple(linha) for linha in session.requisitar("GET", "/consultas/apartamentos_por_cidade", parametros={"limite": limite})])
+
+def contar_apartamentos_por_cidade(session):
+    return list(iter_contar_apartamentos_por_cidade(session))
+
+def resumo_por_cidade(session):
+    return session.requisitar("GET", "/consultas/resumo_por_cidade")
+
+def apolices_acima_de_valor(session, valor_minimo, incluir_arquivo=False):
+    parametros = {"valor_minimo": valor_minimo, "incluir_arquivo": "1" if incluir_arquivo else None}
+    return [_objeto(apolice) for apolice in session.requisitar("GET", "/consultas/apolices_acima_de_valor", parametros=parametros)]
+
+# Busca textual (ver busca.py)
+def buscar_clientes(session, texto, limite=LIMITE_PAGINA, cursor=None):
+    return _listar(session, "/busca/clientes", limite, cursor, None, False, {"q": texto})
+
+def buscar_acidentes(session, texto, limite=LIMITE_PAGINA, cursor=None):
+    return _listar(session, "/busca/acidentes", limite, cursor, None, False, {"q": texto})
+
+def dossies(session, cpfs, tamanho_lote=None):
+    return session.requisitar("GET", "/consultas/dossies", parametros={"cpfs": ",".join(cpfs)})
+
+def dossie_cliente(session, cpf):
+    try:
+        return session.requisitar("GET", _caminho("clientes", cpf) + "/dossie")
+    except ErroServidor as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+# Checkpoints (o cancelamento pelo `controle` não chega ao servidor)
+def salvar_checkpoint(session, nome, controle=None):
+    return _objeto(session.requisitar("POST", "/checkpoints", {"nome": nome}, timeout=TIMEOUT_CHECKPOINT))
+
+def restaurar_checkpoint(session, nome, controle=None):
+    try:
+        return session.requisitar("POST", f"/checkpoints/{quote(nome, safe='')}/restaurar", timeout=TIMEOUT_CHECKPOINT)
+    except ErroServidor as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+# Arquivamento (ver arquivamento.py); as datas de corte voltam em texto
+def arquivar(session, acidentes_antes=None, apolices_antes=None, tamanho_lote=None, pausa=0.0, controle=None):
+    corpo = {campo: valor.isoformat() for campo, valor in
+             (("acidentes_antes", acidentes_antes), ("apolices_antes", apolices_antes)) if valor}
+    return session.requisitar("POST", "/arquivamento", corpo, timeout=TIMEOUT_CHECKPOINT)
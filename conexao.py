@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+# Configuração do pool de conexões (pode ser sobrescrita por variáveis de ambiente)
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+# Menor que o wait_timeout do MySQL, para nunca reutilizar uma conexão que o servidor já fechou
+POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") != "0"
+
+_trava = threading.Lock()
+
+
+def _metricas(pool):
+    # As métricas ficam no próprio pool: cada engine conta as suas, e o pool novo criado pelo
+    # dispose() começa do zero
+    metricas = getattr(pool, "_metricas", None)
+    if metricas is None:
+        with _trava:
+            if not hasattr(pool, "_metricas"):
+                pool._metricas = {
+                    "checkouts": 0,
+                    "espera_total": 0.0,
+                    "espera_maxima": 0.0,
+                    "eventos_overflow": 0,
+                    "conexoes_invalidadas": 0,
+                }
+            metricas = pool._metricas
+    return metricas
+
+
+class PoolComMetricas(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _metricas(self)
+
+    # Mede quanto tempo cada checkout esperou por uma conexão livre
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera = time.perf_counter() - inicio
+            metricas = _metricas(self)
+            with _trava:
+                metricas["checkouts"] += 1
+                metricas["espera_total"] += espera
+                metricas["espera_maxima"] = max(metricas["espera_maxima"], espera)
+
+
+def opcoes_pool(url):
+    # O SQLite em memória (usado como substituto do MySQL) não aceita as opções de QueuePool
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") == "sqlite:"):
+        return {}
+    return {
+        "poolclass": PoolComMetricas,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def registrar_metricas_pool(engine):
+    @event.listens_for(engine, "connect")
+    def _ao_conectar(dbapi_connection, connection_record):
+        # Conexão nova além de pool_size: o pool entrou em overflow
+        if isinstance(engine.pool, QueuePool) and engine.pool.overflow() > 0:
+            metricas = _metricas(engine.pool)
+            with _trava:
+                metricas["eventos_overflow"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _ao_invalidar(dbapi_connection, connection_record, exception):
+        metricas = _metricas(engine.pool)
+        with _trava:
+            metricas["conexoes_invalidadas"] += 1
+
+
+def metricas_pool(engine):
+    pool = engine.pool
+    origem = _metricas(pool)
+    with _trava:
+        metricas = dict(origem)
+    if isinstance(pool, QueuePool):
+        metricas.update({
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    metricas["espera_media"] = metricas["espera_total"] / metricas["checkouts"] if metricas["checkouts"] else 0.0
+    return metricas
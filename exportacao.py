@@ -0,0 +1,145 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from sqlalchemy import select
+from app import get_engine, Cliente, Apolice, Apartamento, Acidente
+
+# Exportação das tabelas e das consultas avançadas para CSV, NDJSON ou Parquet.
+# As linhas vêm de um cursor no servidor em blocos e cada bloco é escrito assim que chega,
+# então a memória usada não depende do tamanho do resultado.
+# Uso: python exportacao.py clientes apolices --formato csv --destino exportados --paralelo 2
+#      python exportacao.py apolices_acima_de_valor --valor-minimo 1000 --formato ndjson
+
+TAMANHO_BLOCO_EXPORTACAO = 5000
+FORMATOS = ("csv", "ndjson", "parquet")
+TABELAS = {"clientes": Cliente, "apolices": Apolice, "apartamentos": Apartamento, "acidentes": Acidente}
+ORIGENS = list(TABELAS) + ["apolices_com_clientes", "apolices_acima_de_valor"]
+
+
+def _consulta(origem, valor_minimo=None):
+    if origem in TABELAS:
+        return select(TABELAS[origem].__table__)
+    if origem == "apolices_com_clientes":
+        apolices, clientes = Apolice.__table__, Cliente.__table__
+        return select(*apolices.columns, *clientes.columns).join_from(apolices, clientes, apolices.c.fk_cpf == clientes.c.cpf)
+    if origem == "apolices_acima_de_valor":
+        if valor_minimo is None:
+            raise ValueError("apolices_acima_de_valor precisa de valor_minimo")
+        return select(Apolice.__table__).where(Apolice.valor_mensal > valor_minimo)
+    raise ValueError(f"Origem desconhecida: {origem}")
+
+
+class _EscritorCSV:
+    def __init__(self, caminho, colunas):
+        self.arquivo = open(caminho, "w", newline="", encoding="utf-8")
+        self.escritor = csv.writer(self.arquivo)
+        self.escritor.writerow([coluna.name for coluna in colunas])
+
+    def escrever(self, linhas):
+        self.escritor.writerows(linhas)
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class _EscritorNDJSON:
+    def __init__(self, caminho, colunas):
+        self.arquivo = open(caminho, "w", encoding="utf-8")
+        self.nomes = [coluna.name for coluna in colunas]
+
+    def escrever(self, linhas):
+        self.arquivo.writelines(
+            json.dumps(dict(zip(self.nomes, linha)), default=_serializar, ensure_ascii=False) + "\n" for linha in linhas
+        )
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class _EscritorParquet:
+    def __init__(self, caminho, colunas):
+        import pyarrow as pa  # dependência opcional, só para Parquet
+        import pyarrow.parquet as pq
+        tipos = {str: pa.string(), int: pa.int64(), date: pa.date32()}
+        self.pa = pa
+        self.schema = pa.schema([(coluna.name, tipos[coluna.type.python_type]) for coluna in colunas])
+        self.escritor = pq.ParquetWriter(caminho, self.schema)
+
+    def escrever(self, linhas):
+        # Cada bloco vira um row group do arquivo
+        colunas = list(zip(*linhas))
+        self.escritor.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(valores, type=campo.type) for valores, campo in zip(colunas, self.schema)], schema=self.schema
+        ))
+
+    def fechar(self):
+        self.escritor.close()
+
+
+ESCRITORES = {"csv": _EscritorCSV, "ndjson": _EscritorNDJSON, "parquet": _EscritorParquet}
+
+
+def _serializar(valor):
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def exportar(origem, caminho, formato=None, valor_minimo=None, tamanho_bloco=TAMANHO_BLOCO_EXPORTACAO):
+    """Exporta uma tabela ou consulta para o arquivo e retorna {origem, caminho, linhas, segundos}"""
+    formato = formato or os.path.splitext(caminho)[1].lstrip(".").lower()
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato desconhecido: {formato} (use {', '.join(FORMATOS)})")
+    consulta = _consulta(origem, valor_minimo)
+    inicio = time.perf_counter()
+    linhas = 0
+    # Cada exportação usa a sua própria conexão, o que permite rodar várias em paralelo
+    with get_engine().connect() as connection:
+        resultado = connection.execution_options(stream_results=True, yield_per=tamanho_bloco).execute(consulta)
+        escritor = ESCRITORES[formato](caminho, consulta.selected_columns)
+        try:
+            for bloco in resultado.partitions(tamanho_bloco):
+                escritor.escrever(bloco)
+                linhas += len(bloco)
+        finally:
+            escritor.fechar()
+    return {"origem": origem, "caminho": caminho, "linhas": linhas, "segundos": time.perf_counter() - inicio}
+
+
+def exportar_varios(origens, destino, formato="csv", paralelo=1, valor_minimo=None, tamanho_bloco=TAMANHO_BLOCO_EXPORTACAO):
+    """Exporta cada origem para destino/<origem>.<formato>, com até `paralelo` exportações ao mesmo tempo"""
+    os.makedirs(destino, exist_ok=True)
+    tarefas = [(origem, os.path.join(destino, f"{origem}.{formato}")) for origem in origens]
+    with ThreadPoolExecutor(max_workers=max(1, paralelo)) as executor:
+        return list(executor.map(
+            lambda tarefa: exportar(tarefa[0], tarefa[1], formato, valor_minimo, tamanho_bloco), tarefas
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta tabelas e consultas para CSV, NDJSON ou Parquet")
+    parser.add_argument("origens", nargs="*", metavar="ORIGEM",
+                        help=f"o que exportar ({', '.join(ORIGENS)}); sem nenhuma, exporta as quatro tabelas")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--destino", default="exportados")
+    parser.add_argument("--paralelo", type=int, default=1, help="exportações simultâneas (uma conexão cada)")
+    parser.add_argument("--valor-minimo", type=int, help="para apolices_acima_de_valor")
+    parser.add_argument("--bloco", type=int, default=TAMANHO_BLOCO_EXPORTACAO)
+    args = parser.parse_args()
+    desconhecidas = [origem for origem in args.origens if origem not in ORIGENS]
+    if desconhecidas:
+        parser.error(f"origem desconhecida: {', '.join(desconhecidas)}")
+
+    inicio = time.perf_counter()
+    for r in exportar_varios(args.origens or list(TABELAS), args.destino, args.formato, args.paralelo, args.valor_minimo, args.bloco):
+        vazao = r["linhas"] / r["segundos"] if r["segundos"] > 0 else 0.0
+        print(f"{r['origem']:<24} {r['linhas']:10} linhas {r['segundos']:8.2f} s {vazao:10.0f} linhas/s  {r['caminho']}")
+    print(f"Total: {time.perf_counter() - inicio:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
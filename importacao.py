@@ -0,0 +1,213 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime
+from sqlalchemy import select
+from app import SessionLocal, create_tables, inserir_lote, Cliente, Apolice, Apartamento, Acidente, ProgressoImportacao
+
+# Importação de arquivos CSV ou Parquet para as quatro tabelas.
+# Os arquivos são lidos em streaming e validados em lotes (tipos, chaves duplicadas e chaves
+# estrangeiras, conferidas contra conjuntos de chaves em memória). Cada lote válido é gravado com
+# um INSERT de várias linhas e o progresso do arquivo é salvo na mesma transação; se a importação
+# falhar, a próxima execução continua depois do último lote gravado.
+# Uso: python importacao.py --clientes clientes.csv --apolices apolices.parquet --rejeitados rejeitados.csv
+
+TAMANHO_LOTE_IMPORTACAO = 1000
+
+# Ordem de carga: pais antes dos filhos
+MODELOS = {"clientes": Cliente, "apolices": Apolice, "apartamentos": Apartamento, "acidentes": Acidente}
+CHAVES_ESTRANGEIRAS = {
+    "apolices": ("fk_cpf", "clientes"),
+    "apartamentos": ("fk_seguro", "apolices"),
+    "acidentes": ("fk_apartamento", "apartamentos"),
+}
+
+
+def _ler_csv(caminho, delimitador):
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        yield from csv.DictReader(arquivo, delimiter=delimitador)
+
+
+def _ler_parquet(caminho, tamanho_lote):
+    import pyarrow.parquet as pq  # dependência opcional, só para arquivos Parquet
+    for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_lote):
+        yield from lote.to_pylist()
+
+
+def ler_arquivo(caminho, delimitador=",", tamanho_lote=TAMANHO_LOTE_IMPORTACAO):
+    if caminho.lower().endswith(".parquet"):
+        return _ler_parquet(caminho, tamanho_lote)
+    return _ler_csv(caminho, delimitador)
+
+
+def identificar_arquivo(caminho):
+    # Um arquivo com o mesmo nome mas outro conteúdo (a carga da noite seguinte) começa do zero
+    info = os.stat(caminho)
+    return hashlib.sha256(f"{os.path.abspath(caminho)}|{info.st_size}|{info.st_mtime_ns}".encode()).hexdigest()
+
+
+def _converter(coluna, valor):
+    if valor is None or valor == "":
+        return None
+    tipo = coluna.type.python_type
+    if tipo is str:
+        valor = str(valor)
+        if coluna.type.length and len(valor) > coluna.type.length:
+            raise ValueError(f"{coluna.name}: mais de {coluna.type.length} caracteres")
+        return valor
+    if tipo is int:
+        if isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+            raise ValueError(f"{coluna.name}: número inteiro inválido: {valor!r}")
+        try:
+            return int(valor)
+        except ValueError:
+            raise ValueError(f"{coluna.name}: número inteiro inválido: {valor!r}") from None
+    if tipo is date:
+        if isinstance(valor, datetime):
+            return valor.date()
+        if isinstance(valor, date):
+            return valor
+        try:
+            return date.fromisoformat(str(valor))
+        except ValueError:
+            raise ValueError(f"{coluna.name}: data inválida (esperado AAAA-MM-DD): {valor!r}") from None
+    return valor
+
+
+class Importador:
+    def __init__(self, session, rejeitados, tamanho_lote=TAMANHO_LOTE_IMPORTACAO):
+        self.session = session
+        self.rejeitados = rejeitados  # arquivo de rejeitados, já aberto
+        self._escritor = csv.writer(rejeitados)
+        self.tamanho_lote = tamanho_lote
+        self._chaves = {}  # tabela -> chaves primárias existentes (no banco ou já importadas)
+
+    def chaves(self, tabela):
+        if tabela not in self._chaves:
+            coluna = MODELOS[tabela].__mapper__.primary_key[0]
+            resultado = self.session.connection().execution_options(stream_results=True).execute(select(coluna))
+            self._chaves[tabela] = {chave for chave, in resultado}
+        return self._chaves[tabela]
+
+    def _validar(self, tabela, registro, chaves_do_lote):
+        colunas = MODELOS[tabela].__table__.columns
+        if None in registro:
+            raise ValueError("linha com mais campos que o cabeçalho")
+        desconhecidas = set(registro) - set(colunas.keys())
+        if desconhecidas:
+            raise ValueError(f"colunas desconhecidas: {', '.join(sorted(desconhecidas))}")
+        convertido = {coluna.name: _converter(coluna, registro.get(coluna.name)) for coluna in colunas}
+        chave = convertido[MODELOS[tabela].__mapper__.primary_key[0].name]
+        if chave is None:
+            raise ValueError("chave primária vazia")
+        if chave in self.chaves(tabela) or chave in chaves_do_lote:
+            raise ValueError(f"chave primária duplicada: {chave!r}")
+        if tabela in CHAVES_ESTRANGEIRAS:
+            fk, pai = CHAVES_ESTRANGEIRAS[tabela]
+            if convertido[fk] is not None and convertido[fk] not in self.chaves(pai):
+                raise ValueError(f"{fk} sem registro correspondente em {pai}: {convertido[fk]!r}")
+        return chave, convertido
+
+    def _gravar(self, tabela, arquivo, lote, numero_inicial, progresso):
+        # progresso: {"linhas", "rejeitadas"} do arquivo, incluindo este lote depois da gravação
+        validos, chaves_do_lote, rejeitados = [], set(), []
+        for deslocamento, registro in enumerate(lote):
+            try:
+                chave, convertido = self._validar(tabela, registro, chaves_do_lote)
+            except ValueError as e:
+                rejeitados.append([tabela, numero_inicial + deslocamento, str(e), json.dumps(registro, default=str, ensure_ascii=False)])
+                continue
+            chaves_do_lote.add(chave)
+            validos.append(convertido)
+
+        # Os rejeitados vão para o arquivo antes do commit: numa falha eles podem se repetir, mas não se perder
+        self._escritor.writerows(rejeitados)
+        self.rejeitados.flush()
+        if validos:
+            inserir_lote(self.session, MODELOS[tabela], validos)
+        progresso["linhas"] += len(lote)
+        progresso["rejeitadas"] += len(rejeitados)
+        salvo = self.session.query(ProgressoImportacao).filter_by(arquivo=arquivo).update(progresso, synchronize_session=False)
+        if not salvo:
+            self.session.add(ProgressoImportacao(arquivo=arquivo, tabela=tabela, **progresso))
+        self.session.commit()
+        self.chaves(tabela).update(chaves_do_lote)
+        return len(validos), len(rejeitados)
+
+    def importar(self, tabela, caminho, retomar=True, delimitador=","):
+        arquivo = identificar_arquivo(caminho)
+        salvo = self.session.get(ProgressoImportacao, arquivo) if retomar else None
+        progresso = {"linhas": salvo.linhas, "rejeitadas": salvo.rejeitadas} if salvo else {"linhas": 0, "rejeitadas": 0}
+        ja_gravadas = progresso["linhas"]
+
+        relatorio = {"tabela": tabela, "arquivo": caminho, "retomado_em": ja_gravadas, "lidas": 0, "importadas": 0, "rejeitadas": 0}
+        inicio = time.perf_counter()
+        lote = []
+        numero = ja_gravadas
+        for indice, registro in enumerate(ler_arquivo(caminho, delimitador, self.tamanho_lote)):
+            if indice < ja_gravadas:
+                continue
+            lote.append(registro)
+            if len(lote) >= self.tamanho_lote:
+                importadas, rejeitadas = self._gravar(tabela, arquivo, lote, numero + 1, progresso)
+                relatorio["importadas"] += importadas
+                relatorio["rejeitadas"] += rejeitadas
+                relatorio["lidas"] += len(lote)
+                numero += len(lote)
+                lote = []
+        if lote:
+            importadas, rejeitadas = self._gravar(tabela, arquivo, lote, numero + 1, progresso)
+            relatorio["importadas"] += importadas
+            relatorio["rejeitadas"] += rejeitadas
+            relatorio["lidas"] += len(lote)
+
+        relatorio["segundos"] = time.perf_counter() - inicio
+        relatorio["linhas_por_segundo"] = relatorio["lidas"] / relatorio["segundos"] if relatorio["segundos"] > 0 else 0.0
+        return relatorio
+
+
+def importar(arquivos, rejeitados="rejeitados.csv", tamanho_lote=TAMANHO_LOTE_IMPORTACAO, retomar=True, delimitador=","):
+    """Importa {tabela: caminho} na ordem de dependência e retorna um relatório por tabela"""
+    desconhecidas = set(arquivos) - set(MODELOS)
+    if desconhecidas:
+        raise ValueError(f"Tabelas desconhecidas: {', '.join(sorted(desconhecidas))}")
+    novo = not os.path.exists(rejeitados) or os.path.getsize(rejeitados) == 0
+    session = SessionLocal()
+    try:
+        with open(rejeitados, "a", newline="", encoding="utf-8") as arquivo_rejeitados:
+            if novo:
+                csv.writer(arquivo_rejeitados).writerow(["tabela", "linha", "erro", "registro"])
+            importador = Importador(session, arquivo_rejeitados, tamanho_lote)
+            return [
+                importador.importar(tabela, arquivos[tabela], retomar, delimitador)
+                for tabela in MODELOS if tabela in arquivos
+            ]
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa arquivos CSV ou Parquet para as tabelas do sistema")
+    for tabela in MODELOS:
+        parser.add_argument(f"--{tabela}", metavar="ARQUIVO", help=f"arquivo com os registros de {tabela}")
+    parser.add_argument("--rejeitados", default="rejeitados.csv", help="arquivo CSV com as linhas rejeitadas")
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE_IMPORTACAO)
+    parser.add_argument("--delimitador", default=",")
+    parser.add_argument("--reiniciar", action="store_true", help="ignora o progresso salvo e importa desde o início")
+    args = parser.parse_args()
+
+    arquivos = {tabela: getattr(args, tabela) for tabela in MODELOS if getattr(args, tabela)}
+    if not arquivos:
+        parser.error("informe ao menos um arquivo")
+    create_tables()
+    for r in importar(arquivos, args.rejeitados, args.lote, not args.reiniciar, args.delimitador):
+        retomado = f" (retomado após {r['retomado_em']} linhas)" if r["retomado_em"] else ""
+        print(f"{r['tabela']:<13} {r['lidas']:8} lidas {r['importadas']:8} importadas {r['rejeitadas']:6} rejeitadas "
+              f"{r['segundos']:8.2f} s {r['linhas_por_segundo']:10.0f} linhas/s{retomado}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import sys
+from sqlalchemy import func, text
+from app import get_engine, session_scope, create_indexes, Apolice, Apartamento, Cliente, ResumoCidade, Usuario, Acidente, LIMITE_PAGINA
+
+
+# Consultas avaliadas pelo EXPLAIN: as consultas avançadas, a autenticação e os acessos a acidentes
+# por data. contar_apartamentos_por_cidade lê o resumo por cidade (uma linha por cidade) e conta
+# os apartamentos sem cidade pelo índice de cidade.
+# As consultas por data são as que o app faz: um período curto, a listagem ordenada por data
+# (list_acidentes com ordenar_por="data") e o lote do arquivamento. Um intervalo aberto que
+# devolve boa parte da tabela não ganha com o índice: cada linha custa uma leitura no índice e
+# outra na tabela, e a leitura sequencial da tabela inteira sai mais barata
+def consultas_monitoradas(session):
+    return {
+        "get_apolices_com_clientes": session.query(Apolice.n_seguro, Cliente.nome).join(Cliente, Apolice.fk_cpf == Cliente.cpf),
+        "contar_apartamentos_por_cidade": session.query(ResumoCidade.cidade, ResumoCidade.quantidade).order_by(ResumoCidade.cidade),
+        "contar_apartamentos_sem_cidade": session.query(func.count()).select_from(Apartamento).filter(Apartamento.cidade.is_(None)),
+        "apolices_acima_de_valor": session.query(Apolice).filter(Apolice.valor_mensal > 1000),
+        "autenticar_usuario": session.query(Usuario).filter_by(username="admin"),
+        "acidentes_por_periodo": session.query(Acidente).filter(Acidente.data >= "2020-01-01", Acidente.data < "2020-02-01"),
+        "listar_acidentes_por_data": session.query(Acidente).order_by(Acidente.data, Acidente.id_acidente).limit(LIMITE_PAGINA + 1),
+        "lote_arquivamento_acidentes": session.query(Acidente.id_acidente).filter(Acidente.data < "2015-01-01")
+            .order_by(Acidente.data, Acidente.id_acidente).limit(1000),
+    }
+
+
+def _sql(consulta):
+    return str(consulta.statement.compile(get_engine(), compile_kwargs={"literal_binds": True}))
+
+
+def _explicar_mysql(session, sql):
+    # type = ALL indica leitura da tabela inteira
+    linhas = session.execute(text("EXPLAIN " + sql)).mappings().all()
+    plano = [f"{l['table']}: type={l['type']} key={l['key']} rows={l['rows']}" for l in linhas]
+    varreduras = [l["table"] for l in linhas if l["type"] == "ALL"]
+    return plano, varreduras
+
+
+def _explicar_sqlite(session, sql):
+    # "SCAN tabela" sem índice indica leitura da tabela inteira
+    linhas = session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    plano = [linha[-1] for linha in linhas]
+    varreduras = [d.split()[1] for d in plano if d.startswith("SCAN") and "INDEX" not in d]
+    return plano, varreduras
+
+
+def explicar_consultas():
+    """Executa EXPLAIN em cada consulta monitorada e aponta as que leem tabelas inteiras"""
+    explicar = _explicar_mysql if get_engine().dialect.name == "mysql" else _explicar_sqlite
+    resultado = {}
+    with session_scope() as session:
+        for nome, consulta in consultas_monitoradas(session).items():
+            plano, varreduras = explicar(session, _sql(consulta))
+            resultado[nome] = {"plano": plano, "varreduras_completas": varreduras}
+    return resultado
+
+
+if __name__ == "__main__":
+    if "--criar" in sys.argv:
+        print("Índices criados:", ", ".join(create_indexes()) or "nenhum")
+    for nome, info in explicar_consultas().items():
+        status = "VARREDURA COMPLETA em " + ", ".join(info["varreduras_completas"]) if info["varreduras_completas"] else "ok"
+        print(f"{nome}: {status}")
+        for linha in info["plano"]:
+            print(f"    {linha}")
@@ -0,0 +1,245 @@
+import atexit
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from sqlalchemy import event
+import app
+
+# Medição de tempo das chamadas ao banco, opcional (INSTRUMENTACAO=1 ou ativar()).
+# Liga os eventos before/after_cursor_execute do app.get_engine() e envolve as funções públicas do app
+# e os métodos das janelas da interface. Toda chamada é cronometrada (um perf_counter), mas só uma
+# amostra entra nos histogramas; as chamadas lentas entram sempre no registro de lentidão.
+# As linhas contadas são as alteradas por INSERT, UPDATE e DELETE; os SELECTs não contam linhas.
+
+AMOSTRAGEM = float(os.environ.get("INSTRUMENTACAO_AMOSTRAGEM", 0.1))
+LIMITE_LENTO_MS = float(os.environ.get("INSTRUMENTACAO_LENTA_MS", 200))
+TAMANHO_REGISTRO_LENTAS = int(os.environ.get("INSTRUMENTACAO_REGISTRO", 500))
+TAMANHO_TEXTO = 500  # SQL e parâmetros são truncados no registro de lentidão
+
+# Limites superiores das faixas do histograma, em milissegundos
+FAIXAS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Funções do app que não fazem sentido medir
+IGNORADAS = {"session_scope", "get_engine"}
+
+
+class Histograma:
+    def __init__(self):
+        self.faixas = [0] * (len(FAIXAS_MS) + 1)
+        self.amostras = 0
+        self.soma_ms = 0.0
+        self.maximo_ms = 0.0
+        self.linhas = 0
+
+    def registrar(self, ms, linhas=None):
+        self.faixas[bisect_left(FAIXAS_MS, ms)] += 1
+        self.amostras += 1
+        self.soma_ms += ms
+        self.maximo_ms = max(self.maximo_ms, ms)
+        if linhas is not None and linhas >= 0:
+            self.linhas += linhas
+
+    def percentil(self, p):
+        # Limite superior da faixa onde cai o percentil (o máximo medido na última faixa)
+        alvo = p * self.amostras
+        acumulado = 0
+        for i, quantidade in enumerate(self.faixas):
+            acumulado += quantidade
+            if acumulado >= alvo and quantidade:
+                return min(FAIXAS_MS[i], self.maximo_ms) if i < len(FAIXAS_MS) else self.maximo_ms
+        return self.maximo_ms
+
+    def resumo(self):
+        return {
+            "amostras": self.amostras,
+            "media_ms": self.soma_ms / self.amostras if self.amostras else 0.0,
+            "p50_ms": self.percentil(0.50),
+            "p95_ms": self.percentil(0.95),
+            "p99_ms": self.percentil(0.99),
+            "maximo_ms": self.maximo_ms,
+            "linhas": self.linhas,
+            "faixas": dict(zip([f"<={f}" for f in FAIXAS_MS] + [f">{FAIXAS_MS[-1]}"], self.faixas)),
+        }
+
+
+_trava = threading.Lock()
+_histogramas = {}  # (tipo, nome) -> Histograma; tipo é "sql" ou "funcao"
+_lentas = deque(maxlen=TAMANHO_REGISTRO_LENTAS)
+_substituicoes = []  # (objeto, atributo, original) para desfazer em desativar()
+# O PyQt não guarda referência à função de um método conectado a um sinal: as funções envolvidas
+# precisam continuar vivas depois de desativar(), enquanto houver janelas conectadas a elas
+# (e são reaproveitadas se a instrumentação for ligada de novo)
+_envolvidas = {}  # nome -> função envolvida
+_ativa = False
+_taxa = AMOSTRAGEM
+_limite_ms = LIMITE_LENTO_MS
+
+
+def _texto(valor):
+    texto = valor if isinstance(valor, str) else repr(valor)
+    return texto if len(texto) <= TAMANHO_TEXTO else texto[:TAMANHO_TEXTO] + "..."
+
+
+def _registrar(tipo, nome, ms, linhas=None, detalhes=None):
+    amostrada = random.random() < _taxa
+    lenta = ms >= _limite_ms
+    if not (amostrada or lenta):
+        return
+    with _trava:
+        if amostrada:
+            chave = (tipo, nome)
+            if chave not in _histogramas:
+                _histogramas[chave] = Histograma()
+            _histogramas[chave].registrar(ms, linhas)
+        if lenta:
+            registro = {"quando": datetime.now().isoformat(timespec="seconds"), "tipo": tipo, "nome": _texto(nome), "ms": ms}
+            if linhas is not None and linhas >= 0:
+                registro["linhas"] = linhas
+            registro.update(detalhes or {})
+            _lentas.append(registro)
+
+
+# Eventos do SQLAlchemy
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    context._instrumentacao_inicio = time.perf_counter()
+
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_instrumentacao_inicio", None)
+    if inicio is None:
+        return
+    ms = (time.perf_counter() - inicio) * 1000
+    sql = " ".join(statement.split())
+    detalhes = None
+    if ms >= _limite_ms:
+        detalhes = {"parametros": _texto(parameters[:3] if executemany else parameters)}
+        if executemany:
+            detalhes["execucoes"] = len(parameters)
+    # rowcount só vale para escritas: num SELECT o SQLite devolve -1 e as linhas ainda não foram lidas
+    linhas = cursor.rowcount if cursor.description is None else None
+    _registrar("sql", sql, ms, linhas, detalhes)
+
+
+def _envolver(nome, funcao):
+    if nome in _envolvidas and _envolvidas[nome]._instrumentacao_original is funcao:
+        return _envolvidas[nome]
+    # Slots do Qt recebem argumentos a mais (ex.: `checked` do clicked); são descartados como o
+    # PyQt faria com a função original
+    parametros = inspect.signature(funcao).parameters.values()
+    variavel = any(p.kind == p.VAR_POSITIONAL for p in parametros)
+    posicionais = sum(1 for p in parametros if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+    @functools.wraps(funcao)
+    def envolvida(*args, **kwargs):
+        if not variavel and len(args) > posicionais:
+            args = args[:posicionais]
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            _registrar("funcao", nome, (time.perf_counter() - inicio) * 1000)
+
+    envolvida._instrumentacao_original = funcao
+    _envolvidas[nome] = envolvida
+    return envolvida
+
+
+def _substituir(objeto, atributo, novo):
+    _substituicoes.append((objeto, atributo, getattr(objeto, atributo)))
+    setattr(objeto, atributo, novo)
+
+
+def _instrumentar_app():
+    originais = {}
+    for nome, funcao in list(vars(app).items()):
+        if (inspect.isfunction(funcao) and funcao.__module__ == app.__name__
+                and not nome.startswith("_") and nome not in IGNORADAS):
+            originais[id(funcao)] = (funcao, _envolver(f"app.{nome}", funcao))
+    # Os outros módulos importaram as funções com `from app import ...`: as referências deles também são trocadas
+    for modulo in list(sys.modules.values()):
+        if modulo is None or modulo is sys.modules[__name__]:
+            continue
+        for nome, valor in list(getattr(modulo, "__dict__", {}).items()):
+            if callable(valor) and id(valor) in originais and originais[id(valor)][0] is valor:
+                _substituir(modulo, nome, originais[id(valor)][1])
+
+
+def _instrumentar_interface(modulo):
+    # Métodos das janelas, medidos a partir das janelas criadas depois da ativação
+    for classe in list(vars(modulo).values()):
+        if not inspect.isclass(classe) or classe.__module__ != modulo.__name__:
+            continue
+        for nome, metodo in list(vars(classe).items()):
+            if inspect.isfunction(metodo) and not nome.startswith("__"):
+                _substituir(classe, nome, _envolver(f"interface.{classe.__name__}.{nome}", metodo))
+
+
+def ativar(amostragem=None, limite_lento_ms=None, interface=None):
+    """Liga a instrumentação; `interface` é o módulo da interface cujas janelas serão medidas"""
+    global _ativa, _taxa, _limite_ms
+    with _trava:
+        _taxa = AMOSTRAGEM if amostragem is None else amostragem
+        _limite_ms = LIMITE_LENTO_MS if limite_lento_ms is None else limite_lento_ms
+    if _ativa:
+        return
+    _ativa = True
+    event.listen(app.get_engine(), "before_cursor_execute", _antes_sql)
+    event.listen(app.get_engine(), "after_cursor_execute", _depois_sql)
+    _instrumentar_app()
+    if interface is not None:
+        _instrumentar_interface(interface)
+    arquivo = os.environ.get("INSTRUMENTACAO_ARQUIVO")
+    if arquivo:
+        atexit.register(salvar_relatorio, arquivo)
+
+
+def desativar():
+    global _ativa
+    if not _ativa:
+        return
+    event.remove(app.get_engine(), "before_cursor_execute", _antes_sql)
+    event.remove(app.get_engine(), "after_cursor_execute", _depois_sql)
+    while _substituicoes:
+        objeto, atributo, original = _substituicoes.pop()
+        setattr(objeto, atributo, original)
+    _ativa = False
+
+
+def ativa():
+    return _ativa
+
+
+def limpar():
+    with _trava:
+        _histogramas.clear()
+        _lentas.clear()
+
+
+def relatorio():
+    """Histogramas (mais tempo total primeiro) e registro das chamadas lentas"""
+    with _trava:
+        resumos = [dict(h.resumo(), tipo=tipo, nome=nome) for (tipo, nome), h in _histogramas.items()]
+        lentas = list(_lentas)
+    resumos.sort(key=lambda r: r["media_ms"] * r["amostras"], reverse=True)
+    return {
+        "ativa": _ativa,
+        "amostragem": _taxa,
+        "limite_lento_ms": _limite_ms,
+        "sql": [r for r in resumos if r["tipo"] == "sql"],
+        "funcoes": [r for r in resumos if r["tipo"] == "funcao"],
+        "lentas": lentas,
+    }
+
+
+def salvar_relatorio(caminho):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio(), arquivo, indent=2, ensure_ascii=False, default=str)
+    return caminho
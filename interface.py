@@ -1,124 +1,87 @@
+import importlib
+import os
 import sys
+import threading
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QLineEdit, QMessageBox, QComboBox, QInputDialog
-)
-from sqlalchemy.orm import sessionmaker
-from app import (
-    engine, autenticar_usuario, create_cliente, read_cliente, update_cliente, delete_cliente,
-    create_apolice, read_apolice, update_apolice, delete_apolice,
-    create_apartamento, read_apartamento, update_apartamento, delete_apartamento,
-    create_acidente, read_acidente, update_acidente, delete_acidente,
-    get_apolices_com_clientes, contar_apartamentos_por_cidade, apolices_acima_de_valor
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QLineEdit, QMessageBox, QComboBox,
+    QInputDialog, QTableView, QTableWidget, QTableWidgetItem, QPlainTextEdit, QFileDialog
 )
+from cliente_http import SERVIDOR_URL, modulo_dados, modulo_checkpoints, modulo_busca, modulo_arquivamento
+from workers import executar_em_segundo_plano
+from tabela_paginada import ModeloTabelaPaginada
 
-# Configuração da sessão
-Session = sessionmaker(bind=engine)
-session = Session()
-
-import json
-from sqlalchemy.sql import text
-from datetime import date, datetime
-
-
-def save_checkpoint(session, savepoint_name):
-    try:
-        # Função auxiliar para transformar resultados em dicionários
-        def rows_to_dicts(cursor, rows):
-            columns = [col[0] for col in cursor.description]  # Extrai os nomes das colunas
-            data = []
-            for row in rows:
-                row_dict = {}
-                for col_name, value in zip(columns, row):
-                    # Converte data/datetime para string
-                    if isinstance(value, (date, datetime)):
-                        row_dict[col_name] = value.strftime("%Y-%m-%d")
-                    else:
-                        row_dict[col_name] = value
-                data.append(row_dict)
-            return data
-
-        # Extrair dados das tabelas
-        with engine.connect() as connection:
-            clientes = connection.execute(text("SELECT * FROM clientes"))
-            clientes_data = rows_to_dicts(clientes.cursor, clientes.fetchall())
-
-            apolices = connection.execute(text("SELECT * FROM apolices"))
-            apolices_data = rows_to_dicts(apolices.cursor, apolices.fetchall())
-
-            apartamentos = connection.execute(text("SELECT * FROM apartamentos"))
-            apartamentos_data = rows_to_dicts(apartamentos.cursor, apartamentos.fetchall())
-
-            acidentes = connection.execute(text("SELECT * FROM acidentes"))
-            acidentes_data = rows_to_dicts(acidentes.cursor, acidentes.fetchall())
-
-        # Converter os dados para JSON
-        checkpoint_data = {
-            "clientes": clientes_data,
-            "apolices": apolices_data,
-            "apartamentos": apartamentos_data,
-            "acidentes": acidentes_data
-        }
-
-        # Inserir o checkpoint no banco
-        session.execute(
-            text("INSERT INTO checkpoints (savepoint_name, data_backup) VALUES (:name, :data)"),
-            {"name": savepoint_name, "data": json.dumps(checkpoint_data)}
-        )
-        session.commit()
-        QMessageBox.information(None, "Checkpoint", f"Checkpoint '{savepoint_name}' salvo com sucesso!")
-    except Exception as e:
-        QMessageBox.warning(None, "Erro", f"Erro ao salvar checkpoint: {e}")
-
-def rollback_to_checkpoint(session, savepoint_name):
-    try:
-        # Recuperar o checkpoint
-        result = session.execute(
-            text("SELECT data_backup FROM checkpoints WHERE savepoint_name = :name"),
-            {"name": savepoint_name}
-        ).fetchone()
-
-        if not result:
-            QMessageBox.warning(None, "Erro", f"Checkpoint '{savepoint_name}' não encontrado.")
+# O app, o checkpoint e a instrumentação importam o SQLAlchemy, que é a maior parte do tempo de
+# inicialização: são importados dentro das funções que os usam, e carregados em segundo plano
+# enquanto a janela de login está aberta (ver o __main__). Com SERVIDOR_URL as funções vêm do
+# cliente_http, que fala com o servidor.py, e a interface não acessa o banco
+
+
+def save_checkpoint(parent, savepoint_name):
+    # Grava um checkpoint completo (base) ou apenas as linhas alteradas (delta)
+    salvar_checkpoint = modulo_checkpoints().salvar_checkpoint
+
+    def concluido(tipo):
+        QMessageBox.information(parent, "Checkpoint", f"Checkpoint '{savepoint_name}' ({tipo}) salvo com sucesso!")
+
+    def falhou(e):
+        QMessageBox.warning(parent, "Erro", f"Erro ao salvar checkpoint: {e}")
+
+    executar_em_segundo_plano(
+        parent, "Salvando checkpoint...",
+        lambda session, controle: salvar_checkpoint(session, savepoint_name, controle=controle).tipo,
+        ao_concluir=concluido, ao_falhar=falhou
+    )
+
+def rollback_to_checkpoint(parent, savepoint_name):
+    restaurar_checkpoint = modulo_checkpoints().restaurar_checkpoint
+
+    def concluido(estatisticas):
+        if estatisticas is None:
+            QMessageBox.warning(parent, "Erro", f"Checkpoint '{savepoint_name}' não encontrado.")
             return
 
-        # O dado JSON está no índice 0 da tupla retornada
-        checkpoint_data = json.loads(result[0])
-
-        # Restaurar os dados seguindo a ordem correta de deleção
-        session.execute(text("DELETE FROM acidentes"))
-        session.execute(text("DELETE FROM apartamentos"))
-        session.execute(text("DELETE FROM apolices"))
-        session.execute(text("DELETE FROM clientes"))
-
-        # Inserir os dados de volta
-        for cliente in checkpoint_data["clientes"]:
-            session.execute(
-                text("INSERT INTO clientes (cpf, nome, contato, data_nascimento, sexo) VALUES (:cpf, :nome, :contato, :data_nascimento, :sexo)"),
-                cliente
-            )
-
-        for apolice in checkpoint_data["apolices"]:
-            session.execute(
-                text("INSERT INTO apolices (n_seguro, data_inicio, valor_mensal, cobertura, fk_cpf) VALUES (:n_seguro, :data_inicio, :valor_mensal, :cobertura, :fk_cpf)"),
-                apolice
-            )
-
-        for apartamento in checkpoint_data["apartamentos"]:
-            session.execute(
-                text("INSERT INTO apartamentos (logradouro, cidade, metragem, fk_seguro, valor_mercado, n_moradores) VALUES (:logradouro, :cidade, :metragem, :fk_seguro, :valor_mercado, :n_moradores)"),
-                apartamento
-            )
-
-        for acidente in checkpoint_data["acidentes"]:
-            session.execute(
-                text("INSERT INTO acidentes (id_acidente, data, qtd_acidentes, fk_apartamento, descricao, envolvidos) VALUES (:id_acidente, :data, :qtd_acidentes, :fk_apartamento, :descricao, :envolvidos)"),
-                acidente
-            )
-
-        session.commit()
-        QMessageBox.information(None, "Rollback", f"Rollback realizado para '{savepoint_name}'.")
-    except Exception as e:
-        QMessageBox.warning(None, "Erro", f"Erro ao realizar rollback: {e}")
+        QMessageBox.information(parent, "Rollback",
+                                f"Rollback realizado para '{savepoint_name}'.\n"
+                                f"Modo: {estatisticas['modo']}, {estatisticas['linhas']} linhas "
+                                f"({estatisticas['linhas_por_segundo']:.0f} linhas/s)")
+
+    def falhou(e):
+        QMessageBox.warning(parent, "Erro", f"Erro ao realizar rollback: {e}")
+
+    executar_em_segundo_plano(
+        parent, "Restaurando checkpoint...",
+        lambda session, controle: restaurar_checkpoint(session, savepoint_name, controle=controle),
+        ao_concluir=concluido, ao_falhar=falhou
+    )
+
+def archive_history(parent):
+    # Move acidentes antigos e apólices inativas para as tabelas de arquivo (ver arquivamento.py)
+    arquivar = modulo_arquivamento().arquivar
+
+    def concluido(r):
+        QMessageBox.information(parent, "Arquivamento",
+                                f"{r['acidentes']} acidentes anteriores a {r['acidentes_antes']} e "
+                                f"{r['apolices']} apólices inativas arquivados "
+                                f"({r['linhas_por_segundo']:.0f} linhas/s)")
+
+    def falhou(e):
+        QMessageBox.warning(parent, "Erro", f"Erro ao arquivar: {e}")
+
+    executar_em_segundo_plano(
+        parent, "Arquivando histórico...",
+        lambda session, controle: arquivar(session, controle=controle),
+        ao_concluir=concluido, ao_falhar=falhou
+    )
+
+
+# Quantidade máxima de linhas mostradas numa caixa de mensagem
+LIMITE_EXIBICAO = 200
+
+def aviso_truncado(results):
+    if len(results) > LIMITE_EXIBICAO:
+        return f"\n\n(mostrando apenas as primeiras {LIMITE_EXIBICAO} linhas)"
+    return ""
 
 
 button_style = """
@@ -161,24 +124,40 @@ class LoginWindow(QWidget):
         self.setLayout(layout)
 
     def login(self):
+        iniciar_sessao = modulo_dados().iniciar_sessao
         username = self.username_input.text()
         password = self.password_input.text()
 
         # Autentica o usuário e recupera seu papel
-        user = autenticar_usuario(session, username, password)
+        self.login_button.setEnabled(False)
+        executar_em_segundo_plano(
+            self, "Autenticando...",
+            lambda session, controle: iniciar_sessao(session, username, password),
+            ao_concluir=self.login_concluido, ao_falhar=self.login_falhou, cancelavel=False
+        )
+
+    def login_concluido(self, token):
+        usuario_da_sessao = modulo_dados().usuario_da_sessao
+        self.login_button.setEnabled(True)
+        user = usuario_da_sessao(token) if token else None
         if user:
-            QMessageBox.information(self, "Sucesso", f"Bem-vindo, {user.username}!")
-            self.main_window = MainMenu(user.username, user.role)  # Passa o `role` para o MainMenu
+            QMessageBox.information(self, "Sucesso", f"Bem-vindo, {user['username']}!")
+            self.main_window = MainMenu(user["username"], user["role"], token)  # Passa o `role` para o MainMenu
             self.main_window.show()
             self.close()
         else:
             QMessageBox.warning(self, "Erro", "Usuário ou senha inválidos.")
 
+    def login_falhou(self, e):
+        self.login_button.setEnabled(True)
+        QMessageBox.warning(self, "Erro", f"Erro ao autenticar: {e}")
+
 class MainMenu(QWidget):
-    def __init__(self, username, role):
+    def __init__(self, username, role, token=None):
         super().__init__()
         self.username = username
         self.role = role  # Recebe o papel do usuário
+        self.token = token  # Sessão criada no login
         self.setWindowTitle("Menu Principal")
         self.setGeometry(100, 100, 400, 300)
         self.initUI()
@@ -201,6 +180,11 @@ class MainMenu(QWidget):
             layout.addWidget(self.transaction_button)
             self.transaction_button.setStyleSheet(button_style)
 
+            self.performance_button = QPushButton("Desempenho")
+            self.performance_button.clicked.connect(self.show_performance)
+            layout.addWidget(self.performance_button)
+            self.performance_button.setStyleSheet(button_style)
+
         # Consultas avançadas disponíveis para todos
         self.query_button = QPushButton("Consultas Avançadas")
         self.query_button.clicked.connect(self.show_advanced_queries)
@@ -224,6 +208,11 @@ class MainMenu(QWidget):
         self.transaction_menu.show()
         self.close()
 
+    def show_performance(self):
+        self.performance_window = PerformanceWindow(self)
+        self.performance_window.show()
+        self.close()
+
 class TransactionMenu(QWidget):
     def __init__(self, parent):
         super().__init__()
@@ -252,6 +241,10 @@ class TransactionMenu(QWidget):
         layout.addWidget(self.rollback_button)
         self.rollback_button.setStyleSheet(button_style)
 
+        self.archive_button = QPushButton("Arquivar Histórico")
+        self.archive_button.clicked.connect(lambda: archive_history(self))
+        layout.addWidget(self.archive_button)
+        self.archive_button.setStyleSheet(button_style)
 
         self.back_button = QPushButton("Voltar")
         self.back_button.clicked.connect(self.go_back)
@@ -263,12 +256,12 @@ class TransactionMenu(QWidget):
     def create_savepoint(self):
         savepoint_name = self.savepoint_input.text()
         if savepoint_name:
-            save_checkpoint(session, savepoint_name)
+            save_checkpoint(self, savepoint_name)
 
     def rollback_savepoint(self):
         savepoint_name = self.savepoint_input.text()
         if savepoint_name:
-            rollback_to_checkpoint(session, savepoint_name)
+            rollback_to_checkpoint(self, savepoint_name)
 
 
     def go_back(self):
@@ -352,6 +345,11 @@ class CRUDOperations(QWidget):
         layout.addWidget(self.delete_button)
         self.delete_button.setStyleSheet(button_style)
 
+        self.list_button = QPushButton("Listar")
+        self.list_button.clicked.connect(self.open_table_window)
+        layout.addWidget(self.list_button)
+        self.list_button.setStyleSheet(button_style)
+
         self.back_button = QPushButton("Voltar")
         self.back_button.clicked.connect(self.go_back)
         layout.addWidget(self.back_button)
@@ -364,6 +362,13 @@ class CRUDOperations(QWidget):
         self.crud_window.show()
         self.close()
 
+    def open_table_window(self):
+        nome, colunas = LISTAGENS[self.entity]
+        listar = getattr(modulo_dados(), nome)
+        self.table_window = TableWindow(f"Listagem - {self.entity}", listar, colunas, parent=self)
+        self.table_window.show()
+        self.close()
+
     def go_back(self):
         self.parent.show()
         self.close()
@@ -499,6 +504,45 @@ class CRUDWindow(QWidget):
         self.setLayout(layout)
 
     def execute_operation(self):
+        # Os campos são lidos aqui, na thread da interface; apenas a chamada ao banco vai para segundo plano
+        chamada, resposta = self._preparar_operacao()
+        self.execute_button.setEnabled(False)
+
+        def concluido(resultado):
+            self.execute_button.setEnabled(True)
+            resposta(resultado)
+
+        def falhou(e):
+            self.execute_button.setEnabled(True)
+            QMessageBox.warning(self, "Erro", f"Erro ao executar operação: {e}")
+
+        executar_em_segundo_plano(
+            self, "Executando operação...", lambda session, controle: chamada(session),
+            ao_concluir=concluido, ao_falhar=falhou
+        )
+
+    def _sucesso(self, mensagem):
+        return lambda resultado: QMessageBox.information(self, "Sucesso", mensagem)
+
+    def _sucesso_se_encontrado(self, mensagem, nao_encontrado):
+        def resposta(linhas):
+            if linhas:
+                QMessageBox.information(self, "Sucesso", mensagem)
+            else:
+                QMessageBox.warning(self, "Erro", nao_encontrado)
+        return resposta
+
+    def _exibir_leitura(self, titulo, formatar, nao_encontrado):
+        def resposta(objeto):
+            if objeto:
+                QMessageBox.information(self, titulo, formatar(objeto))
+            else:
+                QMessageBox.warning(self, "Erro", nao_encontrado)
+        return resposta
+
+    def _preparar_operacao(self):
+        api = modulo_dados()
+
         if self.entity == "Cliente":
             cpf = self.cpf_input.text()
 
@@ -507,28 +551,26 @@ class CRUDWindow(QWidget):
                 contato = self.contato_input.text()
                 data_nascimento = self.data_nascimento_input.text()
                 sexo = self.sexo_input.text()
-                create_cliente(session, cpf, nome, contato, data_nascimento, sexo)
-                QMessageBox.information(self, "Sucesso", "Cliente criado com sucesso!")
+                return (lambda session: api.create_cliente(session, cpf, nome, contato, data_nascimento, sexo),
+                        self._sucesso("Cliente criado com sucesso!"))
 
             elif self.operation == "read":
-                cliente = read_cliente(session, cpf)
-                if cliente:
-                    QMessageBox.information(self, "Cliente encontrado",
-                                            f"Nome: {cliente.nome}\nContato: {cliente.contato}\nData Nasc.: {cliente.data_nascimento}\nSexo: {cliente.sexo}")
-                else:
-                    QMessageBox.warning(self, "Erro", "Cliente não encontrado.")
+                return (lambda session: api.read_cliente(session, cpf),
+                        self._exibir_leitura("Cliente encontrado",
+                                             lambda cliente: f"Nome: {cliente.nome}\nContato: {cliente.contato}\nData Nasc.: {cliente.data_nascimento}\nSexo: {cliente.sexo}",
+                                             "Cliente não encontrado."))
 
             elif self.operation == "update":
                 nome = self.nome_input.text() or None
                 contato = self.contato_input.text() or None
                 data_nascimento = self.data_nascimento_input.text() or None
                 sexo = self.sexo_input.text() or None
-                update_cliente(session, cpf, nome, contato, data_nascimento, sexo)
-                QMessageBox.information(self, "Sucesso", "Cliente atualizado com sucesso!")
+                return (lambda session: api.update_cliente(session, cpf, nome, contato, data_nascimento, sexo),
+                        self._sucesso_se_encontrado("Cliente atualizado com sucesso!", "Cliente não encontrado."))
 
             elif self.operation == "delete":
-                delete_cliente(session, cpf)
-                QMessageBox.information(self, "Sucesso", "Cliente deletado com sucesso!")
+                return (lambda session: api.delete_cliente(session, cpf),
+                        self._sucesso_se_encontrado("Cliente deletado com sucesso!", "Cliente não encontrado."))
 
         elif self.entity == "Apólice":
             n_seguro = self.n_seguro_input.text()
@@ -538,28 +580,26 @@ class CRUDWindow(QWidget):
                 valor_mensal = int(self.valor_mensal_input.text())
                 cobertura = self.cobertura_input.text()
                 fk_cpf = self.fk_cpf_input.text()
-                create_apolice(session, n_seguro, data_inicio, valor_mensal, cobertura, fk_cpf)
-                QMessageBox.information(self, "Sucesso", "Apólice criada com sucesso!")
+                return (lambda session: api.create_apolice(session, n_seguro, data_inicio, valor_mensal, cobertura, fk_cpf),
+                        self._sucesso("Apólice criada com sucesso!"))
 
             elif self.operation == "read":
-                apolice = read_apolice(session, n_seguro)
-                if apolice:
-                    QMessageBox.information(self, "Apólice encontrada",
-                                            f"Data Início: {apolice.data_inicio}\nValor Mensal: {apolice.valor_mensal}\nCobertura: {apolice.cobertura}")
-                else:
-                    QMessageBox.warning(self, "Erro", "Apólice não encontrada.")
+                return (lambda session: api.read_apolice(session, n_seguro),
+                        self._exibir_leitura("Apólice encontrada",
+                                             lambda apolice: f"Data Início: {apolice.data_inicio}\nValor Mensal: {apolice.valor_mensal}\nCobertura: {apolice.cobertura}",
+                                             "Apólice não encontrada."))
 
             elif self.operation == "update":
                 data_inicio = self.data_inicio_input.text() or None
                 valor_mensal = int(self.valor_mensal_input.text()) if self.valor_mensal_input.text() else None
                 cobertura = self.cobertura_input.text() or None
                 fk_cpf = self.fk_cpf_input.text() or None
-                update_apolice(session, n_seguro, data_inicio, valor_mensal, cobertura, fk_cpf)
-                QMessageBox.information(self, "Sucesso", "Apólice atualizada com sucesso!")
+                return (lambda session: api.update_apolice(session, n_seguro, data_inicio, valor_mensal, cobertura, fk_cpf),
+                        self._sucesso_se_encontrado("Apólice atualizada com sucesso!", "Apólice não encontrada."))
 
             elif self.operation == "delete":
-                delete_apolice(session, n_seguro)
-                QMessageBox.information(self, "Sucesso", "Apólice deletada com sucesso!")
+                return (lambda session: api.delete_apolice(session, n_seguro),
+                        self._sucesso_se_encontrado("Apólice deletada com sucesso!", "Apólice não encontrada."))
 
         elif self.entity == "Apartamento":
             logradouro = self.logradouro_input.text()
@@ -570,16 +610,14 @@ class CRUDWindow(QWidget):
                 fk_seguro = self.fk_seguro_input.text()
                 valor_mercado = int(self.valor_mercado_input.text())
                 n_moradores = int(self.n_moradores_input.text())
-                create_apartamento(session, logradouro, cidade, metragem, fk_seguro, valor_mercado, n_moradores)
-                QMessageBox.information(self, "Sucesso", "Apartamento criado com sucesso!")
+                return (lambda session: api.create_apartamento(session, logradouro, cidade, metragem, fk_seguro, valor_mercado, n_moradores),
+                        self._sucesso("Apartamento criado com sucesso!"))
 
             elif self.operation == "read":
-                apartamento = read_apartamento(session, logradouro)
-                if apartamento:
-                    QMessageBox.information(self, "Apartamento encontrado",
-                                            f"Cidade: {apartamento.cidade}\nMetragem: {apartamento.metragem}\nValor de Mercado: {apartamento.valor_mercado}\nNúmero de Moradores: {apartamento.n_moradores}")
-                else:
-                    QMessageBox.warning(self, "Erro", "Apartamento não encontrado.")
+                return (lambda session: api.read_apartamento(session, logradouro),
+                        self._exibir_leitura("Apartamento encontrado",
+                                             lambda apartamento: f"Cidade: {apartamento.cidade}\nMetragem: {apartamento.metragem}\nValor de Mercado: {apartamento.valor_mercado}\nNúmero de Moradores: {apartamento.n_moradores}",
+                                             "Apartamento não encontrado."))
 
             elif self.operation == "update":
                 cidade = self.cidade_input.text() or None
@@ -587,12 +625,12 @@ class CRUDWindow(QWidget):
                 fk_seguro = self.fk_seguro_input.text() or None
                 valor_mercado = int(self.valor_mercado_input.text()) if self.valor_mercado_input.text() else None
                 n_moradores = int(self.n_moradores_input.text()) if self.n_moradores_input.text() else None
-                update_apartamento(session, logradouro, cidade, metragem, fk_seguro, valor_mercado, n_moradores)
-                QMessageBox.information(self, "Sucesso", "Apartamento atualizado com sucesso!")
+                return (lambda session: api.update_apartamento(session, logradouro, cidade, metragem, fk_seguro, valor_mercado, n_moradores),
+                        self._sucesso_se_encontrado("Apartamento atualizado com sucesso!", "Apartamento não encontrado."))
 
             elif self.operation == "delete":
-                delete_apartamento(session, logradouro)
-                QMessageBox.information(self, "Sucesso", "Apartamento deletado com sucesso!")
+                return (lambda session: api.delete_apartamento(session, logradouro),
+                        self._sucesso_se_encontrado("Apartamento deletado com sucesso!", "Apartamento não encontrado."))
 
         elif self.entity == "Acidente":
             id_acidente = self.id_acidente_input.text()
@@ -603,16 +641,14 @@ class CRUDWindow(QWidget):
                 fk_apartamento = self.fk_apartamento_input.text()
                 descricao = self.descricao_input.text()
                 envolvidos = int(self.envolvidos_input.text())
-                create_acidente(session, id_acidente, data, qtd_acidentes, fk_apartamento, descricao, envolvidos)
-                QMessageBox.information(self, "Sucesso", "Acidente criado com sucesso!")
+                return (lambda session: api.create_acidente(session, id_acidente, data, qtd_acidentes, fk_apartamento, descricao, envolvidos),
+                        self._sucesso("Acidente criado com sucesso!"))
 
             elif self.operation == "read":
-                acidente = read_acidente(session, id_acidente)
-                if acidente:
-                    QMessageBox.information(self, "Acidente encontrado",
-                                            f"Data: {acidente.data}\nQtd Acidentes: {acidente.qtd_acidentes}\nDescrição: {acidente.descricao}\nEnvolvidos: {acidente.envolvidos}")
-                else:
-                    QMessageBox.warning(self, "Erro", "Acidente não encontrado.")
+                return (lambda session: api.read_acidente(session, id_acidente),
+                        self._exibir_leitura("Acidente encontrado",
+                                             lambda acidente: f"Data: {acidente.data}\nQtd Acidentes: {acidente.qtd_acidentes}\nDescrição: {acidente.descricao}\nEnvolvidos: {acidente.envolvidos}",
+                                             "Acidente não encontrado."))
 
             elif self.operation == "update":
                 data = self.data_input.text() or None
@@ -620,12 +656,72 @@ class CRUDWindow(QWidget):
                 fk_apartamento = self.fk_apartamento_input.text() or None
                 descricao = self.descricao_input.text() or None
                 envolvidos = int(self.envolvidos_input.text()) if self.envolvidos_input.text() else None
-                update_acidente(session, id_acidente, data, qtd_acidentes, fk_apartamento, descricao, envolvidos)
-                QMessageBox.information(self, "Sucesso", "Acidente atualizado com sucesso!")
+                return (lambda session: api.update_acidente(session, id_acidente, data, qtd_acidentes, fk_apartamento, descricao, envolvidos),
+                        self._sucesso_se_encontrado("Acidente atualizado com sucesso!", "Acidente não encontrado."))
 
             elif self.operation == "delete":
-                delete_acidente(session, id_acidente)
-                QMessageBox.information(self, "Sucesso", "Acidente deletado com sucesso!")
+                return (lambda session: api.delete_acidente(session, id_acidente),
+                        self._sucesso_se_encontrado("Acidente deletado com sucesso!", "Acidente não encontrado."))
+
+    def go_back(self):
+        self.parent.show()
+        self.close()
+
+
+# Função de listagem paginada (do app) e colunas exibidas para cada entidade
+LISTAGENS = {
+    "Cliente": ("list_clientes", ["cpf", "nome", "contato", "data_nascimento", "sexo"]),
+    "Apólice": ("list_apolices", ["n_seguro", "data_inicio", "valor_mensal", "cobertura", "fk_cpf"]),
+    "Apartamento": ("list_apartamentos", ["logradouro", "cidade", "metragem", "fk_seguro", "valor_mercado", "n_moradores"]),
+    "Acidente": ("list_acidentes", ["id_acidente", "data", "qtd_acidentes", "fk_apartamento", "descricao", "envolvidos"]),
+}
+
+
+class TableWindow(QWidget):
+    def __init__(self, title, listar, colunas, filtros=None, parent=None):
+        super().__init__()
+        self.parent = parent
+        self.filtros_fixos = dict(filtros or {})
+        self.setWindowTitle(title)
+        self.setGeometry(100, 100, 800, 500)
+        # As linhas são buscadas sob demanda conforme a tabela é rolada
+        self.model = ModeloTabelaPaginada(listar, colunas, filtros=filtros)
+        self.initUI(colunas)
+
+    def initUI(self, colunas):
+        layout = QVBoxLayout()
+
+        # Filtro por prefixo numa coluna, aplicado no banco (LIKE 'texto%')
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Filtrar:"))
+        self.filter_column = QComboBox()
+        self.filter_column.addItems(colunas)
+        filter_layout.addWidget(self.filter_column)
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Começa com...")
+        self.filter_input.returnPressed.connect(self.apply_filter)
+        filter_layout.addWidget(self.filter_input)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        # Sem isto o QTableView começa ordenando a primeira coluna em ordem decrescente
+        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        layout.addWidget(self.table)
+
+        self.back_button = QPushButton("Voltar")
+        self.back_button.clicked.connect(self.go_back)
+        layout.addWidget(self.back_button)
+        self.back_button.setStyleSheet(button_style)
+
+        self.setLayout(layout)
+
+    def apply_filter(self):
+        filtros = dict(self.filtros_fixos)
+        if self.filter_input.text():
+            filtros[f"{self.filter_column.currentText()}__like"] = self.filter_input.text() + "%"
+        self.model.filtrar(**filtros)
 
     def go_back(self):
         self.parent.show()
@@ -664,6 +760,23 @@ class AdvancedQueryWindow(QWidget):
         layout.addWidget(self.query3_button)
         self.query3_button.setStyleSheet(button_style)
 
+        # Botão para ver a carteira completa de um cliente
+        self.query4_button = QPushButton("Dossiê de um Cliente")
+        self.query4_button.clicked.connect(self.query4)
+        layout.addWidget(self.query4_button)
+        self.query4_button.setStyleSheet(button_style)
+
+        # Botões de busca por nome/contato e por descrição do acidente
+        self.search_clients_button = QPushButton("Buscar Clientes por Nome ou Contato")
+        self.search_clients_button.clicked.connect(self.search_clients)
+        layout.addWidget(self.search_clients_button)
+        self.search_clients_button.setStyleSheet(button_style)
+
+        self.search_accidents_button = QPushButton("Buscar Acidentes por Descrição")
+        self.search_accidents_button.clicked.connect(self.search_accidents)
+        layout.addWidget(self.search_accidents_button)
+        self.search_accidents_button.setStyleSheet(button_style)
+
         # Botão para voltar ao menu principal
         self.back_button = QPushButton("Voltar")
         self.back_button.clicked.connect(self.go_back)
@@ -674,32 +787,84 @@ class AdvancedQueryWindow(QWidget):
 
     def query1(self):
         """Consulta para listar apólices e seus clientes associados"""
-        results = get_apolices_com_clientes(session)
-        if results:
-            output = "\n".join([f"Apólice: {a.n_seguro}, Cliente: {c.nome}" for a, c in results])
-            QMessageBox.information(self, "Resultados", output)
-        else:
-            QMessageBox.warning(self, "Resultados", "Nenhuma apólice encontrada.")
+        list_apolices_com_clientes = modulo_dados().list_apolices_com_clientes
+        self.table_window = TableWindow("Apólices e Clientes", list_apolices_com_clientes,
+                                        ["n_seguro", "valor_mensal", "cobertura", "cpf", "nome"], parent=self)
+        self.table_window.show()
+        self.close()
 
     def query2(self):
         """Consulta para contar apartamentos por cidade"""
-        results = contar_apartamentos_por_cidade(session)
-        if results:
-            output = "\n".join([f"Cidade: {cidade}, Total: {total}" for cidade, total in results])
-            QMessageBox.information(self, "Resultados", output)
-        else:
-            QMessageBox.warning(self, "Resultados", "Nenhuma informação encontrada.")
+        iter_contar_apartamentos_por_cidade = modulo_dados().iter_contar_apartamentos_por_cidade
+
+        def exibir(results):
+            if results:
+                output = "\n".join([f"Cidade: {cidade}, Total: {total}" for cidade, total in results[:LIMITE_EXIBICAO]])
+                QMessageBox.information(self, "Resultados", output + aviso_truncado(results))
+            else:
+                QMessageBox.warning(self, "Resultados", "Nenhuma informação encontrada.")
+
+        executar_em_segundo_plano(
+            self, "Consultando...",
+            lambda session, controle: list(iter_contar_apartamentos_por_cidade(session, limite=LIMITE_EXIBICAO + 1)),
+            ao_concluir=exibir
+        )
 
     def query3(self):
         """Consulta para listar apólices acima de um valor específico"""
+        list_apolices = modulo_dados().list_apolices
         valor_minimo, ok = QInputDialog.getInt(self, "Apólices por Valor", "Digite o valor mínimo:")
         if ok:
-            results = apolices_acima_de_valor(session, valor_minimo)
-            if results:
-                output = "\n".join([f"Apólice: {a.n_seguro}, Valor: {a.valor_mensal}" for a in results])
-                QMessageBox.information(self, "Resultados", output)
-            else:
-                QMessageBox.warning(self, "Resultados", "Nenhuma apólice encontrada acima do valor informado.")
+            self.table_window = TableWindow(f"Apólices acima de {valor_minimo}", list_apolices,
+                                            ["n_seguro", "valor_mensal", "data_inicio", "cobertura", "fk_cpf"],
+                                            filtros={"valor_mensal__gt": valor_minimo}, parent=self)
+            self.table_window.show()
+            self.close()
+
+    def query4(self):
+        """Consulta do cliente com as apólices, os apartamentos e os acidentes"""
+        dossie_cliente = modulo_dados().dossie_cliente
+        cpf, ok = QInputDialog.getText(self, "Dossiê do Cliente", "Digite o CPF:")
+        if not ok or not cpf:
+            return
+
+        def exibir(dossie):
+            if dossie is None:
+                QMessageBox.warning(self, "Resultados", "Cliente não encontrado.")
+                return
+            linhas = [f"{dossie['nome']} (CPF {dossie['cpf']}) - {len(dossie['apolices'])} apólice(s)"]
+            for apolice in dossie["apolices"]:
+                linhas.append(f"Apólice {apolice['n_seguro']}: {apolice['cobertura']}, R$ {apolice['valor_mensal']}/mês")
+                for apartamento in apolice["apartamentos"]:
+                    linhas.append(f"    {apartamento['logradouro']} ({apartamento['cidade']}): {len(apartamento['acidentes'])} acidente(s)")
+                    for acidente in apartamento["acidentes"]:
+                        linhas.append(f"        {acidente['data']}: {acidente['descricao']}")
+            QMessageBox.information(self, "Dossiê", "\n".join(linhas[:LIMITE_EXIBICAO]) + aviso_truncado(linhas))
+
+        executar_em_segundo_plano(
+            self, "Consultando...",
+            lambda session, controle: dossie_cliente(session, cpf),
+            ao_concluir=exibir
+        )
+
+    def _search(self, titulo, buscar, colunas):
+        texto, ok = QInputDialog.getText(self, titulo, "Palavras ou início das palavras:")
+        if not ok or not texto.strip():
+            return
+
+        # Resultados em ordem de relevância; a ordenação e o filtro da tabela não se aplicam
+        def listar(session, limite, cursor, ordenar_por=None, descendente=False, **filtros):
+            return buscar(session, texto, limite, cursor)
+
+        self.table_window = TableWindow(f"{titulo}: {texto}", listar, colunas, parent=self)
+        self.table_window.show()
+        self.close()
+
+    def search_clients(self):
+        self._search("Buscar Clientes", modulo_busca().buscar_clientes, ["cpf", "nome", "contato", "data_nascimento"])
+
+    def search_accidents(self):
+        self._search("Buscar Acidentes", modulo_busca().buscar_acidentes, ["id_acidente", "data", "fk_apartamento", "descricao"])
 
     def go_back(self):
         """Voltar para o menu principal"""
@@ -707,8 +872,120 @@ class AdvancedQueryWindow(QWidget):
         self.close()
 
 
+class PerformanceWindow(QWidget):
+    COLUNAS = ["Tipo", "Nome", "Amostras", "Média (ms)", "p95 (ms)", "Máx. (ms)", "Linhas alteradas"]
+
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+        self.setWindowTitle("Desempenho")
+        self.setGeometry(100, 100, 900, 600)
+        self.initUI()
+        self.refresh()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        # Histogramas por consulta SQL e por função, com mais tempo total primeiro
+        self.stats_table = QTableWidget(0, len(self.COLUNAS))
+        self.stats_table.setHorizontalHeaderLabels(self.COLUNAS)
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.stats_table)
+
+        layout.addWidget(QLabel("Chamadas lentas:"))
+        self.slow_log = QPlainTextEdit()
+        self.slow_log.setReadOnly(True)
+        layout.addWidget(self.slow_log)
+
+        buttons_layout = QHBoxLayout()
+        self.toggle_button = QPushButton()
+        self.toggle_button.clicked.connect(self.toggle)
+        self.refresh_button = QPushButton("Atualizar")
+        self.refresh_button.clicked.connect(self.refresh)
+        self.save_button = QPushButton("Salvar Relatório")
+        self.save_button.clicked.connect(self.save_report)
+        self.clear_button = QPushButton("Limpar")
+        self.clear_button.clicked.connect(self.clear)
+        for button in (self.toggle_button, self.refresh_button, self.save_button, self.clear_button):
+            buttons_layout.addWidget(button)
+            button.setStyleSheet(button_style)
+        layout.addLayout(buttons_layout)
+
+        self.back_button = QPushButton("Voltar")
+        self.back_button.clicked.connect(self.go_back)
+        layout.addWidget(self.back_button)
+        self.back_button.setStyleSheet(button_style)
+
+        self.setLayout(layout)
+
+    def refresh(self):
+        import instrumentacao
+        relatorio = instrumentacao.relatorio()
+        if relatorio["ativa"]:
+            self.status_label.setText(f"Instrumentação ativa: amostragem de {relatorio['amostragem']:.0%}, "
+                                      f"chamadas lentas a partir de {relatorio['limite_lento_ms']:g} ms")
+        else:
+            self.status_label.setText("Instrumentação desativada (inicie com INSTRUMENTACAO=1 para medir também as janelas)")
+        self.toggle_button.setText("Desativar" if relatorio["ativa"] else "Ativar")
+
+        linhas = relatorio["sql"] + relatorio["funcoes"]
+        self.stats_table.setRowCount(len(linhas))
+        for i, r in enumerate(linhas):
+            valores = [r["tipo"], r["nome"], r["amostras"], f"{r['media_ms']:.2f}", f"{r['p95_ms']:.2f}",
+                       f"{r['maximo_ms']:.2f}", r["linhas"] if r["tipo"] == "sql" else ""]
+            for j, valor in enumerate(valores):
+                self.stats_table.setItem(i, j, QTableWidgetItem(str(valor)))
+        self.stats_table.resizeColumnsToContents()
+
+        self.slow_log.setPlainText("\n".join(
+            f"{r['quando']}  {r['ms']:9.1f} ms  {r['tipo']}: {r['nome']}"
+            + (f"  parâmetros: {r['parametros']}" if "parametros" in r else "")
+            for r in reversed(relatorio["lentas"])
+        ))
+
+    def toggle(self):
+        import instrumentacao
+        if instrumentacao.ativa():
+            instrumentacao.desativar()
+        else:
+            instrumentacao.ativar()
+        self.refresh()
+
+    def save_report(self):
+        import instrumentacao
+        caminho, _ = QFileDialog.getSaveFileName(self, "Salvar Relatório", "desempenho.json", "JSON (*.json)")
+        if caminho:
+            try:
+                instrumentacao.salvar_relatorio(caminho)
+                QMessageBox.information(self, "Relatório", f"Relatório salvo em {caminho}")
+            except OSError as e:
+                QMessageBox.warning(self, "Erro", f"Erro ao salvar relatório: {e}")
+
+    def clear(self):
+        import instrumentacao
+        instrumentacao.limpar()
+        self.refresh()
+
+    def go_back(self):
+        self.parent.show()
+        self.close()
+
+
 if __name__ == "__main__":
+    # Medição de tempo opcional; precisa vir antes da criação das janelas para medir os métodos delas
+    if os.environ.get("INSTRUMENTACAO") == "1":
+        import instrumentacao
+        instrumentacao.ativar(interface=sys.modules[__name__])
     app = QApplication(sys.argv)
     login = LoginWindow()
     login.show()
+    if "--medir-inicializacao" in sys.argv:
+        # Usado por benchmarks/inicializacao.py: fecha assim que a janela de login aparece
+        QTimer.singleShot(0, app.quit)
+    elif not SERVIDOR_URL:
+        # O app é carregado em segundo plano enquanto o usuário digita a senha
+        threading.Thread(target=importlib.import_module, args=("app",), daemon=True).start()
     sys.exit(app.exec_())
\ No newline at end of file
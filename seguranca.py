@@ -0,0 +1,155 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# Hash de senhas com scrypt e cache de sessões já autenticadas.
+# O custo do scrypt é configurável: N (CPU/memória, potência de 2), r (tamanho do bloco) e p (paralelismo).
+# Usa 128 * r * N bytes de memória por hash (16 MiB com os valores padrão).
+SCRYPT_N = 2 ** int(os.environ.get("SENHA_SCRYPT_LOG_N", 14))
+SCRYPT_R = int(os.environ.get("SENHA_SCRYPT_R", 8))
+SCRYPT_P = int(os.environ.get("SENHA_SCRYPT_P", 1))
+TAMANHO_SAL = 16
+TAMANHO_HASH = 32
+PREFIXO = "scrypt"
+
+# Sessões: válidas por SESSAO_TTL segundos, no máximo SESSAO_MAX ao mesmo tempo
+SESSAO_TTL = float(os.environ.get("SESSAO_TTL", 900))
+SESSAO_MAX = int(os.environ.get("SESSAO_MAX", 10000))
+
+
+def _b64(dados):
+    return base64.b64encode(dados).decode()
+
+
+def _scrypt(senha, sal, n, r, p):
+    return hashlib.scrypt(
+        senha.encode(), salt=sal, n=n, r=r, p=p, dklen=TAMANHO_HASH, maxmem=128 * r * (n + p + 2) + 1024 * 1024
+    )
+
+
+def gerar_hash(senha, n=None, r=None, p=None):
+    """Retorna 'scrypt$N$r$p$sal$hash', com os parâmetros guardados junto para poderem mudar depois"""
+    n, r, p = n or SCRYPT_N, r or SCRYPT_R, p or SCRYPT_P
+    sal = secrets.token_bytes(TAMANHO_SAL)
+    return f"{PREFIXO}${n}${r}${p}${_b64(sal)}${_b64(_scrypt(senha, sal, n, r, p))}"
+
+
+def _parametros(armazenada):
+    # None para texto puro e também para um hash corrompido (número ou base64 inválido)
+    partes = armazenada.split("$")
+    if len(partes) != 6 or partes[0] != PREFIXO:
+        return None
+    try:
+        return (int(partes[1]), int(partes[2]), int(partes[3]),
+                base64.b64decode(partes[4], validate=True), base64.b64decode(partes[5], validate=True))
+    except ValueError:  # inclui binascii.Error
+        return None
+
+
+def verificar_senha(senha, armazenada):
+    parametros = _parametros(armazenada)
+    if parametros is None:
+        # Hash corrompido nunca confere; sem o prefixo é senha antiga, gravada em texto puro
+        if armazenada.startswith(PREFIXO + "$"):
+            return False
+        return hmac.compare_digest(senha.encode(), armazenada.encode())
+    n, r, p, sal, esperado = parametros
+    try:
+        return hmac.compare_digest(_scrypt(senha, sal, n, r, p), esperado)
+    except ValueError:
+        # Parâmetros que o scrypt recusa (N que não é potência de 2, memória acima do limite)
+        return False
+
+
+def precisa_novo_hash(armazenada):
+    # Texto puro ou gerado com outro custo: refeito no próximo login bem-sucedido
+    parametros = _parametros(armazenada)
+    return parametros is None or parametros[:3] != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+# Hash calculado quando o usuário não existe, para o tempo de resposta não revelar quais usuários existem
+_HASH_FICTICIO = None
+
+
+def simular_verificacao(senha):
+    global _HASH_FICTICIO
+    if _HASH_FICTICIO is None or precisa_novo_hash(_HASH_FICTICIO):
+        _HASH_FICTICIO = gerar_hash(secrets.token_hex(8))
+    verificar_senha(senha, _HASH_FICTICIO)
+
+
+# Cache de sessões: depois do login as ações seguintes apresentam o token, sem consultar o banco
+# nem recalcular o hash
+_sessoes = OrderedDict()  # token -> (expira_em, dados do usuário), da mais antiga para a mais nova
+_trava = threading.Lock()
+
+
+def criar_sessao(usuario):
+    token = secrets.token_urlsafe(32)
+    dados = {"id": usuario.id, "username": usuario.username, "role": usuario.role}
+    with _trava:
+        _sessoes[token] = (time.monotonic() + SESSAO_TTL, dados)
+        while len(_sessoes) > SESSAO_MAX:
+            _sessoes.popitem(last=False)
+    return token
+
+
+def obter_sessao(token):
+    """Dados do usuário da sessão, ou None se o token não existe ou expirou"""
+    with _trava:
+        sessao = _sessoes.get(token)
+        if sessao is None:
+            return None
+        if sessao[0] < time.monotonic():
+            del _sessoes[token]
+            return None
+        return dict(sessao[1])
+
+
+def encerrar_sessao(token):
+    with _trava:
+        _sessoes.pop(token, None)
+
+
+def encerrar_sessoes_do_usuario(username):
+    # Usado quando a senha ou o papel do usuário mudam
+    with _trava:
+        for token in [t for t, (_, dados) in _sessoes.items() if dados["username"] == username]:
+            del _sessoes[token]
+
+
+# Tokens assinados (HMAC-SHA256) para o servidor HTTP: os dados do usuário e a validade vão no
+# próprio token, então qualquer processo que conheça o segredo consegue validá-lo sem estado
+# compartilhado. Não podem ser revogados antes de expirar (SESSAO_TTL).
+def _b64url(dados):
+    return base64.urlsafe_b64encode(dados).decode().rstrip("=")
+
+
+def _de_b64url(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def criar_token_assinado(usuario, segredo, ttl=None):
+    dados = {"id": usuario.id, "username": usuario.username, "role": usuario.role,
+             "exp": time.time() + (ttl or SESSAO_TTL)}
+    corpo = _b64url(json.dumps(dados, separators=(",", ":")).encode())
+    return f"{corpo}.{_b64url(hmac.new(segredo, corpo.encode(), hashlib.sha256).digest())}"
+
+
+def verificar_token_assinado(token, segredo):
+    """Dados do usuário do token, ou None se a assinatura não confere ou o token expirou"""
+    corpo, _, assinatura = token.partition(".")
+    esperada = _b64url(hmac.new(segredo, corpo.encode(), hashlib.sha256).digest())
+    if not hmac.compare_digest(assinatura.encode(), esperada.encode()):
+        return None
+    try:
+        dados = json.loads(_de_b64url(corpo))
+    except ValueError:
+        return None
+    return dados if dados.get("exp", 0) >= time.time() else None
@@ -0,0 +1,426 @@
+import argparse
+import json
+import os
+import re
+import secrets
+import signal
+import sys
+import traceback
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl, unquote
+from sqlalchemy.exc import IntegrityError
+import app
+import cache
+import conexao
+from app import session_scope, Cliente, Apolice, Apartamento, Acidente
+from seguranca import criar_token_assinado, verificar_token_assinado
+
+# Servidor HTTP/JSON com as funções CRUD, o login e as consultas avançadas do app, para as
+# interfaces (SERVIDOR_URL, ver cliente_http.py) não abrirem conexões próprias com o banco.
+# Vários processos atendem o mesmo socket, cada um com várias threads e um pool pequeno de
+# conexões: o total de conexões ao banco é processos * (DB_POOL_SIZE + DB_MAX_OVERFLOW),
+# qualquer que seja o número de interfaces abertas. Com mais de um processo, defina CACHE_SERVIDOR
+# e CACHE_CHAVE_AUTENTICACAO (ver cache.py) para os processos compartilharem o cache de leituras; sem
+# eles o cache fica desligado.
+# O login devolve um token assinado (seguranca.criar_token_assinado), aceito por qualquer
+# processo; SERVIDOR_SEGREDO fixa o segredo entre reinícios.
+# Uso: python servidor.py --porta 8000 --processos 4 --pool 2
+#
+# Rotas (corpo e respostas em JSON; datas no formato AAAA-MM-DD):
+#   POST   /login                              {"username", "password"} -> {"token", "username", "role", "expira_em"}
+#   GET    /saude
+#   GET    /<recurso>?limite=&cursor=&ordenar_por=&descendente=&<filtros>   (listagem paginada)
+#   GET    /<recurso>/<chave>
+#   POST   /<recurso>                          (admin)
+#   PATCH  /<recurso>/<chave>                  (admin)
+#   DELETE /<recurso>/<chave>                  (admin)
+#   GET    /consultas/apolices_com_clientes?limite=&cursor=&<filtros>
+#   GET    /consultas/apartamentos_por_cidade?limite=
+#   GET    /consultas/resumo_por_cidade
+#   GET    /consultas/apolices_acima_de_valor?valor_minimo=&incluir_arquivo=
+#   GET    /busca/<clientes|acidentes>?q=&limite=&cursor=   (ordenada por relevância)
+#   GET    /consultas/dossies?cpfs=<cpf>,<cpf>,...   -> {cpf: dossiê}
+#   GET    /clientes/<cpf>/dossie              (cliente com apólices, apartamentos e acidentes)
+#   POST   /checkpoints                        {"nome"} (admin)
+#   POST   /checkpoints/<nome>/restaurar       (admin)
+#   POST   /arquivamento                       {"acidentes_antes", "apolices_antes"} opcionais (admin)
+# <recurso> é clientes, apolices, apartamentos ou acidentes; as demais rotas pedem o cabeçalho
+# Authorization: Bearer <token>.
+
+RECURSOS = {"clientes": (Cliente, "cliente"), "apolices": (Apolice, "apolice"),
+            "apartamentos": (Apartamento, "apartamento"), "acidentes": (Acidente, "acidente")}
+PARAMETROS_LISTAGEM = {"limite", "cursor", "ordenar_por", "descendente"}
+LIMITE_MAXIMO = 1000
+
+# Gerado antes de criar os processos, para todos aceitarem os mesmos tokens
+SEGREDO = os.environ.get("SERVIDOR_SEGREDO", "").encode() or secrets.token_bytes(32)
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _coluna(modelos, campo):
+    for modelo in modelos:
+        if campo in modelo.__table__.columns:
+            return modelo.__table__.columns[campo]
+    raise ErroRequisicao(400, f"Campo desconhecido: {campo}")
+
+
+def _converter(coluna, valor):
+    # Valores da query string (sempre texto) e do corpo JSON para o tipo da coluna
+    if valor is None or valor == "":
+        return None
+    tipo = coluna.type.python_type
+    try:
+        if tipo is date:
+            return valor if isinstance(valor, date) else date.fromisoformat(str(valor))
+        return tipo(valor)
+    except (TypeError, ValueError):
+        raise ErroRequisicao(400, f"{coluna.name}: valor inválido: {valor!r}") from None
+
+
+def _valores(modelo, corpo):
+    if not isinstance(corpo, dict):
+        raise ErroRequisicao(400, "O corpo deve ser um objeto JSON")
+    return {campo: _converter(_coluna((modelo,), campo), valor) for campo, valor in corpo.items()}
+
+
+def _serializar(item):
+    # Objeto do ORM, linha de consulta ou tupla de objetos
+    if hasattr(item, "__mapper__"):
+        return {c.key: getattr(item, c.key) for c in item.__mapper__.column_attrs}
+    if hasattr(item, "_asdict"):
+        return item._asdict()
+    if hasattr(item, "_mapping"):
+        return {chave: _serializar(valor) if hasattr(valor, "__mapper__") else valor for chave, valor in item._mapping.items()}
+    return item
+
+
+def _json_padrao(valor):
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def _pagina(resultado):
+    return {"itens": [_serializar(item) for item in resultado["itens"]], "proximo_cursor": resultado["proximo_cursor"]}
+
+
+def _opcoes_listagem(parametros, modelos):
+    limite = int(parametros.get("limite", app.LIMITE_PAGINA))
+    if not 0 < limite <= LIMITE_MAXIMO:
+        raise ErroRequisicao(400, f"limite deve estar entre 1 e {LIMITE_MAXIMO}")
+    filtros = {
+        nome: _converter(_coluna(modelos, nome.partition("__")[0]), valor)
+        for nome, valor in parametros.items() if nome not in PARAMETROS_LISTAGEM
+    }
+    return {
+        "limite": limite,
+        "cursor": parametros.get("cursor"),
+        "ordenar_por": parametros.get("ordenar_por"),
+        "descendente": parametros.get("descendente", "").lower() in ("1", "true", "sim"),
+        **filtros,
+    }
+
+
+# Rotas: cada uma recebe (session, parametros da query string, corpo, usuário, grupos da URL)
+def _login(session, parametros, corpo, usuario, grupos):
+    corpo = corpo or {}
+    autenticado = app.autenticar_usuario(session, corpo.get("username", ""), corpo.get("password", ""))
+    if autenticado is None:
+        raise ErroRequisicao(401, "Usuário ou senha inválidos")
+    token = criar_token_assinado(autenticado, SEGREDO)
+    dados = verificar_token_assinado(token, SEGREDO)
+    return {"token": token, "id": dados["id"], "username": dados["username"], "role": dados["role"], "expira_em": dados["exp"]}
+
+
+def _saude(session, parametros, corpo, usuario, grupos):
+    return {"ok": True, "processo": os.getpid()}
+
+
+def _listar(session, parametros, corpo, usuario, grupos):
+    modelo, _ = RECURSOS[grupos[0]]
+    return _pagina(app.listar(session, modelo, **_opcoes_listagem(parametros, (modelo,))))
+
+
+def _chave(modelo, texto):
+    return _converter(modelo.__mapper__.primary_key[0], unquote(texto))
+
+
+def _ler(session, parametros, corpo, usuario, grupos):
+    modelo, nome = RECURSOS[grupos[0]]
+    objeto = getattr(app, f"read_{nome}")(session, _chave(modelo, grupos[1]))
+    if objeto is None:
+        raise ErroRequisicao(404, "Registro não encontrado")
+    return _serializar(objeto)
+
+
+def _criar(session, parametros, corpo, usuario, grupos):
+    modelo, nome = RECURSOS[grupos[0]]
+    valores = _valores(modelo, corpo)
+    chave = modelo.__mapper__.primary_key[0].key
+    faltando = [c.key for c in modelo.__mapper__.column_attrs if c.key not in valores]
+    if faltando:
+        raise ErroRequisicao(400, f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+    getattr(app, f"create_{nome}")(session, **valores)
+    return {chave: valores[chave]}
+
+
+def _atualizar(session, parametros, corpo, usuario, grupos):
+    modelo, nome = RECURSOS[grupos[0]]
+    valores = _valores(modelo, corpo)
+    valores.pop(modelo.__mapper__.primary_key[0].key, None)
+    return {"linhas": getattr(app, f"update_{nome}")(session, _chave(modelo, grupos[1]), **valores)}
+
+
+def _deletar(session, parametros, corpo, usuario, grupos):
+    modelo, nome = RECURSOS[grupos[0]]
+    return {"linhas": getattr(app, f"delete_{nome}")(session, _chave(modelo, grupos[1]))}
+
+
+def _apolices_com_clientes(session, parametros, corpo, usuario, grupos):
+    return _pagina(app.list_apolices_com_clientes(session, **_opcoes_listagem(parametros, (Apolice, Cliente))))
+
+
+def _apartamentos_por_cidade(session, parametros, corpo, usuario, grupos):
+    limite = int(parametros["limite"]) if "limite" in parametros else None
+    return [list(linha) for linha in app.iter_contar_apartamentos_por_cidade(session, limite=limite)]
+
+
+def _resumo_por_cidade(session, parametros, corpo, usuario, grupos):
+    return app.resumo_por_cidade(session)
+
+
+def _apolices_acima_de_valor(session, parametros, corpo, usuario, grupos):
+    if "valor_minimo" not in parametros:
+        raise ErroRequisicao(400, "Informe valor_minimo")
+    valor_minimo = _converter(Apolice.__table__.c.valor_mensal, parametros["valor_minimo"])
+    incluir_arquivo = parametros.get("incluir_arquivo", "").lower() in ("1", "true", "sim")
+    return [_serializar(apolice) for apolice in app.apolices_acima_de_valor(session, valor_minimo, incluir_arquivo)]
+
+
+def _buscar(session, parametros, corpo, usuario, grupos):
+    import busca
+    limite = int(parametros.get("limite", app.LIMITE_PAGINA))
+    if not 0 < limite <= LIMITE_MAXIMO:
+        raise ErroRequisicao(400, f"limite deve estar entre 1 e {LIMITE_MAXIMO}")
+    return _pagina(busca.buscar(session, grupos[0], parametros.get("q", ""), limite, parametros.get("cursor")))
+
+
+def _dossies(session, parametros, corpo, usuario, grupos):
+    cpfs = [cpf for cpf in parametros.get("cpfs", "").split(",") if cpf]
+    if not cpfs or len(cpfs) > LIMITE_MAXIMO:
+        raise ErroRequisicao(400, f"Informe de 1 a {LIMITE_MAXIMO} CPFs em cpfs, separados por vírgula")
+    return app.dossies(session, cpfs)
+
+
+def _dossie_cliente(session, parametros, corpo, usuario, grupos):
+    dossie = app.dossie_cliente(session, unquote(grupos[0]))
+    if dossie is None:
+        raise ErroRequisicao(404, "Registro não encontrado")
+    return dossie
+
+
+def _salvar_checkpoint(session, parametros, corpo, usuario, grupos):
+    from checkpoint import salvar_checkpoint
+    nome = (corpo or {}).get("nome")
+    if not nome:
+        raise ErroRequisicao(400, "Informe o nome do checkpoint")
+    return {"nome": nome, "tipo": salvar_checkpoint(session, nome).tipo}
+
+
+def _restaurar_checkpoint(session, parametros, corpo, usuario, grupos):
+    from checkpoint import restaurar_checkpoint
+    estatisticas = restaurar_checkpoint(session, unquote(grupos[0]))
+    if estatisticas is None:
+        raise ErroRequisicao(404, "Checkpoint não encontrado")
+    return estatisticas
+
+
+def _arquivar(session, parametros, corpo, usuario, grupos):
+    from arquivamento import arquivar
+    corpo = corpo or {}
+    datas = {campo: date.fromisoformat(corpo[campo]) for campo in ("acidentes_antes", "apolices_antes") if corpo.get(campo)}
+    return arquivar(session, **datas)
+
+
+_RECURSO = "(" + "|".join(RECURSOS) + ")"
+
+# (método, caminho, função, papel exigido: None = público, "user" = qualquer usuário autenticado)
+ROTAS = [
+    ("POST", r"/login", _login, None),
+    ("GET", r"/saude", _saude, None),
+    ("GET", rf"/{_RECURSO}", _listar, "user"),
+    ("GET", rf"/{_RECURSO}/([^/]+)", _ler, "user"),
+    ("POST", rf"/{_RECURSO}", _criar, "admin"),
+    ("PATCH", rf"/{_RECURSO}/([^/]+)", _atualizar, "admin"),
+    ("DELETE", rf"/{_RECURSO}/([^/]+)", _deletar, "admin"),
+    ("GET", r"/consultas/apolices_com_clientes", _apolices_com_clientes, "user"),
+    ("GET", r"/consultas/apartamentos_por_cidade", _apartamentos_por_cidade, "user"),
+    ("GET", r"/consultas/resumo_por_cidade", _resumo_por_cidade, "user"),
+    ("GET", r"/consultas/apolices_acima_de_valor", _apolices_acima_de_valor, "user"),
+    ("GET", r"/busca/(clientes|acidentes)", _buscar, "user"),
+    ("GET", r"/consultas/dossies", _dossies, "user"),
+    ("GET", r"/clientes/([^/]+)/dossie", _dossie_cliente, "user"),
+    ("POST", r"/checkpoints", _salvar_checkpoint, "admin"),
+    ("POST", r"/checkpoints/([^/]+)/restaurar", _restaurar_checkpoint, "admin"),
+    ("POST", r"/arquivamento", _arquivar, "admin"),
+]
+ROTAS = [(metodo, re.compile(caminho + "$"), funcao, papel) for metodo, caminho, funcao, papel in ROTAS]
+
+
+class Manipulador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # mantém a conexão aberta entre requisições do mesmo cliente
+    # Cabeçalhos e corpo saem em escritas separadas; com o algoritmo de Nagle ligado cada resposta
+    # esperaria o ACK atrasado do cliente (~40 ms)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def do_PATCH(self):
+        self._atender("PATCH")
+
+    def do_DELETE(self):
+        self._atender("DELETE")
+
+    def do_PUT(self):
+        self._atender("PUT")  # sem rotas: responde 405 em JSON
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados, default=_json_padrao, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _usuario(self):
+        autorizacao = self.headers.get("Authorization", "")
+        if not autorizacao.startswith("Bearer "):
+            return None
+        return verificar_token_assinado(autorizacao[len("Bearer "):], SEGREDO)
+
+    def _atender(self, metodo):
+        try:
+            url = urlsplit(self.path)
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            corpo = json.loads(self.rfile.read(tamanho)) if tamanho else None
+            rota, caminho_conhecido = None, False
+            for metodo_rota, caminho, funcao, papel in ROTAS:
+                encontrado = caminho.match(url.path)
+                if encontrado:
+                    caminho_conhecido = True
+                    if metodo_rota == metodo:
+                        rota = (funcao, papel, encontrado.groups())
+                        break
+            if rota is None:
+                raise ErroRequisicao(405, "Método não permitido") if caminho_conhecido else ErroRequisicao(404, "Rota não encontrada")
+            funcao, papel, grupos = rota
+            usuario = self._usuario() if papel else None
+            if papel and usuario is None:
+                raise ErroRequisicao(401, "Token ausente, inválido ou expirado")
+            if papel == "admin" and usuario["role"] != "admin":
+                raise ErroRequisicao(403, "Operação permitida apenas para administradores")
+            with session_scope() as session:
+                resposta = funcao(session, dict(parse_qsl(url.query)), corpo, usuario, grupos)
+            self._responder(200, resposta)
+        except ErroRequisicao as e:
+            self._responder(e.status, {"erro": str(e)})
+        except (ValueError, TypeError) as e:
+            self._responder(400, {"erro": str(e)})
+        except IntegrityError as e:
+            self._responder(409, {"erro": str(e.orig)})
+        except Exception as e:
+            traceback.print_exc()
+            self._responder(500, {"erro": str(e)})
+
+    def log_message(self, formato, *args):
+        if os.environ.get("SERVIDOR_LOG") == "1":
+            super().log_message(formato, *args)
+
+
+class Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def _caches_do_processo_filho():
+    # Cada processo guarda o cache de leituras na própria memória, e as invalidações de uma
+    # escrita só chegam ao processo que a atendeu. Com CACHE_SERVIDOR os filhos usam o cache
+    # compartilhado (cada um com as suas conexões a ele); sem ele as leituras vão sempre ao banco.
+    # Os índices da busca e os resultados das análises continuam em cada processo: eles comparam a
+    # versão dos dados gravada no banco (ver busca.py e analises.py)
+    if cache.CACHE_SERVIDOR:
+        cache.configurar_cache(cache.CacheRemoto(cache.CACHE_SERVIDOR))
+    else:
+        cache.configurar_cache(cache.CacheDesligado())
+
+
+def servir(host="127.0.0.1", porta=8000, processos=1):
+    servidor = Servidor((host, porta), Manipulador)
+    print(f"Servidor em http://{host}:{porta} com {processos} processo(s)", file=sys.stderr)
+    if processos <= 1 or not hasattr(os, "fork"):
+        # Sem fork (Windows) o servidor roda num processo só
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    # Os processos filhos herdam o socket já aberto e aceitam conexões dele; a engine de cada um
+    # é criada no primeiro uso, já dentro do filho
+    filhos = []
+    for _ in range(processos):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            _caches_do_processo_filho()
+            try:
+                servidor.serve_forever()
+            finally:
+                os._exit(0)
+        filhos.append(pid)
+    servidor.socket.close()
+
+    def encerrar(sinal, quadro):
+        for filho in filhos:
+            try:
+                os.kill(filho, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+    for filho in filhos:
+        os.waitpid(filho, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON do sistema")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--pool", type=int, help="conexões fixas no pool de cada processo (DB_POOL_SIZE)")
+    parser.add_argument("--overflow", type=int, help="conexões extras por processo (DB_MAX_OVERFLOW)")
+    args = parser.parse_args()
+
+    if args.pool is not None:
+        conexao.POOL_SIZE = args.pool
+    if args.overflow is not None:
+        conexao.MAX_OVERFLOW = args.overflow
+    print(f"Máximo de conexões ao banco: {args.processos * (conexao.POOL_SIZE + conexao.MAX_OVERFLOW)}", file=sys.stderr)
+    if args.processos > 1 and not cache.CACHE_SERVIDOR:
+        print("Sem CACHE_SERVIDOR o cache de leituras fica desligado nos processos", file=sys.stderr)
+    servir(args.host, args.porta, args.processos)
+
+
+if __name__ == "__main__":
+    main()
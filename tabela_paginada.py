@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QThreadPool
+from workers import Tarefa
+
+# Modelo de tabela que busca as linhas no banco sob demanda, página a página (paginação por chave).
+# Só as páginas visitadas recentemente ficam em memória; das demais guarda-se apenas o cursor
+# de início, e elas são buscadas de novo quando voltam a ficar visíveis.
+
+TEXTO_CARREGANDO = "..."
+
+
+class ModeloTabelaPaginada(QAbstractTableModel):
+    def __init__(self, listar, colunas, titulos=None, filtros=None, tamanho_pagina=200, max_paginas=20, parent=None):
+        # listar(session, limite, cursor, ordenar_por, descendente, **filtros) -> {"itens", "proximo_cursor"}
+        super().__init__(parent)
+        self.listar = listar
+        self.colunas = list(colunas)
+        self.titulos = list(titulos or colunas)
+        self.filtros = dict(filtros or {})
+        self.tamanho_pagina = tamanho_pagina
+        self.max_paginas = max_paginas
+        self.ordenar_por = None
+        self.descendente = False
+        self._tarefas = set()  # referências às buscas em andamento
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._cursores = [None]  # cursor de início de cada página já descoberta
+        self._paginas = OrderedDict()  # páginas em memória, da menos para a mais recente
+        self._linhas = 0
+        self._fim = False
+        self._carregando = set()
+        self._geracao = getattr(self, "_geracao", 0) + 1  # descarta respostas de antes de um sort/filtro
+
+    # Interface do QAbstractTableModel
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._linhas
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.colunas)
+
+    def headerData(self, secao, orientacao, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientacao == Qt.Horizontal:
+            return self.titulos[secao]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        pagina, posicao = divmod(index.row(), self.tamanho_pagina)
+        linhas = self._paginas.get(pagina)
+        if linhas is None:
+            self._carregar(pagina)
+            return TEXTO_CARREGANDO
+        self._paginas.move_to_end(pagina)
+        if posicao >= len(linhas):
+            return None
+        valor = linhas[posicao][index.column()]
+        return "" if valor is None else str(valor)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._fim
+
+    def fetchMore(self, parent=QModelIndex()):
+        self._carregar(len(self._cursores) - 1)
+
+    def sort(self, coluna, ordem=Qt.AscendingOrder):
+        # A ordenação é feita pelo banco
+        self.beginResetModel()
+        self.ordenar_por = self.colunas[coluna]
+        self.descendente = ordem == Qt.DescendingOrder
+        self._reiniciar()
+        self.endResetModel()
+
+    def filtrar(self, **filtros):
+        self.beginResetModel()
+        self.filtros = filtros
+        self._reiniciar()
+        self.endResetModel()
+
+    # Busca em segundo plano
+    def _carregar(self, pagina):
+        if pagina in self._carregando or pagina >= len(self._cursores):
+            return
+        self._carregando.add(pagina)
+        geracao = self._geracao
+        cursor = self._cursores[pagina]
+        ordenar_por, descendente, filtros = self.ordenar_por, self.descendente, dict(self.filtros)
+
+        def buscar(session, controle):
+            resultado = self.listar(session, self.tamanho_pagina, cursor, ordenar_por, descendente, **filtros)
+            return [self._valores(item) for item in resultado["itens"]], resultado["proximo_cursor"]
+
+        tarefa = Tarefa(buscar)
+        tarefa.sinais.concluido.connect(lambda resultado: self._pagina_carregada(geracao, pagina, resultado))
+        tarefa.sinais.falhou.connect(lambda erro: self._carregando.discard(pagina))
+        self._tarefas.add(tarefa)
+        tarefa.sinais.concluido.connect(lambda _: self._tarefas.discard(tarefa))
+        tarefa.sinais.falhou.connect(lambda _: self._tarefas.discard(tarefa))
+        QThreadPool.globalInstance().start(tarefa)
+
+    def _pagina_carregada(self, geracao, pagina, resultado):
+        if geracao != self._geracao:
+            return
+        self._carregando.discard(pagina)
+        linhas, proximo_cursor = resultado
+        self._paginas[pagina] = linhas
+        while len(self._paginas) > self.max_paginas:
+            self._paginas.popitem(last=False)
+
+        if pagina == len(self._cursores) - 1 and not self._fim:
+            # Página nova no fim da tabela
+            if linhas:
+                self.beginInsertRows(QModelIndex(), self._linhas, self._linhas + len(linhas) - 1)
+                self._linhas += len(linhas)
+                self.endInsertRows()
+            if proximo_cursor:
+                self._cursores.append(proximo_cursor)
+            else:
+                self._fim = True
+        else:
+            # Página que tinha saído da memória e foi buscada de novo
+            inicio = pagina * self.tamanho_pagina
+            self.dataChanged.emit(self.index(inicio, 0), self.index(inicio + len(linhas) - 1, len(self.colunas) - 1))
+
+    def _valores(self, item):
+        # Guarda só os valores, sem manter objetos do ORM presos à página
+        return tuple(getattr(item, coluna) for coluna in self.colunas)
+
@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Os testes rodam num SQLite temporário (DATABASE_URL precisa estar definido antes do import do app)
+# e cada teste começa com as tabelas vazias.
+# Uso: python -m pytest -q tests
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='crud-testes-'), 'testes.db')}"
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import busca  # noqa: E402
+from cache import limpar_cache  # noqa: E402
+
+
+@pytest.fixture
+def banco():
+    engine = app.get_engine()
+    app.Base.metadata.drop_all(engine)
+    app.create_tables()
+    limpar_cache()
+    busca.descartar_indices()
+    yield app
+    engine.dispose()
+
+
+@pytest.fixture
+def session(banco):
+    session = banco.SessionLocal()
+    yield session
+    session.close()
+
@@ -0,0 +1,55 @@
+import time
+from datetime import date
+import pytest
+import analises
+from cache import CacheLRU
+
+
+@pytest.fixture
+def resultados(banco, monkeypatch):
+    cache = CacheLRU(2, 0.2)
+    monkeypatch.setattr(analises, "_resultados", cache)
+    return cache
+
+
+def _popular(app, session):
+    app.create_cliente(session, "C1", "Ana", "-", date(1990, 1, 1), "F")
+    app.create_apolice(session, "S1", date(2020, 1, 1), 300, "Básica", "C1")
+    app.create_apartamento(session, "Rua 1", "Curitiba", 50, "S1", 1000, 2)
+    app.create_apartamento(session, "Rua 2", "Curitiba", 70, "S1", 1000, 2)
+    app.create_acidente(session, 1, date(2021, 1, 1), 3, "Rua 1", "Vazamento", 1)
+
+
+def test_premio_de_cada_apolice_conta_uma_vez(banco, resultados, session):
+    _popular(banco, session)
+    curitiba, = analises.sinistralidade_por_cidade(session)
+    assert (curitiba["apartamentos"], curitiba["premio_mensal"], curitiba["acidentes"]) == (2, 300.0, 3.0)
+
+
+def test_resultado_reaproveitado_ate_a_proxima_escrita(banco, resultados, session):
+    _popular(banco, session)
+    primeiro = analises.sinistralidade_por_cidade(session)
+    assert analises.sinistralidade_por_cidade(session) is primeiro
+
+    # Escrita de outro processo: só a versão dos dados no banco muda
+    with banco.get_engine().begin() as conexao:
+        conexao.execute(banco.Acidente.__table__.update().values(qtd_acidentes=5))
+        conexao.execute(banco.VersaoTabela.__table__.update().where(banco.VersaoTabela.tabela == "acidentes")
+                        .values(versao=banco.VersaoTabela.versao + 1))
+    session.commit()
+    assert analises.sinistralidade_por_cidade(session)[0]["acidentes"] == 5.0
+
+
+def test_cache_limitado_e_com_tempo_de_vida(banco, resultados, session):
+    _popular(banco, session)
+    primeiro = analises.premios_por_cobertura(session)
+    analises.clientes_por_faixa_etaria(session, date(2024, 1, 1))
+    analises.clientes_por_faixa_etaria(session, date(2025, 1, 1))
+    assert resultados.estatisticas()["itens"] == 2
+    # O mais antigo saiu do cache
+    assert analises.premios_por_cobertura(session) is not primeiro
+
+    segundo = analises.premios_por_cobertura(session)
+    time.sleep(0.25)
+    assert analises.premios_por_cobertura(session) is not segundo
+    assert resultados.estatisticas()["expirados"] == 1
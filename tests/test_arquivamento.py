@@ -0,0 +1,53 @@
+from datetime import date
+import pytest
+import arquivamento
+
+
+@pytest.fixture
+def arquivados(banco, session):
+    banco.create_cliente(session, "C1", "Ana", "-", None, "F")
+    banco.create_apolice(session, "S1", date(2020, 1, 1), 100, "Básica", "C1")
+    banco.create_apolice(session, "S2", date(2001, 1, 1), 200, "Básica", "C1")
+    banco.create_apartamento(session, "Rua 1", "Curitiba", 50, "S1", 1000, 2)
+    for i in range(1, 4):
+        banco.create_acidente(session, i, date(2010, 1, i), 1, "Rua 1", "Vazamento", 1)
+    banco.create_acidente(session, 4, date(2023, 1, 1), 1, "Rua 1", "Incêndio", 1)
+    r = arquivamento.arquivar(session, acidentes_antes=date(2015, 1, 1), apolices_antes=date(2010, 1, 1))
+    assert (r["acidentes"], r["apolices"]) == (3, 1)
+    return banco
+
+
+def test_atualizar_linha_arquivada_devolve_a_tabela_principal(arquivados, session):
+    app = arquivados
+    assert isinstance(app.read_acidente(session, 1), app.AcidenteArquivado)
+    assert app.update_acidente(session, 1, descricao="Revisado") == 1
+    session.expire_all()
+    acidente = app.read_acidente(session, 1)
+    assert isinstance(acidente, app.Acidente)
+    assert (acidente.descricao, acidente.data) == ("Revisado", date(2010, 1, 1))
+    assert session.get(app.AcidenteArquivado, 1) is None
+
+    assert app.update_apolice(session, "S2", valor_mensal=250) == 1
+    assert session.get(app.Apolice, "S2").valor_mensal == 250
+    assert app.update_acidente(session, 99, descricao="Não existe") == 0
+
+
+def test_deletar_linha_arquivada(arquivados, session):
+    app = arquivados
+    assert app.delete_acidente(session, 2) == 1
+    assert app.delete_apolice(session, "S2") == 1
+    assert app.read_acidente(session, 2) is None
+    assert app.read_apolice(session, "S2") is None
+
+
+def test_desarquivar_informa_chaves_recriadas(arquivados, session):
+    app = arquivados
+    # O id 1 foi usado de novo na tabela principal depois do arquivamento
+    app.create_acidente(session, 1, date(2024, 5, 1), 2, "Rua 1", "Novo", 1)
+    r = arquivamento.desarquivar_acidentes(session, [1, 2, 99])
+    assert r == {"desarquivadas": 1, "conflitos": [1]}
+    session.expire_all()
+    assert session.get(app.Acidente, 1).descricao == "Novo"
+    assert session.get(app.AcidenteArquivado, 1) is not None
+    assert session.get(app.Acidente, 2) is not None
+    assert session.get(app.AcidenteArquivado, 2) is None
@@ -0,0 +1,61 @@
+from datetime import date
+import pytest
+
+
+@pytest.fixture(params=["sqlite", "generico"])
+def app(request, banco, monkeypatch):
+    # "generico": bancos sem upsert próprio (SELECT ... FOR UPDATE, UPDATE e INSERT)
+    if request.param == "generico":
+        monkeypatch.setattr(banco.get_engine().dialect, "name", "generico")
+    return banco
+
+
+@pytest.fixture
+def apolice(app, session):
+    app.create_cliente(session, "C1", "Ana", "-", date(1990, 1, 1), "F")
+    app.create_apolice(session, "S1", date(2020, 1, 1), 100, "Básica", "C1")
+    app.create_apartamentos_bulk(session, [
+        {"logradouro": "Rua 1", "cidade": "Curitiba", "metragem": 50, "fk_seguro": "S1"},
+        {"logradouro": "Rua 2", "cidade": "Curitiba", "metragem": 70, "fk_seguro": "S1"},
+    ])
+    return "S1"
+
+
+def _cidades(app, session):
+    session.expire_all()
+    return {a.logradouro: a.cidade for a in session.query(app.Apartamento)}
+
+
+def test_upsert_atualiza_existentes_e_insere_novas(app, session, apolice):
+    relatorio = app.upsert_apartamentos_bulk(session, [
+        {"logradouro": "Rua 1", "cidade": "Londrina", "metragem": 40, "fk_seguro": apolice},
+        {"logradouro": "Rua 3", "cidade": "Maringá", "metragem": 60, "fk_seguro": apolice},
+    ])
+    assert relatorio == {"sucesso": 2, "erros": []}
+    assert _cidades(app, session) == {"Rua 1": "Londrina", "Rua 2": "Curitiba", "Rua 3": "Maringá"}
+    assert app.verificar_resumo_cidades(session) == []
+
+
+def test_lote_com_erro_refeito_linha_a_linha(app, session, apolice):
+    registros = [
+        {"logradouro": "Rua 2", "cidade": "Londrina", "fk_seguro": apolice},
+        {"logradouro": "Rua 4", "cidade": "Maringá", "andar": 3},
+        {"logradouro": "Rua 5", "cidade": "Maringá", "fk_seguro": apolice},
+    ]
+    relatorio = app.upsert_apartamentos_bulk(session, registros, tamanho_lote=3)
+
+    assert relatorio["sucesso"] == 2
+    assert [(e["indice"], e["registro"]["logradouro"]) for e in relatorio["erros"]] == [(1, "Rua 4")]
+    assert "andar" in relatorio["erros"][0]["erro"]
+    assert _cidades(app, session) == {"Rua 1": "Curitiba", "Rua 2": "Londrina", "Rua 5": "Maringá"}
+    assert app.verificar_resumo_cidades(session) == []
+
+
+def test_create_bulk_rejeita_chave_duplicada(app, session, apolice):
+    relatorio = app.create_apartamentos_bulk(session, [
+        {"logradouro": "Rua 6", "cidade": "Curitiba", "fk_seguro": apolice},
+        {"logradouro": "Rua 1", "cidade": "Londrina", "fk_seguro": apolice},
+    ])
+    assert relatorio["sucesso"] == 1
+    assert [e["indice"] for e in relatorio["erros"]] == [1]
+    assert _cidades(app, session)["Rua 1"] == "Curitiba"
@@ -0,0 +1,66 @@
+import pytest
+import busca
+import cache
+import servidor
+
+
+@pytest.fixture
+def montagens(banco, monkeypatch):
+    contagem = []
+    original = busca.IndiceInvertido.carregar
+
+    def carregar(indice, linhas):
+        contagem.append(1)
+        return original(indice, linhas)
+
+    monkeypatch.setattr(busca, "BUSCA_BACKEND", "memoria")
+    monkeypatch.setattr(busca, "_backend", None)
+    monkeypatch.setattr(busca.IndiceInvertido, "carregar", carregar)
+    return contagem
+
+
+def _nomes(session, texto):
+    return [c.nome for c in busca.buscar_clientes(session, texto)["itens"]]
+
+
+def test_buscas_sem_escrita_montam_o_indice_uma_vez(montagens, session, monkeypatch):
+    # Como num processo filho do servidor, sem cache compartilhado
+    monkeypatch.setattr(cache, "_backend", cache._backend)
+    servidor._caches_do_processo_filho()
+    busca.app.create_cliente(session, "C1", "Maria da Silva", "-", None, "F")
+    assert _nomes(session, "mar sil") == ["Maria da Silva"]
+    assert _nomes(session, "maria") == ["Maria da Silva"]
+    assert len(montagens) == 1
+
+
+def test_escritas_do_proprio_processo_atualizam_sem_remontar(montagens, session):
+    busca.app.create_cliente(session, "C1", "Maria da Silva", "-", None, "F")
+    _nomes(session, "maria")
+    busca.app.create_cliente(session, "C2", "Mariana Souza", "-", None, "F")
+    busca.app.update_cliente(session, "C1", nome="Joana da Silva")
+    assert _nomes(session, "mari") == ["Mariana Souza"]
+    assert len(montagens) == 1
+
+
+def test_escrita_de_outro_processo_remonta_o_indice(montagens, session):
+    app = busca.app
+    app.create_cliente(session, "C1", "Maria da Silva", "-", None, "F")
+    _nomes(session, "maria")
+    # Outro processo: grava e incrementa a versão sem passar pelos avisos de commit deste
+    with app.get_engine().begin() as conexao:
+        conexao.execute(app.Cliente.__table__.update().values(nome="Joana da Silva"))
+        conexao.execute(app.VersaoTabela.__table__.update().where(app.VersaoTabela.tabela == "clientes")
+                        .values(versao=app.VersaoTabela.versao + 1))
+    assert _nomes(session, "joana") == ["Joana da Silva"]
+    assert _nomes(session, "joana") == ["Joana da Silva"]
+    assert len(montagens) == 2
+
+
+def test_cada_commit_incrementa_a_versao_uma_vez(banco, session):
+    with banco.get_engine().connect() as conexao:
+        antes = banco.versao_dados(conexao, "clientes")
+    banco.create_clientes_bulk(session, [{"cpf": f"C{i}", "nome": "Ana", "contato": "-", "sexo": "F"} for i in range(5)])
+    banco.create_cliente(session, "C9", "Bia", "-", None, "F")
+    with banco.get_engine().connect() as conexao:
+        assert banco.versao_dados(conexao, "clientes") == antes + 2
+        assert banco.versao_dados(conexao, "acidentes") == 0
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import pytest
+import cache
+
+
+class _Servidor(cache._GerenciadorCache):
+    # Classe própria: o CacheRemoto registra "cache" sem callable no gerenciador do cliente
+    pass
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_CHAVE_AUTENTICACAO", b"chave-de-teste")
+    local = cache.CacheLRU(100, 0)
+    _Servidor.register("cache", callable=lambda: local)
+    servidor = _Servidor(address=("127.0.0.1", 0), authkey=cache.CACHE_CHAVE_AUTENTICACAO).get_server()
+
+    def servir():
+        # serve_forever termina com sys.exit quando o stop_event é marcado
+        try:
+            servidor.serve_forever()
+        except SystemExit:
+            pass
+    threading.Thread(target=servir, daemon=True).start()
+    yield local, cache.CacheRemoto(f"127.0.0.1:{servidor.address[1]}")
+    servidor.stop_event.set()
+
+
+def test_remoto_fora_do_event_loop(servidor):
+    local, remoto = servidor
+    assert remoto.gravar("clientes:1", {"nome": "Ana"}, remoto.versao())
+    assert remoto.obter("clientes:1") == {"nome": "Ana"}
+    remoto.remover(["clientes:1"])
+    assert local.obter("clientes:1") is None
+
+
+def test_remoto_nao_bloqueia_o_event_loop(servidor):
+    local, remoto = servidor
+    local.gravar("clientes:1", {"nome": "Ana"})
+    local.gravar("clientes:2", {"nome": "Bia"})
+    antes = local.estatisticas()
+
+    async def no_loop():
+        # Leituras e gravações não vão ao servidor; a invalidação vai para a thread do cache
+        assert remoto.obter("clientes:1") is None
+        assert not remoto.gravar("clientes:3", {"nome": "Caio"})
+        remoto.remover(["clientes:1"])
+    asyncio.run(no_loop())
+    remoto._fila.submit(lambda: None).result()
+
+    depois = local.estatisticas()
+    assert (depois["acertos"], depois["faltas"]) == (antes["acertos"], antes["faltas"])
+    assert local.obter("clientes:1") is None
+    assert local.obter("clientes:2") == {"nome": "Bia"}
+    assert local.obter("clientes:3") is None
+
+
+def test_remoto_exige_chave_de_autenticacao(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_CHAVE_AUTENTICACAO", b"")
+    with pytest.raises(ValueError, match="CACHE_CHAVE_AUTENTICACAO"):
+        cache.CacheRemoto("127.0.0.1:50000")
@@ -0,0 +1,58 @@
+from datetime import date
+import checkpoint
+
+
+def _clientes(app, session):
+    return {c.cpf: (c.nome, c.contato) for c in session.query(app.Cliente)}
+
+
+def test_restauracao_pela_diferenca(banco, session):
+    banco.create_clientes_bulk(session, [
+        {"cpf": f"C{i:03d}", "nome": f"Cliente {i}", "contato": "-", "sexo": "F"} for i in range(30)
+    ])
+    banco.create_apolice(session, "S1", date(2020, 1, 1), 100, "Básica", "C001")
+    banco.create_apartamento(session, "Rua 1", "Curitiba", 50, "S1", 1000, 2)
+    checkpoint.salvar_checkpoint(session, "antes")
+    esperado = _clientes(banco, session)
+    resumo = [(r.cidade, r.quantidade) for r in session.query(banco.ResumoCidade)]
+
+    banco.update_cliente(session, "C002", nome="Alterado")
+    banco.delete_cliente(session, "C003")
+    banco.create_cliente(session, "C999", "Novo", "-", None, "M")
+    banco.update_apartamento(session, "Rua 1", cidade="Londrina")
+
+    r = checkpoint.restaurar_checkpoint(session, "antes")
+    session.expire_all()
+    assert r["modo"] == "diferenca"
+    # Só as linhas alteradas são reescritas
+    assert r["linhas"] <= 5
+    assert _clientes(banco, session) == esperado
+    assert banco.read_apartamento(session, "Rua 1").cidade == "Curitiba"
+    assert [(r.cidade, r.quantidade) for r in session.query(banco.ResumoCidade)] == resumo
+
+
+def test_restauracao_completa_quando_muita_coisa_mudou(banco, session):
+    banco.create_clientes_bulk(session, [
+        {"cpf": f"C{i:03d}", "nome": f"Cliente {i}", "contato": "-", "sexo": "F"} for i in range(10)
+    ])
+    checkpoint.salvar_checkpoint(session, "antes")
+    esperado = _clientes(banco, session)
+    banco.delete_clientes_bulk(session, [f"C{i:03d}" for i in range(5)])
+
+    r = checkpoint.restaurar_checkpoint(session, "antes")
+    session.expire_all()
+    assert r["modo"] == "completo"
+    assert _clientes(banco, session) == esperado
+
+
+def test_checkpoint_delta_sobre_a_base(banco, session):
+    banco.create_cliente(session, "C1", "Ana", "-", None, "F")
+    base = checkpoint.salvar_checkpoint(session, "base")
+    banco.create_cliente(session, "C2", "Bia", "-", None, "F")
+    delta = checkpoint.salvar_checkpoint(session, "delta")
+    assert (base.tipo, delta.tipo, delta.fk_anterior) == ("base", "delta", base.id)
+
+    banco.delete_clientes_bulk(session, ["C1", "C2"])
+    checkpoint.restaurar_checkpoint(session, "delta")
+    session.expire_all()
+    assert set(_clientes(banco, session)) == {"C1", "C2"}
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as TimeoutDoPool
+import conexao
+
+
+@pytest.fixture
+def engines(tmp_path, monkeypatch):
+    # Pool pequeno: uma conexão fixa, uma de overflow e espera curta pela terceira
+    monkeypatch.setattr(conexao, "POOL_SIZE", 1)
+    monkeypatch.setattr(conexao, "MAX_OVERFLOW", 1)
+    monkeypatch.setattr(conexao, "POOL_TIMEOUT", 0.2)
+    criadas = []
+
+    def criar(nome):
+        url = f"sqlite:///{tmp_path / nome}"
+        engine = create_engine(url, **conexao.opcoes_pool(url))
+        conexao.registrar_metricas_pool(engine)
+        criadas.append(engine)
+        return engine
+    yield criar
+    for engine in criadas:
+        engine.dispose()
+
+
+def test_espera_e_overflow_contados_quando_o_pool_esgota(engines):
+    engine = engines("a.db")
+    primeira, segunda = engine.connect(), engine.connect()
+    with pytest.raises(TimeoutDoPool):
+        engine.connect()
+    metricas = conexao.metricas_pool(engine)
+    primeira.close()
+    segunda.close()
+
+    assert metricas["checkouts"] == 3
+    assert metricas["eventos_overflow"] == 1
+    assert metricas["overflow"] == 1
+    assert metricas["em_uso"] == 2
+    assert metricas["espera_maxima"] >= 0.2
+    assert metricas["espera_media"] > 0
+
+
+def test_cada_engine_tem_as_suas_metricas(engines):
+    esgotada, livre = engines("a.db"), engines("b.db")
+    conexoes = [esgotada.connect(), esgotada.connect()]
+    with pytest.raises(TimeoutDoPool):
+        esgotada.connect()
+    for conexao_aberta in conexoes:
+        conexao_aberta.close()
+    livre.connect().close()
+
+    metricas = conexao.metricas_pool(livre)
+    assert metricas["checkouts"] == 1
+    assert metricas["eventos_overflow"] == 0
+    assert metricas["espera_maxima"] < 0.2
+    assert conexao.metricas_pool(esgotada)["checkouts"] == 3
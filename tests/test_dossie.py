@@ -0,0 +1,54 @@
+from datetime import date
+from benchmarks.dossie import ContadorConsultas, dossies_preguicosos
+
+
+def _popular(app, session, clientes):
+    app.create_clientes_bulk(session, [
+        {"cpf": f"C{i:04d}", "nome": f"Cliente {i}", "contato": "-", "sexo": "F"} for i in range(clientes)
+    ])
+    # Duas apólices por cliente, dois apartamentos por apólice e dois acidentes por apartamento
+    app.create_apolices_bulk(session, [
+        {"n_seguro": f"S{i:04d}{j}", "data_inicio": date(2020, 1, 1), "valor_mensal": 100, "cobertura": "Básica", "fk_cpf": f"C{i:04d}"}
+        for i in range(clientes) for j in range(2)
+    ])
+    app.create_apartamentos_bulk(session, [
+        {"logradouro": f"Rua {i:04d}{j}{k}", "cidade": "Curitiba", "metragem": 50, "fk_seguro": f"S{i:04d}{j}", "valor_mercado": 1000, "n_moradores": 2}
+        for i in range(clientes) for j in range(2) for k in range(2)
+    ])
+    app.create_acidentes_bulk(session, [
+        {"id_acidente": i * 8 + j * 4 + k * 2 + n + 1, "data": date(2021, 1, 1), "qtd_acidentes": 1,
+         "fk_apartamento": f"Rua {i:04d}{j}{k}", "descricao": "Vazamento", "envolvidos": 1}
+        for i in range(clientes) for j in range(2) for k in range(2) for n in range(2)
+    ])
+
+
+def _medir(app, cpfs, tamanho_lote):
+    with app.session_scope() as session:
+        with ContadorConsultas(app.get_engine()) as contador:
+            resultado = app.dossies(session, cpfs, tamanho_lote)
+    return resultado, contador.total
+
+
+def test_consultas_nao_dependem_da_quantidade_de_clientes(banco, session):
+    _popular(banco, session, 1000)
+    cpfs = [f"C{i:04d}" for i in range(1000)]
+    um, consultas_um = _medir(banco, cpfs[:1], 1000)
+    todos, consultas_todos = _medir(banco, cpfs, 1000)
+    assert consultas_um == consultas_todos == banco.CONSULTAS_DOSSIE
+    assert todos[cpfs[0]] == um[cpfs[0]]
+    assert sum(len(a["acidentes"]) for d in todos.values() for p in d["apolices"] for a in p["apartamentos"]) == 8000
+
+    # Um lote por TAMANHO_LOTE_DOSSIE clientes
+    _, consultas = _medir(banco, cpfs, banco.TAMANHO_LOTE_DOSSIE)
+    assert consultas == banco.CONSULTAS_DOSSIE * -(-len(cpfs) // banco.TAMANHO_LOTE_DOSSIE)
+
+
+def test_dossie_igual_ao_dos_relacionamentos_preguicosos(banco, session):
+    _popular(banco, session, 20)
+    banco.create_cliente(session, "SEM", "Sem apólices", "-", None, "M")
+    cpfs = ["C0003", "SEM", "inexistente", "C0001"]
+    with banco.session_scope() as s:
+        esperado = dossies_preguicosos(banco, s, cpfs)
+    assert banco.dossies(session, cpfs) == esperado
+    assert list(esperado) == ["C0003", "SEM", "C0001"]
+    assert banco.dossie_cliente(session, "SEM")["apolices"] == []
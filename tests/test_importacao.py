@@ -0,0 +1,59 @@
+import csv
+import pytest
+import importacao
+
+
+def _escrever_csv(caminho, quantidade):
+    with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(["cpf", "nome", "contato", "data_nascimento", "sexo"])
+        for i in range(quantidade):
+            escritor.writerow([f"C{i:04d}", f"Cliente {i}", "-", "1990-01-01", "F"])
+        escritor.writerow(["C0000", "Duplicado", "-", "1990-01-01", "F"])
+        escritor.writerow(["C9999", "Data ruim", "-", "01/01/1990", "F"])
+
+
+def test_importacao_continua_do_ultimo_lote(banco, tmp_path, monkeypatch):
+    clientes = tmp_path / "clientes.csv"
+    rejeitados = tmp_path / "rejeitados.csv"
+    _escrever_csv(clientes, 25)
+
+    # Falha no terceiro lote: os dois primeiros já foram confirmados com o progresso
+    original = importacao.inserir_lote
+    chamadas = []
+
+    def inserir_com_falha(session, modelo, registros):
+        chamadas.append(len(registros))
+        if len(chamadas) == 3:
+            raise RuntimeError("conexão perdida")
+        return original(session, modelo, registros)
+
+    monkeypatch.setattr(importacao, "inserir_lote", inserir_com_falha)
+    with pytest.raises(RuntimeError):
+        importacao.importar({"clientes": str(clientes)}, str(rejeitados), tamanho_lote=10)
+    with banco.session_scope() as session:
+        assert session.query(banco.Cliente).count() == 20
+
+    monkeypatch.setattr(importacao, "inserir_lote", original)
+    r, = importacao.importar({"clientes": str(clientes)}, str(rejeitados), tamanho_lote=10)
+    assert (r["retomado_em"], r["lidas"], r["importadas"], r["rejeitadas"]) == (20, 7, 5, 2)
+    with banco.session_scope() as session:
+        assert session.query(banco.Cliente).count() == 25
+
+    with open(rejeitados, newline="", encoding="utf-8") as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    # O lote que falhou já tinha escrito os rejeitados dele: eles se repetem, mas não se perdem
+    assert {(l["linha"], l["erro"].split(":")[0]) for l in linhas} == {("26", "chave primária duplicada"), ("27", "data_nascimento")}
+
+    # Arquivo já importado por inteiro: nada é lido de novo
+    r, = importacao.importar({"clientes": str(clientes)}, str(rejeitados), tamanho_lote=10)
+    assert (r["retomado_em"], r["lidas"]) == (27, 0)
+
+
+def test_reiniciar_ignora_o_progresso(banco, tmp_path):
+    clientes = tmp_path / "clientes.csv"
+    _escrever_csv(clientes, 5)
+    importacao.importar({"clientes": str(clientes)}, str(tmp_path / "rejeitados.csv"))
+    r, = importacao.importar({"clientes": str(clientes)}, str(tmp_path / "rejeitados.csv"), retomar=False)
+    # As chaves já existem no banco: todas as linhas são rejeitadas, nenhuma é gravada de novo
+    assert (r["retomado_em"], r["importadas"], r["rejeitadas"]) == (0, 0, 7)
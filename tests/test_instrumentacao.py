@@ -0,0 +1,39 @@
+from datetime import date
+import pytest
+import instrumentacao
+
+
+@pytest.fixture
+def medindo(banco):
+    instrumentacao.limpar()
+    instrumentacao.ativar(amostragem=1.0, limite_lento_ms=0)
+    yield instrumentacao
+    instrumentacao.desativar()
+    instrumentacao.limpar()
+
+
+def _sql(relatorio, inicio):
+    return [r for r in relatorio["sql"] if r["nome"].startswith(inicio)]
+
+
+def test_linhas_contadas_apenas_nas_escritas(medindo, session):
+    for i in range(3):
+        medindo.app.create_cliente(session, f"C{i}", "Ana", "-", date(1990, 1, 1), "F")
+    medindo.app.update_cliente(session, "C1", nome="Bia")
+    session.query(medindo.app.Cliente).all()
+
+    relatorio = medindo.relatorio()
+    assert sum(r["linhas"] for r in _sql(relatorio, "INSERT INTO clientes")) == 3
+    assert sum(r["linhas"] for r in _sql(relatorio, "UPDATE clientes")) == 1
+    # O SQLite informa rowcount -1 nos SELECTs: nada é somado
+    assert all(r["linhas"] == 0 for r in _sql(relatorio, "SELECT"))
+    assert all(r.get("linhas", 0) >= 0 for r in relatorio["lentas"])
+
+
+def test_funcoes_do_app_sao_medidas_e_restauradas(medindo, session):
+    medindo.app.read_cliente(session, "inexistente")
+    nomes = {r["nome"] for r in medindo.relatorio()["funcoes"]}
+    assert "app.read_cliente" in nomes
+
+    medindo.desativar()
+    assert not hasattr(medindo.app.read_cliente, "_instrumentacao_original")
@@ -0,0 +1,56 @@
+from datetime import date
+from collections import Counter
+import pytest
+from benchmarks.resumo import cenarios
+
+
+@pytest.fixture
+def generico(banco, monkeypatch):
+    # Caminho dos bancos sem upsert próprio: SELECT ... FOR UPDATE, UPDATE e INSERT
+    monkeypatch.setattr(banco.get_engine().dialect, "name", "generico")
+    return banco
+
+
+def test_resumo_consistente_depois_de_cada_escrita(banco, session):
+    for nome, escrita in cenarios(banco):
+        escrita(session)
+        assert banco.verificar_resumo_cidades(session) == [], nome
+
+
+def test_resumo_sem_upsert_do_banco(generico, session):
+    app = generico
+    app.create_cliente(session, "C1", "Ana", "-", None, "F")
+    app.create_apolice(session, "S1", date(2020, 1, 1), 100, "Básica", "C1")
+    escritas = [
+        lambda: app.create_apartamento(session, "Rua 1", "Curitiba", 50, "S1", 1000, 2),
+        lambda: app.create_apartamento(session, "Rua 2", "Curitiba", 70, "S1", None, 3),
+        lambda: app.update_apartamento(session, "Rua 1", cidade="Londrina", valor_mercado=500),
+        lambda: app.create_apartamentos_bulk(session, [
+            {"logradouro": f"Rua {i}", "cidade": "Maringá", "metragem": 40, "fk_seguro": "S1"} for i in range(3, 6)
+        ]),
+        lambda: app.delete_apartamento(session, "Rua 2"),
+        lambda: app.delete_apartamentos_bulk(session, ["Rua 3", "Rua 4"]),
+    ]
+    for escrita in escritas:
+        escrita()
+        assert app.verificar_resumo_cidades(session) == []
+    assert {r.cidade: r.quantidade for r in session.query(app.ResumoCidade)} == {"Londrina": 1, "Maringá": 1}
+
+
+def test_cenarios_sem_upsert_do_banco(generico, session):
+    for nome, escrita in cenarios(generico):
+        escrita(session)
+        assert generico.verificar_resumo_cidades(session) == [], nome
+
+
+def test_contagem_por_cidade_inclui_apartamentos_sem_cidade(banco, session):
+    banco.create_cliente(session, "C1", "Ana", "-", None, "F")
+    banco.create_apolice(session, "S1", date(2020, 1, 1), 100, "Básica", "C1")
+    for i, cidade in enumerate(["Curitiba", None, "Londrina", "Curitiba", None]):
+        banco.create_apartamento(session, f"Rua {i}", cidade, 50, "S1", 1000, 2)
+
+    esperado = Counter(a.cidade for a in session.query(banco.Apartamento))
+    contagem = banco.contar_apartamentos_por_cidade(session)
+    assert [(r.cidade, r.total_apartamentos) for r in contagem] == [(None, 2), ("Curitiba", 2), ("Londrina", 1)]
+    assert dict((r.cidade, r.total_apartamentos) for r in contagem) == esperado
+    assert [tuple(r) for r in banco.iter_contar_apartamentos_por_cidade(session, limite=2)] == [(None, 2), ("Curitiba", 2)]
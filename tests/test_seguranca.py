@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+import pytest
+import seguranca
+
+
+@pytest.fixture(autouse=True)
+def scrypt_barato(monkeypatch):
+    # Custo baixo só para os testes não gastarem 16 MiB e dezenas de ms por hash
+    monkeypatch.setattr(seguranca, "SCRYPT_N", 2 ** 10)
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    agora = SimpleNamespace(valor=1000.0)
+    monkeypatch.setattr(seguranca, "time", SimpleNamespace(time=lambda: agora.valor, monotonic=lambda: agora.valor))
+    return agora
+
+
+def _usuario(username="ana", role="user"):
+    return SimpleNamespace(id=1, username=username, role=role)
+
+
+def test_hash_e_verificacao():
+    armazenada = seguranca.gerar_hash("segredo")
+    assert armazenada.startswith(f"scrypt${2 ** 10}$")
+    assert armazenada != seguranca.gerar_hash("segredo")  # sal diferente a cada hash
+    assert seguranca.verificar_senha("segredo", armazenada)
+    assert not seguranca.verificar_senha("outra", armazenada)
+    assert not seguranca.precisa_novo_hash(armazenada)
+    assert seguranca.precisa_novo_hash(seguranca.gerar_hash("segredo", n=2 ** 9))
+
+
+@pytest.mark.parametrize("armazenada", [
+    "scrypt$abc$8$1$c2Fs$aGFzaA==",
+    "scrypt$1024$8$1$não é base64$aGFzaA==",
+    "scrypt$1024$8$1$c2Fs$aGFzaA",
+    "scrypt$1000$8$1$c2Fs$aGFzaA==",
+    "scrypt$1024$8$1$c2Fs",
+])
+def test_hash_corrompido_nunca_confere(armazenada):
+    assert not seguranca.verificar_senha("segredo", armazenada)
+    assert not seguranca.verificar_senha(armazenada, armazenada)
+    assert seguranca.precisa_novo_hash(armazenada)
+
+
+def test_login_com_hash_corrompido_falha_sem_erro(banco, session):
+    session.add(banco.Usuario(username="ana", password="scrypt$1024$8$1$???$???", role="user"))
+    session.commit()
+    assert banco.autenticar_usuario(session, "ana", "segredo") is None
+
+
+def test_senha_em_texto_puro_vira_hash_no_login(banco, session):
+    session.add(banco.Usuario(username="ana", password="segredo", role="user"))
+    session.commit()
+
+    assert banco.autenticar_usuario(session, "ana", "errada") is None
+    assert banco.autenticar_usuario(session, "ana", "segredo") is not None
+    session.expire_all()
+    armazenada = session.query(banco.Usuario).filter_by(username="ana").one().password
+    assert armazenada.startswith("scrypt$")
+    assert not seguranca.precisa_novo_hash(armazenada)
+    assert banco.autenticar_usuario(session, "ana", "segredo") is not None
+
+
+def test_sessao_expira(relogio, monkeypatch):
+    monkeypatch.setattr(seguranca, "SESSAO_TTL", 60)
+    token = seguranca.criar_sessao(_usuario())
+    assert seguranca.obter_sessao(token)["username"] == "ana"
+    relogio.valor += 61
+    assert seguranca.obter_sessao(token) is None
+
+
+def test_token_assinado_expira_e_confere_assinatura(relogio):
+    token = seguranca.criar_token_assinado(_usuario(role="admin"), b"segredo", ttl=60)
+    assert seguranca.verificar_token_assinado(token, b"segredo")["role"] == "admin"
+    assert seguranca.verificar_token_assinado(token, b"outro") is None
+    corpo, _, assinatura = token.partition(".")
+    assert seguranca.verificar_token_assinado(f"{corpo}x.{assinatura}", b"segredo") is None
+    relogio.valor += 61
+    assert seguranca.verificar_token_assinado(token, b"segredo") is None
@@ -0,0 +1,75 @@
+import pytest
+
+QtCore = pytest.importorskip("PyQt5.QtCore")
+
+from tabela_paginada import ModeloTabelaPaginada  # noqa: E402
+
+
+def _popular(app, session, quantidade):
+    app.create_clientes_bulk(session, [
+        {"cpf": f"C{i:04d}", "nome": f"Cliente {i % 7}", "contato": "-", "sexo": "F"} for i in range(quantidade)
+    ])
+
+
+def _todas_as_paginas(app, session, limite, **opcoes):
+    chaves, cursor = [], None
+    while True:
+        pagina = app.list_clientes(session, limite=limite, cursor=cursor, **opcoes)
+        chaves += [c.cpf for c in pagina["itens"]]
+        cursor = pagina["proximo_cursor"]
+        if not cursor:
+            return chaves
+
+
+@pytest.mark.parametrize("ordenar_por", [None, "nome"])
+@pytest.mark.parametrize("descendente", [False, True])
+def test_cursores_percorrem_todas_as_linhas(banco, session, ordenar_por, descendente):
+    _popular(banco, session, 53)
+    chaves = _todas_as_paginas(banco, session, 10, ordenar_por=ordenar_por, descendente=descendente)
+    # Nomes repetidos: a chave primária desempata, sem repetir nem pular linhas entre as páginas
+    assert sorted(chaves) == [f"C{i:04d}" for i in range(53)]
+    clientes = {c.cpf: c for c in session.query(banco.Cliente)}
+    ordem = [(clientes[c].nome, c) if ordenar_por else c for c in chaves]
+    assert ordem == sorted(ordem, reverse=descendente)
+
+
+def test_cursor_invalido(banco, session):
+    with pytest.raises(ValueError):
+        banco.list_clientes(session, cursor="nao-e-um-cursor")
+
+
+@pytest.fixture
+def aplicacao():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+def _esperar(aplicacao):
+    QtCore.QThreadPool.globalInstance().waitForDone()
+    # Os sinais das tarefas chegam pela fila de eventos da thread principal
+    for _ in range(10):
+        aplicacao.processEvents()
+
+
+def test_modelo_busca_paginas_sob_demanda(banco, session, aplicacao):
+    _popular(banco, session, 25)
+    modelo = ModeloTabelaPaginada(banco.list_clientes, ["cpf", "nome"], tamanho_pagina=10, max_paginas=2)
+    while modelo.canFetchMore():
+        modelo.fetchMore()
+        _esperar(aplicacao)
+    assert modelo.rowCount() == 25
+    # Só as duas páginas mais recentes ficam em memória; a primeira é buscada de novo
+    assert list(modelo._paginas) == [1, 2]
+    assert modelo.data(modelo.index(0, 0)) == "..."
+    _esperar(aplicacao)
+    assert modelo.data(modelo.index(0, 0)) == "C0000"
+    assert modelo.data(modelo.index(24, 0)) == "C0024"
+
+
+def test_modelo_ordenado_pelo_banco(banco, session, aplicacao):
+    _popular(banco, session, 15)
+    modelo = ModeloTabelaPaginada(banco.list_clientes, ["cpf", "nome"], tamanho_pagina=10)
+    modelo.sort(0, QtCore.Qt.DescendingOrder)
+    while modelo.canFetchMore():
+        modelo.fetchMore()
+        _esperar(aplicacao)
+    assert [modelo.data(modelo.index(i, 0)) for i in range(modelo.rowCount())] == [f"C{i:04d}" for i in reversed(range(15))]
@@ -0,0 +1,116 @@
+import threading
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, Qt
+from PyQt5.QtWidgets import QProgressDialog, QMessageBox
+from cliente_http import modulo_dados
+
+# Execução das chamadas ao banco fora da thread da interface.
+# Cada tarefa roda no QThreadPool com a sua própria sessão, criada dentro da thread que a usa.
+
+
+class Cancelado(Exception):
+    pass
+
+
+class SinaisTarefa(QObject):
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(object)
+    cancelado = pyqtSignal()
+    progresso = pyqtSignal(int, str)
+
+
+class Controle:
+    """Passado para a função da tarefa: permite reportar progresso e verificar cancelamento"""
+
+    def __init__(self, sinais):
+        self._sinais = sinais
+        self._evento = threading.Event()
+
+    def cancelar(self):
+        self._evento.set()
+
+    @property
+    def cancelado(self):
+        return self._evento.is_set()
+
+    def verificar(self):
+        # Chamado entre etapas de operações longas; a exceção desfaz a transação da tarefa
+        if self._evento.is_set():
+            raise Cancelado()
+
+    def progresso(self, valor, mensagem=""):
+        # valor entre 0 e 100, ou -1 quando o total não é conhecido
+        self._sinais.progresso.emit(valor, mensagem)
+
+
+class Tarefa(QRunnable):
+    def __init__(self, funcao, *args, **kwargs):
+        super().__init__()
+        self.funcao = funcao
+        self.args = args
+        self.kwargs = kwargs
+        self.sinais = SinaisTarefa()
+        self.controle = Controle(self.sinais)
+
+    def run(self):
+        try:
+            # O app (e o SQLAlchemy) é carregado na primeira tarefa, não ao abrir a interface; com
+            # SERVIDOR_URL a "sessão" é a conexão com o servidor
+            with modulo_dados().session_scope() as session:
+                resultado = self.funcao(session, self.controle, *self.args, **self.kwargs)
+        except Cancelado:
+            self.sinais.cancelado.emit()
+        except Exception as e:
+            self.sinais.falhou.emit(e)
+        else:
+            self.sinais.concluido.emit(resultado)
+
+
+# Referências às tarefas em andamento, para que os sinais não sejam coletados antes de chegar
+_tarefas_ativas = set()
+
+
+def executar_em_segundo_plano(parent, titulo, funcao, *args, ao_concluir=None, ao_falhar=None, cancelavel=True, **kwargs):
+    """Executa funcao(session, controle, *args) no pool de threads, com uma janela de progresso"""
+    tarefa = Tarefa(funcao, *args, **kwargs)
+    dialogo = QProgressDialog(titulo, "Cancelar" if cancelavel else None, 0, 0, parent)
+    dialogo.setWindowModality(Qt.WindowModal)
+    dialogo.setMinimumDuration(500)  # operações rápidas não chegam a mostrar a janela
+    dialogo.canceled.connect(tarefa.controle.cancelar)
+
+    def finalizar():
+        dialogo.canceled.disconnect(tarefa.controle.cancelar)
+        dialogo.close()
+        _tarefas_ativas.discard(tarefa)
+
+    def concluido(resultado):
+        finalizar()
+        if ao_concluir:
+            ao_concluir(resultado)
+
+    def falhou(erro):
+        finalizar()
+        if ao_falhar:
+            ao_falhar(erro)
+        else:
+            QMessageBox.warning(parent, "Erro", f"Erro ao executar operação: {erro}")
+
+    def cancelado():
+        finalizar()
+        QMessageBox.information(parent, "Cancelado", "Operação cancelada.")
+
+    def progresso(valor, mensagem):
+        if valor < 0:
+            dialogo.setRange(0, 0)
+        else:
+            dialogo.setRange(0, 100)
+            dialogo.setValue(valor)
+        if mensagem:
+            dialogo.setLabelText(f"{titulo}\n{mensagem}")
+
+    tarefa.sinais.concluido.connect(concluido)
+    tarefa.sinais.falhou.connect(falhou)
+    tarefa.sinais.cancelado.connect(cancelado)
+    tarefa.sinais.progresso.connect(progresso)
+    _tarefas_ativas.add(tarefa)
+    QThreadPool.globalInstance().start(tarefa)
+    return tarefa